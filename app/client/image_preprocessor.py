@@ -0,0 +1,368 @@
+# -*- coding: utf-8 -*-
+"""
+参考图片预处理
+
+上传前把参考图片缩小到模型有效的最大边长（JIMENG_INTL_IMAGE_MODE_MAP 中的 max_input_size，不超过任务分辨率），
+按 EXIF 方向摆正后重新编码为 JPEG 或 WebP，不保留 EXIF 等元数据。解码和编码在进程池中执行，不占用工作线程的 GIL；
+结果按原图内容的 SHA-256 保存在 get_image_cache_dir() 下，同一张图片只处理一次，程序重启后仍可使用。
+需要安装 Pillow，未安装时按原图上传
+"""
+import mimetypes
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from app.constants import JIMENG_INTL_IMAGE_MODE_MAP
+from app.client.upload_cache import get_upload_cache
+from app.utils.config_manager import get_config_manager
+from app.utils.path_helper import get_image_cache_dir
+from app.utils.logger import log
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # pragma: no cover - 可选依赖
+    Image = None
+    ImageOps = None
+
+# 部分 Python 版本的 mimetypes 没有登记 WebP
+mimetypes.add_type("image/webp", ".webp")
+
+# 配置键名：是否预处理参考图片、输出格式（jpeg / webp）、编码质量、进程数
+CONFIG_KEY_IMAGE_PREPROCESS = "jimeng_image_preprocess"
+CONFIG_KEY_IMAGE_PREPROCESS_FORMAT = "jimeng_image_preprocess_format"
+CONFIG_KEY_IMAGE_PREPROCESS_QUALITY = "jimeng_image_preprocess_quality"
+CONFIG_KEY_IMAGE_PREPROCESS_WORKERS = "jimeng_image_preprocess_workers"
+DEFAULT_PREPROCESS_FORMAT = "jpeg"
+DEFAULT_PREPROCESS_QUALITY = 90
+DEFAULT_PREPROCESS_WORKERS = 2
+
+# 不在 JIMENG_INTL_IMAGE_MODE_MAP 中的模型（如视频模型）使用的最大边长
+DEFAULT_MAX_INPUT_SIZE = 2048
+# 任务分辨率对应的最大边长，参考图片不需要比生成结果更大
+RESOLUTION_MAX_SIZE = {"1k": 1024, "2k": 2048, "4k": 4096}
+
+# 输出格式 -> (Pillow 格式名, 扩展名)
+OUTPUT_FORMATS = {
+    "jpeg": ("JPEG", ".jpg"),
+    "webp": ("WEBP", ".webp"),
+}
+
+# 接口模型名 -> 参考图片最大边长
+_MODEL_MAX_INPUT_SIZE = {
+    model: mode["max_input_size"]
+    for mode in JIMENG_INTL_IMAGE_MODE_MAP.values()
+    for model in mode.get("models", [])
+}
+
+
+def is_image_preprocess_available() -> bool:
+    """是否安装了 Pillow（参考图片预处理依赖）"""
+    return Image is not None
+
+
+def get_max_input_size(model: str, resolution: str = None) -> int:
+    """
+    获取参考图片的最大边长
+
+    Args:
+        model: 接口模型名，如 jimeng-4.5
+        resolution: 任务分辨率（1k / 2k / 4k），可选
+
+    Returns:
+        int: 最大边长（像素）
+    """
+    max_size = _MODEL_MAX_INPUT_SIZE.get((model or "").lower(), DEFAULT_MAX_INPUT_SIZE)
+    resolution_size = RESOLUTION_MAX_SIZE.get((resolution or "").lower())
+    if resolution_size:
+        max_size = min(max_size, resolution_size)
+    return max_size
+
+
+def get_image_content_type(path: str) -> str:
+    """
+    根据扩展名获取图片的 Content-Type（无法识别时按 JPEG 处理）
+
+    Args:
+        path: 图片路径
+
+    Returns:
+        str: 如 image/png
+    """
+    content_type, _ = mimetypes.guess_type(path)
+    if content_type and content_type.startswith("image/"):
+        return content_type
+    return "image/jpeg"
+
+
+def get_image_upload_name(path: str, idx: int) -> str:
+    """
+    获取上传时使用的文件名（image_序号 + 原扩展名）
+
+    Args:
+        path: 图片路径
+        idx: 图片序号
+
+    Returns:
+        str: 如 image_0.png
+    """
+    ext = os.path.splitext(path)[1].lower()
+    return f"image_{idx}{ext if ext else '.jpg'}"
+
+
+def _preprocess_image(src: str, dst: str, max_size: int, image_format: str, quality: int) -> bool:
+    """
+    缩小并重新编码一张图片（在子进程中执行）
+
+    Args:
+        src: 原图路径
+        dst: 输出路径
+        max_size: 最大边长
+        image_format: Pillow 格式名（JPEG / WEBP）
+        quality: 编码质量
+
+    Returns:
+        bool: 是否写入了输出文件；原图不需要缩小且重新编码后更大时返回 False，继续使用原图
+    """
+    with Image.open(src) as img:
+        width, height = img.size
+        scale = max_size / max(width, height)
+        needs_resize = scale < 1
+        if needs_resize:
+            # JPEG 解码时直接按 1/2、1/4、1/8 缩小，大图解码更快、占用内存更少
+            img.draft("RGB", (int(width * scale), int(height * scale)))
+
+        icc_profile = img.info.get("icc_profile")
+        image = ImageOps.exif_transpose(img)
+        if needs_resize:
+            image.thumbnail((max_size, max_size), Image.LANCZOS)
+
+        has_alpha = image.mode in ("RGBA", "LA", "PA") or (image.mode == "P" and "transparency" in image.info)
+        if has_alpha and image_format == "WEBP":
+            image = image.convert("RGBA")
+        elif has_alpha:
+            # JPEG 不支持透明通道，铺白色背景
+            rgba = image.convert("RGBA")
+            image = Image.new("RGB", rgba.size, (255, 255, 255))
+            image.paste(rgba, mask=rgba.getchannel("A"))
+        else:
+            image = image.convert("RGB")
+
+        # 只保留颜色配置（ICC），不写入 EXIF / XMP 等元数据
+        save_kwargs = {"quality": quality}
+        if icc_profile:
+            save_kwargs["icc_profile"] = icc_profile
+        if image_format == "JPEG":
+            save_kwargs["optimize"] = True
+        tmp_path = f"{dst}.{os.getpid()}.tmp"
+        try:
+            image.save(tmp_path, image_format, **save_kwargs)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    if not needs_resize and os.path.getsize(tmp_path) >= os.path.getsize(src):
+        os.remove(tmp_path)
+        return False
+    os.replace(tmp_path, dst)
+    return True
+
+
+class ImagePreprocessor:
+    """参考图片预处理（线程安全，同一张图片同时只处理一次）"""
+
+    def __init__(self, max_workers: int = DEFAULT_PREPROCESS_WORKERS,
+                 output_format: str = DEFAULT_PREPROCESS_FORMAT, quality: int = DEFAULT_PREPROCESS_QUALITY):
+        """
+        初始化预处理器（进程池在第一次使用时创建）
+
+        Args:
+            max_workers: 进程数
+            output_format: 输出格式 jpeg / webp，无法识别时使用 jpeg
+            quality: 编码质量 1-95
+        """
+        self.max_workers = max(1, max_workers)
+        self.image_format, self.extension = OUTPUT_FORMATS.get(
+            (output_format or "").lower(), OUTPUT_FORMATS[DEFAULT_PREPROCESS_FORMAT])
+        self.quality = max(1, min(quality, 95))
+        self.cache_dir = get_image_cache_dir()
+        # 缓存键 -> 预处理结果路径（None 表示使用原图）
+        self._results = {}
+        # 缓存键 -> 正在处理的 Future
+        self._pending = {}
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def process(self, path: str, max_size: int) -> str:
+        """
+        预处理一张本地图片
+
+        Args:
+            path: 原图路径
+            max_size: 最大边长
+
+        Returns:
+            str: 预处理后的图片路径；不需要处理或处理失败时返回原图路径
+        """
+        return self.process_all([path], max_size)[0]
+
+    def process_all(self, image_paths: list, max_size: int) -> list:
+        """
+        预处理多张图片：先全部提交到进程池再等待结果，多张图片并行处理；网络图片原样保留
+
+        Args:
+            image_paths: 图片路径列表
+            max_size: 最大边长
+
+        Returns:
+            list: 与 image_paths 一一对应的图片路径，不需要处理或处理失败的图片为原图路径
+        """
+        results = {}
+        waiting = []
+        for path in image_paths:
+            if path in results or path.startswith("http://") or path.startswith("https://"):
+                continue
+            results[path] = self._begin(path, max_size)
+            if not isinstance(results[path], str):
+                waiting.append(path)
+
+        for path in waiting:
+            results[path] = self._wait(path, *results[path])
+        return [results.get(path, path) for path in image_paths]
+
+    def _begin(self, path: str, max_size: int):
+        """
+        查找缓存，没有时提交处理
+
+        Returns:
+            str: 已有结果时返回上传使用的路径；否则返回 (缓存键, 输出路径, Future) 供 _wait 等待
+        """
+        try:
+            digest = get_upload_cache().get_digest(path)
+        except OSError:
+            # 文件不存在等错误由调用方处理
+            return path
+
+        key = f"{digest}_{max_size}_q{self.quality}{self.extension}"
+        dst = os.path.join(self.cache_dir, key)
+        with self._lock:
+            if key in self._results:
+                result = self._results[key]
+                if result is None:
+                    return path
+                if os.path.exists(result):
+                    return result
+                # 缓存文件已被删除，重新处理
+                del self._results[key]
+            future = self._pending.get(key)
+            if future is None:
+                if os.path.exists(dst):
+                    self._results[key] = dst
+                    return dst
+                future = self._submit(path, dst, max_size)
+                if future is None:
+                    return path
+                self._pending[key] = future
+        return key, dst, future
+
+    def _wait(self, path: str, key: str, dst: str, future) -> str:
+        """等待处理结果（同一张图片的其他请求共用同一个 Future）"""
+        written = False
+        try:
+            written = future.result()
+        except Exception as e:
+            log.warning(f"参考图片预处理失败，使用原图: {path}, 错误: {e}")
+            if isinstance(e, BrokenProcessPool):
+                # 子进程异常退出，下次使用时重新创建进程池
+                self._reset_pool()
+        finally:
+            with self._lock:
+                if self._pending.get(key) is future:
+                    del self._pending[key]
+                    self._results[key] = dst if written else None
+
+        if not written:
+            return path
+        log.debug(f"参考图片已预处理: {os.path.basename(path)} ({os.path.getsize(path)} -> "
+                  f"{os.path.getsize(dst)} 字节)")
+        return dst
+
+    def shutdown(self):
+        """关闭进程池，等待正在处理的图片完成"""
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True)
+
+    def _submit(self, path: str, dst: str, max_size: int):
+        """提交到进程池（需持有 _lock），进程池无法创建时返回 None"""
+        try:
+            if self._pool is None:
+                # 界面进程中有 Qt 和多个线程，子进程使用 spawn 启动
+                self._pool = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                 mp_context=multiprocessing.get_context("spawn"))
+            return self._pool.submit(_preprocess_image, path, dst, max_size, self.image_format, self.quality)
+        except (OSError, RuntimeError, BrokenProcessPool) as e:
+            log.warning(f"参考图片预处理进程池不可用，使用原图: {e}")
+            self._pool = None
+            return None
+
+    def _reset_pool(self):
+        """丢弃已损坏的进程池"""
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False)
+
+
+# 全局单例
+_image_preprocessor = None
+_image_preprocessor_lock = threading.Lock()
+_missing_pillow_warned = False
+
+
+def get_image_preprocessor() -> ImagePreprocessor:
+    """获取参考图片预处理器单例"""
+    global _image_preprocessor
+    with _image_preprocessor_lock:
+        if _image_preprocessor is None:
+            config_manager = get_config_manager()
+            _image_preprocessor = ImagePreprocessor(
+                max_workers=config_manager.get_int(CONFIG_KEY_IMAGE_PREPROCESS_WORKERS, DEFAULT_PREPROCESS_WORKERS),
+                output_format=config_manager.get(CONFIG_KEY_IMAGE_PREPROCESS_FORMAT, DEFAULT_PREPROCESS_FORMAT),
+                quality=config_manager.get_int(CONFIG_KEY_IMAGE_PREPROCESS_QUALITY, DEFAULT_PREPROCESS_QUALITY),
+            )
+        return _image_preprocessor
+
+
+def shutdown_image_preprocessor():
+    """关闭预处理进程池（调度器停止时调用，下次使用时重新创建）"""
+    global _image_preprocessor
+    with _image_preprocessor_lock:
+        preprocessor, _image_preprocessor = _image_preprocessor, None
+    if preprocessor is not None:
+        preprocessor.shutdown()
+
+
+def preprocess_images(image_paths: list, model: str, resolution: str = None) -> list:
+    """
+    按配置预处理参考图片（在工作线程中调用，会等待处理完成）
+
+    Args:
+        image_paths: 图片路径列表
+        model: 接口模型名
+        resolution: 任务分辨率，可选
+
+    Returns:
+        list: 上传使用的图片路径；未开启预处理或未安装 Pillow 时原样返回
+    """
+    global _missing_pillow_warned
+    if not image_paths or not get_config_manager().get_bool(CONFIG_KEY_IMAGE_PREPROCESS, False):
+        return image_paths
+    if not is_image_preprocess_available():
+        if not _missing_pillow_warned:
+            _missing_pillow_warned = True
+            log.warning("参考图片预处理需要安装 Pillow: pip install Pillow，当前按原图上传")
+        return image_paths
+    return get_image_preprocessor().process_all(image_paths, get_max_input_size(model, resolution))
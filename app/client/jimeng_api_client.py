@@ -1,8 +1,22 @@
 # -*- coding: utf-8 -*-
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from app.utils.logger import log
 from app.utils.config_manager import get_config_manager
 import json
+import os
+import threading
+import time
+from app.client.upload_cache import get_upload_cache, CONFIG_KEY_UPLOAD_CACHE
+from app.client.multipart_stream import MultipartStream
+from app.client.image_preprocessor import preprocess_images, get_image_content_type, get_image_upload_name
+
+# 配置键名：HTTP 重试次数和重试间隔基数（秒）
+CONFIG_KEY_HTTP_RETRIES = "jimeng_http_retries"
+CONFIG_KEY_HTTP_RETRY_BACKOFF = "jimeng_http_retry_backoff"
+# 查询类接口遇到这些状态码时重试
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
 
 
 class JimengApiClient:
@@ -11,15 +25,25 @@ class JimengApiClient:
     # 默认超时配置
     DEFAULT_IMAGE_TIMEOUT = 300  # 图片生成默认超时（秒）
     DEFAULT_VIDEO_TIMEOUT = 600  # 视频生成默认超时（秒）
+    DEFAULT_SUBMIT_TIMEOUT = 60  # 上传参考图片超时（秒）
+    DEFAULT_POOL_SIZE = 10  # 默认每个主机保持的连接数
+    DEFAULT_RETRIES = 2  # 默认重试次数
+    DEFAULT_RETRY_BACKOFF = 0.5  # 默认重试间隔基数（秒），第 n 次重试等待 backoff * 2^(n-1)
 
-    def __init__(self, base_url: str = None):
+    def __init__(self, base_url: str = None, pool_size: int = DEFAULT_POOL_SIZE):
         """
         初始化即梦API客户端
 
         Args:
             base_url: API基础地址，如果不传则从配置中动态读取
+            pool_size: 连接池大小（每个主机保持的长连接数），应不小于同时发请求的线程数
         """
         self._custom_base_url = base_url.rstrip('/') if base_url else None
+        self._pool_size = max(1, pool_size)
+        self._session = None
+        self._session_lock = threading.Lock()
+        # 服务端不支持上传接口时不再尝试上传缓存
+        self._upload_unsupported = False
         if self._custom_base_url:
             log.info(f"即梦API客户端使用自定义地址: {self._custom_base_url}")
         else:
@@ -39,6 +63,170 @@ class JimengApiClient:
 
         return url
 
+    @property
+    def session(self) -> requests.Session:
+        """共享的 HTTP 会话：同一地址的请求复用长连接，不必每次重新建立 TCP/TLS 连接"""
+        session = self._session
+        if session is None:
+            with self._session_lock:
+                if self._session is None:
+                    self._session = requests.Session()
+                    self._mount_adapter(self._session)
+                session = self._session
+        return session
+
+    def _mount_adapter(self, session: requests.Session):
+        """
+        为会话挂载连接池（需持有 _session_lock）
+
+        生成接口不是幂等的，连接池只重试连接失败（请求还没有发出）和幂等方法；
+        查询类接口的超时、5xx 重试见 _post_with_retry
+        """
+        retries = self.get_retries()
+        retry = Retry(
+            total=retries,
+            connect=retries,
+            read=retries,
+            status=retries,
+            backoff_factor=self.get_retry_backoff(),
+            status_forcelist=RETRY_STATUS_CODES,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self._pool_size, max_retries=retry)
+        old_adapter = session.adapters.get("https://")
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        if old_adapter is not None:
+            # 只关闭空闲连接，进行中的请求完成后连接直接关闭
+            old_adapter.close()
+
+    def set_pool_size(self, pool_size: int):
+        """
+        设置连接池大小（任务管理器线程数变化时调用）
+
+        Args:
+            pool_size: 每个主机保持的连接数
+        """
+        pool_size = max(1, pool_size)
+        with self._session_lock:
+            if pool_size == self._pool_size:
+                return
+            self._pool_size = pool_size
+            if self._session is not None:
+                self._mount_adapter(self._session)
+        log.debug(f"即梦API客户端连接池大小已更新为: {pool_size}")
+
+    def close(self):
+        """关闭 HTTP 会话及其连接"""
+        with self._session_lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+
+    def get_retries(self) -> int:
+        """获取重试次数"""
+        config_manager = get_config_manager()
+        return max(0, config_manager.get_int(CONFIG_KEY_HTTP_RETRIES, self.DEFAULT_RETRIES))
+
+    def get_retry_backoff(self) -> float:
+        """获取重试间隔基数（秒）"""
+        config_manager = get_config_manager()
+        return max(0.0, config_manager.get_float(CONFIG_KEY_HTTP_RETRY_BACKOFF, self.DEFAULT_RETRY_BACKOFF))
+
+    def _post_with_retry(self, url: str, **kwargs) -> requests.Response:
+        """
+        发送幂等的 POST 请求（如查询积分），超时、连接失败或 5xx 时按配置重试
+
+        Args:
+            url: 请求地址
+            **kwargs: 传给 session.post 的参数
+
+        Returns:
+            requests.Response: 最后一次请求的响应
+        """
+        retries = self.get_retries()
+        backoff = self.get_retry_backoff()
+        for attempt in range(retries + 1):
+            try:
+                response = self.session.post(url, **kwargs)
+                if response.status_code not in RETRY_STATUS_CODES or attempt == retries:
+                    return response
+                log.debug(f"请求返回 {response.status_code}，准备重试 ({attempt + 1}/{retries}): {url}")
+            except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
+                if attempt == retries:
+                    raise
+                log.debug(f"请求失败，准备重试 ({attempt + 1}/{retries}): {url}, {e}")
+            time.sleep(backoff * (2 ** attempt))
+
+    def is_upload_cache_enabled(self) -> bool:
+        """是否先上传参考图片、以远程地址传给生成接口（同一张图片只上传一次）"""
+        if self._upload_unsupported:
+            return False
+        return get_config_manager().get_bool(CONFIG_KEY_UPLOAD_CACHE, False)
+
+    def upload_file(self, token: str, path: str):
+        """
+        上传参考图片
+
+        请求 POST /v1/files/upload（multipart，字段 file），返回 {"url": 远程地址, "expires_in": 有效期秒数}
+
+        Args:
+            token: 账号token
+            path: 本地图片路径
+
+        Returns:
+            tuple: (远程地址, 有效期秒数或 None)；失败返回 None
+        """
+        url = f"{self.base_url}/v1/files/upload"
+        try:
+            body = MultipartStream({}, [('file', os.path.basename(path), path, get_image_content_type(path))])
+            headers = {"Authorization": f"Bearer {token}", "Content-Type": body.content_type}
+            response = self.session.post(url, headers=headers, data=body, timeout=self.DEFAULT_SUBMIT_TIMEOUT)
+            if response.status_code in (404, 405):
+                self._upload_unsupported = True
+                log.warning(f"服务端不支持上传接口（状态码 {response.status_code}），参考图片改为随请求上传")
+                return None
+            response.raise_for_status()
+            data = response.json()
+            if not data.get("url"):
+                log.warning(f"上传参考图片返回数据格式异常: {json.dumps(data, ensure_ascii=False)}")
+                return None
+            return data["url"], data.get("expires_in")
+        except (requests.exceptions.RequestException, ValueError, AttributeError, OSError) as e:
+            log.warning(f"上传参考图片失败: {path}, 错误: {e}")
+            return None
+
+    def get_remote_image_urls(self, token: str, image_paths: list):
+        """
+        把参考图片换成远程地址：本地图片按内容哈希查上传缓存，没有时上传一次；网络图片原样保留
+
+        Args:
+            token: 账号token
+            image_paths: 图片路径列表
+
+        Returns:
+            list: 远程地址列表（不存在的文件会跳过）；未开启上传缓存或有图片上传失败时返回 None，
+                由调用方按原方式随请求上传文件
+        """
+        if not image_paths or not self.base_url or not self.is_upload_cache_enabled():
+            return None
+
+        upload_cache = get_upload_cache()
+        urls = []
+        for image_path in image_paths:
+            if image_path.startswith("http://") or image_path.startswith("https://"):
+                urls.append(image_path)
+                continue
+            try:
+                url = upload_cache.get_url(image_path, lambda path: self.upload_file(token, path))
+            except OSError as e:
+                log.warning(f"  ✗ 读取图片文件失败: {image_path}, 错误: {str(e)}")
+                continue
+            if not url:
+                return None
+            urls.append(url)
+        return urls
+
     def get_image_timeout(self) -> int:
         """获取图片生成超时时间（秒）"""
         config_manager = get_config_manager()
@@ -74,7 +262,7 @@ class JimengApiClient:
 
         try:
             log.debug(f"发送POST请求到 {url}")
-            response = requests.post(url, headers=headers, timeout=30)
+            response = self._post_with_retry(url, headers=headers, timeout=30)
 
             log.debug(f"收到响应，状态码: {response.status_code}")
             response.raise_for_status()
@@ -130,7 +318,8 @@ class JimengApiClient:
             return 0
 
     def generate_image(self, token: str, prompt: str, image_paths: list = None,
-                      ratio: str = "1:1", model: str = "jimeng-4.5", resolution: str = "2k") -> dict:
+                      ratio: str = "1:1", model: str = "jimeng-4.5", resolution: str = "2k",
+                      async_job: bool = False) -> dict:
         """
         生成图片
 
@@ -141,6 +330,7 @@ class JimengApiClient:
             ratio: 图像比例，默认为 "1:1"。支持: 1:1, 4:3, 3:4, 16:9, 9:16, 3:2, 2:3, 21:9
             model: 使用的模型，默认为 "jimeng-4.5"
             resolution: 分辨率级别，默认为 "2k"。支持: 1k, 2k, 4k
+            async_job: 异步提交，服务端受理后立即返回 {"task_id": 远程任务ID}，结果通过 query_jobs 查询
 
         Returns:
             dict: 返回生成结果，包含 task_id 和其他信息；失败返回空字典
@@ -170,7 +360,7 @@ class JimengApiClient:
 
         response = None
         result = None
-        open_files = []
+        # 异步提交也使用完整的生成超时：服务端不支持 async 参数时会同步生成，直到返回 task_id 才能确认已受理
         image_timeout = self.get_image_timeout()
         log.debug(f"  超时时间: {image_timeout}秒")
 
@@ -182,21 +372,29 @@ class JimengApiClient:
                 "ratio": ratio,
                 "resolution": resolution
             }
+            if async_job:
+                data["async"] = "true"
 
-            # 检查是否有图片
+            # 开启预处理时参考图片先缩小并重新编码
+            image_paths = preprocess_images(image_paths, model, resolution)
+
+            # 检查是否有图片：开启上传缓存时以远程地址传递，否则随请求上传文件
             files = []
             image_count = 0
-            if image_paths:
+            remote_urls = self.get_remote_image_urls(token, image_paths)
+            if remote_urls is not None:
+                data["images"] = remote_urls
+                image_count = len(remote_urls)
+                log.debug(f"参考图片使用远程地址: {remote_urls}")
+            elif image_paths:
                 log.debug(f"处理参考图片:")
                 for idx, image_path in enumerate(image_paths):
                     try:
-                        # 打开文件但保持打开状态直到请求完成
-                        f = open(image_path, 'rb')
-                        open_files.append(f)
-
-                        # 使用列表方式支持多文件上传
-                        file_content = f.read()
-                        files.append(('images', (f"image_{idx}.jpg", file_content, 'image/jpeg')))
+                        # 只检查文件可读，发送时再从磁盘分块读取（多文件上传使用同名字段）
+                        with open(image_path, 'rb'):
+                            pass
+                        files.append(('images', get_image_upload_name(image_path, idx), image_path,
+                                      get_image_content_type(image_path)))
                         image_count += 1
                         log.debug(f"  [{idx + 1}] {image_path}")
                     except FileNotFoundError:
@@ -215,14 +413,20 @@ class JimengApiClient:
                 compositions_url = f"{self.base_url}/v1/images/compositions"
                 log.debug(f"使用图生图端点: {compositions_url}")
                 log.debug(f"使用 multipart/form-data 格式发送请求（包含 {image_count} 个图片）")
-                response = requests.post(compositions_url, headers={"Authorization": headers["Authorization"]}, data=data, files=files, timeout=image_timeout)
+                body = MultipartStream(data, files)
+                response = self.session.post(compositions_url, headers={"Authorization": headers["Authorization"], "Content-Type": body.content_type}, data=body, timeout=image_timeout)
+            elif remote_urls:
+                # 参考图片已上传，使用图生图端点 + JSON 格式
+                compositions_url = f"{self.base_url}/v1/images/compositions"
+                log.debug(f"使用图生图端点: {compositions_url}（{image_count} 个远程图片）")
+                response = self.session.post(compositions_url, headers=headers, json=data, timeout=image_timeout)
             else:
                 # 没有文件时，使用文生图端点 + JSON 格式
                 log.debug(f"使用文生图端点: {url}")
                 log.debug(f"使用 application/json 格式发送请求（不包含图片）")
                 log.debug(f"请求头: {headers}")
                 log.debug(f"请求体: {json.dumps(data, ensure_ascii=False)}")
-                response = requests.post(url, headers=headers, json=data, timeout=image_timeout)
+                response = self.session.post(url, headers=headers, json=data, timeout=image_timeout)
 
             log.debug(f"收到响应，状态码: {response.status_code}")
             response.raise_for_status()
@@ -282,16 +486,10 @@ class JimengApiClient:
             log.error(f"  错误类型: {type(e).__name__}")
             log.error(f"  错误信息: {str(e)}")
             return {}
-        finally:
-            # 关闭所有打开的文件
-            for f in open_files:
-                try:
-                    f.close()
-                except:
-                    pass
 
     def generate_video(self, token: str, prompt: str, image_paths: list = None,
-                      ratio: str = "16:9", model: str = "jimeng-video-3.0", duration: int = 5) -> dict:
+                      ratio: str = "16:9", model: str = "jimeng-video-3.0", duration: int = 5,
+                      async_job: bool = False) -> dict:
         """
         生成视频
 
@@ -302,6 +500,7 @@ class JimengApiClient:
             ratio: 视频比例，默认为 "16:9"
             model: 使用的模型，默认为 "jimeng-video-3.0"
             duration: 视频时长（秒），默认为 5
+            async_job: 异步提交，服务端受理后立即返回 {"task_id": 远程任务ID}，结果通过 query_jobs 查询
 
         Returns:
             dict: 返回生成结果，包含 task_id 和其他信息；失败返回空字典
@@ -330,7 +529,7 @@ class JimengApiClient:
 
         response = None
         result = None
-        open_files = []
+        # 异步提交也使用完整的生成超时（见 generate_image）
         video_timeout = self.get_video_timeout()
         log.debug(f"  超时时间: {video_timeout}秒")
 
@@ -348,6 +547,12 @@ class JimengApiClient:
                     "ratio": ratio,
                     "duration": str(duration)
                 }
+                if async_job:
+                    data["async"] = "true"
+
+                # 开启预处理时参考图片先缩小并重新编码；开启上传缓存时本地图片再换成远程地址，全部以 filePaths 字段传递
+                image_paths = preprocess_images(image_paths, model)
+                image_paths = self.get_remote_image_urls(token, image_paths) or image_paths
 
                 # 处理图片文件
                 for idx, image_path in enumerate(image_paths, 1):
@@ -359,12 +564,11 @@ class JimengApiClient:
                             data["filePaths"].append(image_path)
                             log.debug(f"  [{idx}] 网络图片: {image_path[:60]}...")
                         else:
-                            # 本地图片，上传文件
-                            f = open(image_path, 'rb')
-                            open_files.append(f)
-
-                            file_content = f.read()
-                            files.append((f'image_file_{idx}', (f"image_{idx}.jpg", file_content, 'image/jpeg')))
+                            # 本地图片，上传文件（只检查文件可读，发送时再从磁盘分块读取）
+                            with open(image_path, 'rb'):
+                                pass
+                            files.append((f'image_file_{idx}', get_image_upload_name(image_path, idx), image_path,
+                                          get_image_content_type(image_path)))
                             log.debug(f"  [{idx}] {image_path}")
                     except FileNotFoundError:
                         log.warning(f"  ✗ 图片文件不存在: {image_path}")
@@ -373,7 +577,12 @@ class JimengApiClient:
                         log.warning(f"  ✗ 读取图片文件失败: {image_path}, 错误: {str(e)}")
                         continue
 
-                response = requests.post(url, headers=headers, data=data, files=files, timeout=video_timeout)
+                if files:
+                    body = MultipartStream(data, files)
+                    headers["Content-Type"] = body.content_type
+                    response = self.session.post(url, headers=headers, data=body, timeout=video_timeout)
+                else:
+                    response = self.session.post(url, headers=headers, data=data, timeout=video_timeout)
             else:
                 # 没有图片时，使用 JSON 格式（文生视频）
                 log.debug(f"使用文生视频端点（纯文本生成）")
@@ -386,8 +595,10 @@ class JimengApiClient:
                     "ratio": ratio,
                     "duration": duration
                 }
+                if async_job:
+                    request_data["async"] = "true"
                 log.debug(f"请求体: {json.dumps(request_data, ensure_ascii=False)}")
-                response = requests.post(url, headers=headers, json=request_data, timeout=video_timeout)
+                response = self.session.post(url, headers=headers, json=request_data, timeout=video_timeout)
 
             log.debug(f"收到响应，状态码: {response.status_code}")
             response.raise_for_status()
@@ -447,13 +658,36 @@ class JimengApiClient:
             log.error(f"  错误类型: {type(e).__name__}")
             log.error(f"  错误信息: {str(e)}")
             return {}
-        finally:
-            # 关闭所有打开的文件
-            for f in open_files:
-                try:
-                    f.close()
-                except:
-                    pass
+
+    def query_jobs(self, token: str, job_ids: list):
+        """
+        批量查询异步任务状态
+
+        请求 POST /v1/tasks/query {"task_ids": [...]}，返回
+        {"data": [{"task_id", "status": queued/running/succeeded/failed, "eta": 预计剩余秒数,
+        "result": 与同步生成接口相同的返回, "message": 失败原因}]}，不存在的任务不在返回中
+
+        Args:
+            token: 提交这些任务的账号token
+            job_ids: 远程任务ID列表
+
+        Returns:
+            dict: {远程任务ID: 任务状态}；请求失败返回 None（由调用方稍后重试）
+        """
+        if not self.base_url:
+            log.error("即梦API地址未配置，无法查询任务")
+            return None
+
+        url = f"{self.base_url}/v1/tasks/query"
+        headers = {"Authorization": f"Bearer {token}"}
+        try:
+            response = self.session.post(url, headers=headers, json={"task_ids": list(job_ids)}, timeout=30)
+            response.raise_for_status()
+            data = response.json().get("data") or []
+            return {str(item.get("task_id")): item for item in data if isinstance(item, dict)}
+        except (requests.exceptions.RequestException, ValueError, AttributeError) as e:
+            log.warning(f"查询异步任务失败（{len(job_ids)} 个）: {e}")
+            return None
 
 
 # 全局单例
@@ -0,0 +1,314 @@
+# -*- coding: utf-8 -*-
+"""
+即梦API异步客户端（基于 aiohttp）
+供 asyncio 执行引擎使用，一个事件循环即可同时等待大量生成请求；
+接口和返回值与 JimengApiClient 保持一致，失败时返回空字典 / 0
+"""
+import asyncio
+import json
+import os
+from app.client.jimeng_api_client import get_jimeng_api_client
+from app.client.image_preprocessor import preprocess_images, get_image_content_type, get_image_upload_name
+from app.utils.logger import log
+
+try:
+    import aiohttp
+except ImportError:  # pragma: no cover - 可选依赖
+    aiohttp = None
+
+
+def is_async_client_available() -> bool:
+    """是否安装了 aiohttp（asyncio 执行引擎依赖）"""
+    return aiohttp is not None
+
+
+class AsyncJimengApiClient:
+    """即梦API异步客户端"""
+
+    def __init__(self, max_connections: int = 0):
+        """
+        初始化异步客户端（需在事件循环中调用 start()）
+
+        Args:
+            max_connections: 最大并发连接数，0 表示不限制
+        """
+        if aiohttp is None:
+            raise RuntimeError("asyncio 执行引擎需要安装 aiohttp: pip install aiohttp")
+
+        # 地址、超时等配置与同步客户端共用
+        self._config_client = get_jimeng_api_client()
+        self._max_connections = max_connections
+        self._session = None
+
+    @property
+    def base_url(self):
+        return self._config_client.base_url
+
+    async def start(self):
+        """创建 HTTP 会话（连接池在所有请求间复用）"""
+        if self._session is None:
+            connector = aiohttp.TCPConnector(limit=self._max_connections)
+            self._session = aiohttp.ClientSession(connector=connector)
+
+    async def close(self):
+        """关闭 HTTP 会话"""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def account_check(self, token: str) -> int:
+        """
+        检查账号积分
+
+        Args:
+            token: 账号token
+
+        Returns:
+            int: 总积分数量，失败返回0
+        """
+        if not self.base_url:
+            log.error("即梦API地址未配置，无法检查账号")
+            return 0
+
+        url = f"{self.base_url}/token/receive"
+        headers = {"Authorization": f"Bearer {token}"}
+
+        try:
+            timeout = aiohttp.ClientTimeout(total=30)
+            async with self._session.post(url, headers=headers, timeout=timeout) as response:
+                response.raise_for_status()
+                data = await response.json(content_type=None)
+
+            if isinstance(data, list) and len(data) > 0:
+                total_credit = data[0].get("credits", {}).get("totalCredit", 0)
+                log.info(f"✓ 账号积分查询成功")
+                log.debug(f"  总积分: {total_credit}")
+                return int(total_credit)
+
+            log.warning(f"✗ 账号积分查询返回数据格式异常")
+            log.warning(f"  响应数据: {json.dumps(data, ensure_ascii=False)}")
+            return 0
+
+        except asyncio.TimeoutError:
+            log.error(f"✗ 账号积分查询超时")
+            log.error(f"  URL: {url}")
+            return 0
+        except aiohttp.ClientError as e:
+            log.error(f"✗ 账号积分查询请求失败")
+            log.error(f"  URL: {url}")
+            log.error(f"  错误信息: {str(e)}")
+            return 0
+        except Exception as e:
+            log.error(f"✗ 账号积分查询发生未知错误")
+            log.error(f"  错误类型: {type(e).__name__}")
+            log.error(f"  错误信息: {str(e)}")
+            return 0
+
+    async def generate_image(self, token: str, prompt: str, image_paths: list = None,
+                             ratio: str = "1:1", model: str = "jimeng-4.5", resolution: str = "2k") -> dict:
+        """
+        生成图片（参数与 JimengApiClient.generate_image 一致）
+
+        Returns:
+            dict: 返回生成结果；失败返回空字典
+        """
+        if not self.base_url:
+            log.error("即梦API地址未配置，无法生成图片")
+            return {}
+
+        if not prompt:
+            log.error("提示词不能为空")
+            return {}
+
+        data = {
+            "prompt": prompt,
+            "model": model,
+            "ratio": ratio,
+            "resolution": resolution
+        }
+        headers = {"Authorization": f"Bearer {token}"}
+        timeout = self._config_client.get_image_timeout()
+
+        image_paths = await self._preprocess_images(image_paths, model, resolution)
+        remote_urls = await self._get_remote_image_urls(token, image_paths)
+        if remote_urls:
+            # 参考图片已上传（上传缓存），使用图生图端点 + JSON
+            data["images"] = remote_urls
+            url = f"{self.base_url}/v1/images/compositions"
+            return await self._post(url, headers, timeout, "图片生成", json_body=data)
+
+        open_files = []
+        try:
+            form = self._build_form(data, image_paths, lambda idx: 'images', open_files, start=0)
+            if form is not None:
+                # 有参考图片时使用图生图端点 + multipart/form-data
+                url = f"{self.base_url}/v1/images/compositions"
+                return await self._post(url, headers, timeout, "图片生成", data=form)
+        finally:
+            self._close_files(open_files)
+
+        url = f"{self.base_url}/v1/images/generations"
+        return await self._post(url, headers, timeout, "图片生成", json_body=data)
+
+    async def generate_video(self, token: str, prompt: str, image_paths: list = None,
+                             ratio: str = "16:9", model: str = "jimeng-video-3.0", duration: int = 5) -> dict:
+        """
+        生成视频（参数与 JimengApiClient.generate_video 一致）
+
+        Returns:
+            dict: 返回生成结果；失败返回空字典
+        """
+        if not self.base_url:
+            log.error("即梦API地址未配置，无法生成视频")
+            return {}
+
+        if not prompt:
+            log.error("提示词不能为空")
+            return {}
+
+        url = f"{self.base_url}/v1/videos/generations"
+        headers = {"Authorization": f"Bearer {token}"}
+        timeout = self._config_client.get_video_timeout()
+
+        if image_paths:
+            data = {
+                "prompt": prompt,
+                "model": model,
+                "ratio": ratio,
+                "duration": str(duration)
+            }
+            # 开启预处理时参考图片先缩小并重新编码；开启上传缓存时本地图片再换成远程地址，以 filePaths 字段传递
+            image_paths = await self._preprocess_images(image_paths, model)
+            image_paths = await self._get_remote_image_urls(token, image_paths) or image_paths
+            open_files = []
+            try:
+                form = self._build_form(data, image_paths, lambda idx: f'image_file_{idx}', open_files,
+                                        start=1, allow_urls=True) or aiohttp.FormData(data)
+                return await self._post(url, headers, timeout, "视频生成", data=form)
+            finally:
+                self._close_files(open_files)
+
+        request_data = {
+            "prompt": prompt,
+            "model": model,
+            "ratio": ratio,
+            "duration": duration
+        }
+        return await self._post(url, headers, timeout, "视频生成", json_body=request_data)
+
+    async def _preprocess_images(self, image_paths, model: str, resolution: str = None):
+        """在线程中等待参考图片预处理（见 image_preprocessor.preprocess_images），不阻塞事件循环"""
+        if not image_paths:
+            return image_paths
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, preprocess_images, image_paths, model, resolution)
+
+    async def _get_remote_image_urls(self, token: str, image_paths):
+        """在线程中查询上传缓存或上传参考图片（见 JimengApiClient.get_remote_image_urls），不阻塞事件循环"""
+        if not image_paths or not self._config_client.is_upload_cache_enabled():
+            return None
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self._config_client.get_remote_image_urls, token, image_paths)
+
+    def _build_form(self, data: dict, image_paths, field_name, open_files: list,
+                    start: int = 0, allow_urls: bool = False):
+        """
+        构建 multipart 表单，本地图片以文件对象加入表单（由 aiohttp 分块发送）
+
+        Args:
+            data: 普通表单字段
+            image_paths: 图片路径列表
+            field_name: 根据序号生成文件字段名的函数
+            open_files: 打开的文件会追加到此列表，由调用方在请求结束后关闭
+            start: 序号起始值
+            allow_urls: 是否允许网络图片（以 filePaths 字段传递）
+
+        Returns:
+            aiohttp.FormData: 表单；没有任何可用图片时返回 None
+        """
+        if not image_paths:
+            return None
+
+        form = aiohttp.FormData()
+        for key, value in data.items():
+            form.add_field(key, value)
+
+        added = 0
+        for idx, image_path in enumerate(image_paths, start):
+            if allow_urls and (image_path.startswith("http://") or image_path.startswith("https://")):
+                form.add_field("filePaths", image_path)
+                added += 1
+                continue
+            if not os.path.isfile(image_path):
+                log.warning(f"  ✗ 图片文件不存在: {image_path}")
+                continue
+            f = open(image_path, 'rb')
+            open_files.append(f)
+            form.add_field(field_name(idx), f, filename=get_image_upload_name(image_path, idx),
+                           content_type=get_image_content_type(image_path))
+            added += 1
+
+        return form if added else None
+
+    @staticmethod
+    def _close_files(open_files: list):
+        """关闭请求中打开的文件"""
+        for f in open_files:
+            try:
+                f.close()
+            except Exception:
+                pass
+
+    async def _post(self, url: str, headers: dict, timeout: int, action: str, data=None, json_body=None) -> dict:
+        """
+        发送生成请求
+
+        Args:
+            url: 请求地址
+            headers: 请求头
+            timeout: 超时（秒）
+            action: 操作名称（用于日志）
+            data: multipart 表单
+            json_body: JSON 请求体
+
+        Returns:
+            dict: 响应数据；失败返回空字典
+        """
+        log.debug(f"发送POST请求到 {url}")
+        try:
+            client_timeout = aiohttp.ClientTimeout(total=timeout)
+            async with self._session.post(url, headers=headers, data=data, json=json_body,
+                                          timeout=client_timeout) as response:
+                log.debug(f"收到响应，状态码: {response.status}")
+                if response.status >= 400:
+                    text = await response.text()
+                    log.error(f"✗ {action}请求HTTP错误")
+                    log.error(f"  URL: {url}")
+                    log.error(f"  状态码: {response.status}")
+                    log.error(f"  响应文本: {text[:500]}")
+                    return {}
+                result = await response.json(content_type=None)
+
+            log.info(f"✓ {action}请求成功")
+            log.debug(f"  响应数据: {json.dumps(result, ensure_ascii=False, indent=2)}")
+            return result
+
+        except asyncio.TimeoutError:
+            log.error(f"✗ {action}请求超时")
+            log.error(f"  URL: {url}")
+            log.error(f"  超时时长: {timeout}秒")
+            return {}
+        except aiohttp.ClientError as e:
+            log.error(f"✗ {action}请求失败")
+            log.error(f"  URL: {url}")
+            log.error(f"  错误信息: {str(e)}")
+            return {}
+        except ValueError as e:
+            log.error(f"✗ {action}响应解析失败（JSON解析错误）")
+            log.error(f"  错误信息: {str(e)}")
+            return {}
+        except Exception as e:
+            log.error(f"✗ {action}发生未知错误")
+            log.error(f"  错误类型: {type(e).__name__}")
+            log.error(f"  错误信息: {str(e)}")
+            return {}
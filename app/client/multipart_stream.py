@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""
+流式 multipart/form-data 请求体
+
+requests 的 files 参数会把所有文件读入内存再拼接请求体；这里按固定大小的块从磁盘读取并发送，
+请求体长度事先计算（发送 Content-Length），内存占用与图片数量和大小无关
+"""
+import os
+import uuid
+from typing import Iterator, List, Tuple
+
+# 每次从文件读取并发送的字节数
+MULTIPART_CHUNK_SIZE = 64 * 1024
+
+
+class MultipartStream:
+    """流式 multipart 请求体，作为 requests 的 data 参数（可重复迭代，连接失败重试时重新读取文件）"""
+
+    def __init__(self, fields: dict, files: List[Tuple[str, str, str, str]],
+                 chunk_size: int = MULTIPART_CHUNK_SIZE):
+        """
+        构建请求体（只记录文件路径和大小，不读取文件内容）
+
+        Args:
+            fields: 普通表单字段，值为列表时同名字段出现多次
+            files: 文件字段 [(字段名, 文件名, 本地路径, Content-Type)]
+            chunk_size: 每次读取的字节数
+
+        Raises:
+            OSError: 文件不存在或无法访问
+        """
+        self.boundary = uuid.uuid4().hex
+        self.chunk_size = chunk_size
+        # 请求体分段：bytes 为表单头等固定内容，(路径, 大小) 为文件内容
+        self._parts = []
+
+        for name, value in fields.items():
+            for item in (value if isinstance(value, (list, tuple)) else [value]):
+                self._parts.append(
+                    f'--{self.boundary}\r\n'
+                    f'Content-Disposition: form-data; name="{name}"\r\n\r\n'
+                    f'{item}\r\n'.encode('utf-8')
+                )
+
+        for name, filename, path, content_type in files:
+            self._parts.append(
+                f'--{self.boundary}\r\n'
+                f'Content-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+                f'Content-Type: {content_type}\r\n\r\n'.encode('utf-8')
+            )
+            self._parts.append((path, os.path.getsize(path)))
+            self._parts.append(b'\r\n')
+
+        self._parts.append(f'--{self.boundary}--\r\n'.encode('utf-8'))
+        self._length = sum(len(part) if isinstance(part, bytes) else part[1] for part in self._parts)
+
+    @property
+    def content_type(self) -> str:
+        """请求头 Content-Type"""
+        return f"multipart/form-data; boundary={self.boundary}"
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __iter__(self) -> Iterator[bytes]:
+        for part in self._parts:
+            if isinstance(part, bytes):
+                yield part
+                continue
+
+            path, size = part
+            remaining = size
+            with open(path, 'rb') as f:
+                while remaining > 0:
+                    chunk = f.read(min(self.chunk_size, remaining))
+                    if not chunk:
+                        raise IOError(f"文件在上传过程中被修改: {path}")
+                    remaining -= len(chunk)
+                    yield chunk
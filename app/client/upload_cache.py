@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+"""
+参考图片上传缓存
+
+按文件内容的 SHA-256 记录已上传图片的远程地址，同一张图片在有效期内只上传一次，之后以地址传给生成接口。
+批量任务共用同一张参考图片时，同时到达的请求只有一个执行上传，其余等待它的结果
+"""
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Callable, Optional, Tuple
+from app.utils.config_manager import get_config_manager
+from app.utils.logger import log
+
+# 配置键名：是否先上传参考图片再以地址传给生成接口（需要服务端支持 /v1/files/upload），以及缓存有效期（秒）
+CONFIG_KEY_UPLOAD_CACHE = "jimeng_upload_cache"
+CONFIG_KEY_UPLOAD_CACHE_TTL = "jimeng_upload_cache_ttl"
+DEFAULT_UPLOAD_CACHE_TTL = 3600
+# 远程地址到期前提前这么多秒失效，避免请求发出时地址刚好过期
+UPLOAD_EXPIRY_MARGIN = 60
+# 文件（路径 + 修改时间 + 大小）-> 哈希 的缓存条数，避免重复读取未修改的文件计算哈希
+DIGEST_CACHE_SIZE = 4096
+# 计算哈希时每次读取的字节数
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+class UploadCache:
+    """参考图片上传缓存（线程安全）"""
+
+    def __init__(self, ttl: float = DEFAULT_UPLOAD_CACHE_TTL):
+        """
+        初始化上传缓存
+
+        Args:
+            ttl: 上传结果的有效期（秒），服务端返回的有效期更短时以服务端为准
+        """
+        self.ttl = ttl
+        # 内容哈希 -> (远程地址, 失效时间)
+        self._entries = {}
+        # (路径, 修改时间, 大小) -> 内容哈希，按最近使用排序
+        self._digests = OrderedDict()
+        # 内容哈希 -> 正在上传的 Future
+        self._uploading = {}
+        self._lock = threading.Lock()
+
+    def get_digest(self, path: str) -> str:
+        """
+        获取文件内容的 SHA-256（文件未修改时直接使用上次的结果）
+
+        Args:
+            path: 文件路径
+
+        Returns:
+            str: 十六进制哈希
+
+        Raises:
+            OSError: 文件不存在或无法读取
+        """
+        stat = os.stat(path)
+        file_key = (path, stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            digest = self._digests.get(file_key)
+            if digest is not None:
+                self._digests.move_to_end(file_key)
+                return digest
+
+        sha256 = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+                sha256.update(chunk)
+        digest = sha256.hexdigest()
+
+        with self._lock:
+            self._digests[file_key] = digest
+            while len(self._digests) > DIGEST_CACHE_SIZE:
+                self._digests.popitem(last=False)
+        return digest
+
+    def get_url(self, path: str, upload: Callable[[str], Optional[Tuple[str, Optional[float]]]]) -> Optional[str]:
+        """
+        获取图片的远程地址，缓存中没有或已过期时调用 upload 上传
+
+        Args:
+            path: 本地图片路径
+            upload: 上传函数(路径) -> (远程地址, 服务端有效期秒数或 None)，失败返回 None
+
+        Returns:
+            str: 远程地址；上传失败返回 None
+        """
+        digest = self.get_digest(path)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is not None and entry[1] > now:
+                return entry[0]
+            future = self._uploading.get(digest)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._uploading[digest] = future
+
+        if not owner:
+            # 其他线程正在上传同一张图片，等待它的结果
+            return future.result()
+
+        url = None
+        try:
+            uploaded = upload(path)
+            if uploaded:
+                url, expires_in = uploaded
+                ttl = self.ttl if not expires_in else min(self.ttl, expires_in - UPLOAD_EXPIRY_MARGIN)
+                with self._lock:
+                    if ttl > 0:
+                        self._entries[digest] = (url, time.monotonic() + ttl)
+                    self._purge_expired()
+                log.debug(f"参考图片已上传: {os.path.basename(path)} -> {url[:80]}")
+        finally:
+            with self._lock:
+                self._uploading.pop(digest, None)
+            future.set_result(url)
+        return url
+
+    def _purge_expired(self):
+        """删除已过期的条目（需持有 _lock）"""
+        now = time.monotonic()
+        for digest in [d for d, (_, expires_at) in self._entries.items() if expires_at <= now]:
+            del self._entries[digest]
+
+
+# 全局单例
+_upload_cache = None
+
+
+def get_upload_cache() -> UploadCache:
+    """获取参考图片上传缓存单例"""
+    global _upload_cache
+    if _upload_cache is None:
+        _upload_cache = UploadCache(
+            ttl=get_config_manager().get_int(CONFIG_KEY_UPLOAD_CACHE_TTL, DEFAULT_UPLOAD_CACHE_TTL)
+        )
+    return _upload_cache
@@ -1,6 +1,8 @@
 
 # ==============即梦国际版 start ==============
 
+# 各模式的 ratio / quality 为界面选项，images 为最多参考图片数，
+# models 为对应的接口模型名，max_input_size 为参考图片有效的最大边长（像素），更大的图片上传前可以缩小
 JIMENG_INTL_IMAGE_MODE_MAP = {
     "Image 4.0": {
         "ratio":{
@@ -19,11 +21,15 @@ JIMENG_INTL_IMAGE_MODE_MAP = {
             1: "Ultra (4K)",
         },
         "images": 6,
+        "models": ["jimeng-4.5", "jimeng-4.1", "jimeng-4.0"],
+        "max_input_size": 4096,
     },
     "Nano Banana": {
         "ratio":{},
         "quality":{},
         "images": 3,
+        "models": ["nanobananapro", "nanobanana"],
+        "max_input_size": 2048,
     },
     "Image 3.1": {
         "ratio":{
@@ -41,6 +47,8 @@ JIMENG_INTL_IMAGE_MODE_MAP = {
             1: "High (2K)"
         },
         "images": 0,
+        "models": ["jimeng-3.1"],
+        "max_input_size": 2048,
     },
     "Image 3.0": {
         "ratio":{
@@ -58,6 +66,8 @@ JIMENG_INTL_IMAGE_MODE_MAP = {
             1: "High (2K)"
         },
         "images": 1,
+        "models": ["jimeng-3.0"],
+        "max_input_size": 2048,
     },
     "Image 2.0 Pro": {
         "ratio":{
@@ -72,6 +82,8 @@ JIMENG_INTL_IMAGE_MODE_MAP = {
         },
         "quality":{},
         "images": 1,
+        "models": ["jimeng-2.0-pro"],
+        "max_input_size": 2048,
     },
 }
 
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""
+批量插入
+
+按批执行 INSERT ... VALUES (...), (...)，每批一个事务，避免逐行插入时每行单独提交事务。
+每批的行数按 SQLite 的参数数量上限和列数计算；某一批违反约束（IntegrityError）时，
+这一批改为逐行插入并跳过出错的行，与原来逐行 create 时的结果一致
+"""
+import sqlite3
+from peewee import IntegrityError
+from app.database.db import db
+from app.utils.logger import log
+
+# 每批最多插入的行数（控制单个写事务的长度）
+BULK_INSERT_CHUNK_SIZE = 500
+
+# 单条语句的参数数量上限：SQLite 3.32 之前默认为 999，之后为 32766
+SQLITE_MAX_VARIABLES = 32766 if sqlite3.sqlite_version_info >= (3, 32, 0) else 999
+
+
+def get_chunk_size(column_count: int, max_rows: int = BULK_INSERT_CHUNK_SIZE) -> int:
+    """
+    计算每批插入的行数，保证一条 INSERT 的参数数量不超过 SQLite 上限
+
+    Args:
+        column_count: 每行的列数
+        max_rows: 每批最多行数
+
+    Returns:
+        int: 每批行数（至少为1）
+    """
+    return max(1, min(max_rows, SQLITE_MAX_VARIABLES // max(1, column_count)))
+
+
+def insert_many_chunked(model, rows: list, chunk_size: int = BULK_INSERT_CHUNK_SIZE, progress=None) -> list:
+    """
+    分批插入多行数据
+
+    Args:
+        model: 模型类（主键为自增整数）
+        rows: 行数据列表，每项为 {字段名: 值}，所有行的字段相同
+        chunk_size: 每批最多插入的行数（会按列数和参数上限再缩小）
+        progress: 进度回调(已处理行数, 总行数)，每批提交后调用
+
+    Returns:
+        list: 插入成功的行的主键列表（与 rows 顺序一致，违反约束的行被跳过）
+    """
+    ids = []
+    total = len(rows)
+    if not total:
+        return ids
+    database = model._meta.database or db
+    chunk_size = get_chunk_size(_count_insert_columns(model, rows[0]), chunk_size)
+    for start in range(0, total, chunk_size):
+        chunk = rows[start:start + chunk_size]
+        try:
+            with database.atomic('IMMEDIATE'):
+                last_id = model.insert_many(chunk).execute()
+            # 同一条 INSERT 语句在写锁内执行，自增主键连续分配，最后一行的主键为 last_insert_rowid
+            ids.extend(range(last_id - len(chunk) + 1, last_id + 1))
+        except IntegrityError as e:
+            log.warning(f"批量插入 {model._meta.table_name} 失败，改为逐行插入: {e}")
+            ids.extend(_insert_rows(database, model, chunk))
+        if progress:
+            progress(min(start + len(chunk), total), total)
+    return ids
+
+
+def _count_insert_columns(model, row: dict) -> int:
+    """INSERT 语句的列数：行中的字段，加上 peewee 自动填充默认值的字段"""
+    columns = {getattr(key, "name", key) for key in row}
+    columns.update(field.name for field in model._meta.defaults)
+    return len(columns)
+
+
+def _insert_rows(database, model, rows: list) -> list:
+    """在一个事务中逐行插入（每行一个保存点），跳过违反约束的行，返回插入成功的主键"""
+    ids = []
+    with database.atomic('IMMEDIATE'):
+        for row in rows:
+            try:
+                with database.atomic():
+                    ids.append(model.insert(row).execute())
+            except IntegrityError as e:
+                log.warning(f"插入 {model._meta.table_name} 失败，已跳过: {e}")
+    return ids
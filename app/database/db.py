@@ -1,9 +1,132 @@
 # -*- coding: utf-8 -*-
-from peewee import SqliteDatabase
+"""
+数据库实例
+
+界面线程、任务调度器和线程池中的工作线程共用同一个 SQLite 数据库：
+- 每个线程使用自己的连接（peewee 默认按线程保存连接状态，首次使用时自动连接）
+- 每个连接都会设置 WAL、synchronous=NORMAL、缓存和 mmap 等 PRAGMA，写入不再阻塞读取
+- 遇到 "database is locked" 时按指数退避重试
+
+参数可通过环境变量调整（见 get_db_settings）
+"""
+import os
+import random
+import time
+from peewee import SqliteDatabase, OperationalError
 from app.utils.path_helper import get_database_path
 
 # 数据库文件路径
 DB_PATH = get_database_path()
 
+# 默认数据库参数
+DEFAULT_DB_SETTINGS = {
+    "journal_mode": "wal",        # 日志模式：wal 允许读写并发
+    "synchronous": "normal",      # WAL 模式下 NORMAL 已足够安全，写入明显更快
+    "busy_timeout": 10.0,         # 等待其他连接释放锁的时间（秒）
+    "cache_size": -32000,         # 页缓存，负数表示 KiB（约 32MB）
+    "mmap_size": 268435456,       # 内存映射读取大小（256MB），0 表示关闭
+    "lock_retries": 5,            # busy_timeout 之后仍被锁定时的重试次数
+    "lock_retry_delay": 0.05,     # 首次重试等待时间（秒），之后指数增长
+}
+
+# 环境变量前缀，如 VIDEOROBOT_DB_JOURNAL_MODE=delete、VIDEOROBOT_DB_BUSY_TIMEOUT=30
+ENV_PREFIX = "VIDEOROBOT_DB_"
+
+
+def get_db_settings() -> dict:
+    """
+    获取数据库参数（默认值 + 环境变量覆盖）
+
+    Returns:
+        dict: 数据库参数
+    """
+    settings = dict(DEFAULT_DB_SETTINGS)
+    for key, default in DEFAULT_DB_SETTINGS.items():
+        value = os.getenv(ENV_PREFIX + key.upper())
+        if value is None or value == "":
+            continue
+        try:
+            settings[key] = type(default)(value)
+        except ValueError:
+            pass
+    return settings
+
+
+def is_locked_error(error: Exception) -> bool:
+    """是否为数据库被锁定（SQLITE_BUSY / SQLITE_LOCKED）错误"""
+    message = str(error).lower()
+    return "database is locked" in message or "database table is locked" in message
+
+
+class RetryingSqliteDatabase(SqliteDatabase):
+    """遇到数据库锁定时自动重试的 SqliteDatabase"""
+
+    def __init__(self, database, lock_retries: int = 5, lock_retry_delay: float = 0.05, **kwargs):
+        """
+        Args:
+            database: 数据库文件路径
+            lock_retries: 被锁定时的重试次数
+            lock_retry_delay: 首次重试等待时间（秒），之后指数增长
+            **kwargs: 传给 SqliteDatabase 的参数（pragmas、timeout 等）
+        """
+        super().__init__(database, **kwargs)
+        self.lock_retries = lock_retries
+        self.lock_retry_delay = lock_retry_delay
+
+    def _retry_locked(self, func, *args):
+        """执行 func，遇到锁定错误时退避重试"""
+        attempt = 0
+        while True:
+            try:
+                return func(*args)
+            except OperationalError as e:
+                if attempt >= self.lock_retries or not is_locked_error(e):
+                    raise
+                # 指数退避 + 随机抖动，避免多个线程同时重试
+                delay = self.lock_retry_delay * (2 ** attempt)
+                time.sleep(delay + random.uniform(0, delay))
+                attempt += 1
+
+    def execute_sql(self, sql, params=None):
+        # 事务中的语句失败需要由调用方回滚整个事务，只重试自动提交的单条语句
+        if self.in_transaction():
+            return super().execute_sql(sql, params)
+        return self._retry_locked(super().execute_sql, sql, params)
+
+    def begin(self, lock_type=None):
+        # BEGIN IMMEDIATE 获取写锁失败时事务尚未开始，可以安全重试。
+        # peewee 的 begin() 会调用 self.execute_sql（此时还不在事务中，也会重试），
+        # 这里直接用不重试的基类 execute_sql 发送 BEGIN，只在这一层重试
+        lock_type = lock_type or getattr(self, "_lock_type", None)
+        statement = f"BEGIN {lock_type}" if lock_type else "BEGIN"
+        return self._retry_locked(super().execute_sql, statement)
+
+
+def create_database(path: str = DB_PATH) -> RetryingSqliteDatabase:
+    """
+    按配置创建数据库实例
+
+    Args:
+        path: 数据库文件路径
+
+    Returns:
+        RetryingSqliteDatabase: 数据库实例
+    """
+    settings = get_db_settings()
+    pragmas = [
+        ("journal_mode", settings["journal_mode"]),
+        ("synchronous", settings["synchronous"]),
+        ("cache_size", settings["cache_size"]),
+        ("mmap_size", settings["mmap_size"]),
+    ]
+    return RetryingSqliteDatabase(
+        path,
+        pragmas=pragmas,
+        timeout=settings["busy_timeout"],
+        lock_retries=settings["lock_retries"],
+        lock_retry_delay=settings["lock_retry_delay"],
+    )
+
+
 # 创建数据库实例
-db = SqliteDatabase(DB_PATH)
\ No newline at end of file
+db = create_database(DB_PATH)
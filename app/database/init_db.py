@@ -1,5 +1,8 @@
 # -*- coding: utf-8 -*-
 from app.database.db import db, DB_PATH
+from app.database.migrations import run_migrations
+from app.database.task_state_writer import get_task_state_writer
+from app.database.query_service import get_db_query_service
 from app.models.config import Config
 from app.models.jimeng_account import JimengAccount
 from app.models.jimeng_image_task import JimengImageTask
@@ -7,6 +10,7 @@ from app.utils.logger import log
 from app.models.jimeng_intl_account import JimengIntlAccount
 from app.models.jimeng_intl_image_task import JimengIntlImageTask
 from app.models.jimeng_intl_video_task import JimengIntlVideoTask
+from app.models.table_row_count import TableRowCount
 
 
 def init_database():
@@ -19,10 +23,17 @@ def init_database():
         else:
             log.info(f"数据库已连接: {DB_PATH}")
 
+        journal_mode = db.execute_sql("PRAGMA journal_mode").fetchone()[0]
+        log.info(f"数据库日志模式: {journal_mode}")
+
         # 创建表
-        db.create_tables([Config, JimengAccount, JimengImageTask, JimengIntlAccount, JimengIntlImageTask, JimengIntlVideoTask], safe=True)
+        db.create_tables([Config, JimengAccount, JimengImageTask, JimengIntlAccount, JimengIntlImageTask, JimengIntlVideoTask, TableRowCount], safe=True)
         log.info("数据库表创建成功")
 
+        # 执行数据库结构迁移（补充字段、创建索引）
+        version = run_migrations(db)
+        log.info(f"数据库结构版本: {version}")
+
     except Exception as e:
         log.error(f"数据库初始化失败: {e}")
         raise
@@ -30,6 +41,9 @@ def init_database():
 
 def close_database():
     """关闭数据库连接"""
+    # 先执行完界面提交的查询，再写入尚未提交的任务状态
+    get_db_query_service().stop(timeout=5)
+    get_task_state_writer().stop(timeout=5)
     if not db.is_closed():
         db.close()
         log.info("数据库连接已关闭")
@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+"""
+键集分页（keyset pagination）
+
+按 (时间, id) 倒序分页，用上一页最后一行的 (时间, id) 作为游标定位下一页，
+不使用 OFFSET，任意一页的耗时都与页码和总行数无关
+"""
+
+
+def keyset_page(query, time_field, id_field, cursor=None, page_size: int = 20) -> list:
+    """
+    获取游标之后的一页数据
+
+    分两次查询：先取与游标时间相同、id 更小的行（批量创建的任务时间相同），不够一页再取时间更早的行，
+    两次查询都能直接在 (条件列, 时间) 索引上定位（索引隐含 rowid），不会扫描已经显示过的行
+
+    Args:
+        query: 已添加筛选条件的查询（不含排序和分页）
+        time_field: 时间字段，如 JimengIntlImageTask.create_at
+        id_field: 主键字段
+        cursor: 上一页最后一行的 (时间, id)，None 表示第一页
+        page_size: 每页数量
+
+    Returns:
+        list: 本页数据
+    """
+    order = (time_field.desc(), id_field.desc())
+    if cursor is None:
+        return list(query.order_by(*order).limit(page_size))
+
+    cursor_time, cursor_id = cursor
+    rows = list(query.where((time_field == cursor_time) & (id_field < cursor_id))
+                .order_by(*order).limit(page_size))
+    if len(rows) < page_size:
+        rows += list(query.where(time_field < cursor_time).order_by(*order).limit(page_size - len(rows)))
+    return rows
@@ -0,0 +1,276 @@
+# -*- coding: utf-8 -*-
+"""
+数据库版本迁移
+
+当前结构版本保存在 SQLite 的 PRAGMA user_version 中，init_database 建表后按版本号顺序
+执行尚未执行过的迁移步骤，每个步骤在独立事务中执行并在同一事务中更新版本号。
+
+新增迁移：在文件末尾用 @migration(下一个版本号, "说明") 注册一个函数，不要修改已发布的步骤
+"""
+from playhouse.migrate import SqliteMigrator, migrate
+from app.utils.logger import log
+
+# 已注册的迁移步骤：[(版本号, 说明, 函数)]
+MIGRATIONS = []
+
+
+def migration(version: int, description: str):
+    """
+    注册迁移步骤的装饰器
+
+    Args:
+        version: 版本号（从1开始连续递增）
+        description: 说明
+    """
+    def decorator(func):
+        if any(v == version for v, _, _ in MIGRATIONS):
+            raise ValueError(f"重复的数据库迁移版本号: {version}")
+        MIGRATIONS.append((version, description, func))
+        return func
+    return decorator
+
+
+def get_schema_version(database) -> int:
+    """获取数据库当前结构版本"""
+    return database.execute_sql("PRAGMA user_version").fetchone()[0]
+
+
+def set_schema_version(database, version: int):
+    """设置数据库结构版本（PRAGMA 不支持参数绑定，版本号必须是整数）"""
+    database.execute_sql(f"PRAGMA user_version = {int(version)}")
+
+
+def get_latest_version() -> int:
+    """获取已注册迁移的最新版本号"""
+    return max((v for v, _, _ in MIGRATIONS), default=0)
+
+
+def run_migrations(database) -> int:
+    """
+    执行所有未执行的迁移步骤
+
+    Args:
+        database: 数据库实例
+
+    Returns:
+        int: 迁移后的结构版本
+    """
+    current = get_schema_version(database)
+    pending = sorted((m for m in MIGRATIONS if m[0] > current), key=lambda m: m[0])
+    if not pending:
+        log.debug(f"数据库结构已是最新版本: {current}")
+        return current
+
+    for version, description, func in pending:
+        log.info(f"执行数据库迁移 v{version}: {description}")
+        with database.atomic():
+            func(database)
+            set_schema_version(database, version)
+
+    log.info(f"数据库结构已从 v{current} 升级到 v{pending[-1][0]}")
+    return pending[-1][0]
+
+
+def add_missing_columns(database, models, column_names):
+    """
+    为已存在的表补充指定的可空字段（create_tables 不会修改已存在的表，已有的字段跳过）
+
+    每个迁移步骤写明自己新增的字段，不按模型当前的全部字段补充：否则旧步骤会提前加上后续版本的字段
+
+    Args:
+        database: 数据库实例
+        models: 模型类列表
+        column_names: 字段名列表，字段定义取自模型
+    """
+    migrator = SqliteMigrator(database)
+    operations = []
+    for model in models:
+        table_name = model._meta.table_name
+        existing_columns = {column.name for column in database.get_columns(table_name)}
+        for column_name in column_names:
+            field = model._meta.columns[column_name]
+            if not field.null:
+                raise ValueError(f"只能用 ADD COLUMN 补充可空字段: {table_name}.{column_name}")
+            if column_name not in existing_columns:
+                operations.append(migrator.add_column(table_name, column_name, field))
+                log.info(f"数据库表 {table_name} 新增字段: {column_name}")
+
+    if operations:
+        migrate(*operations)
+
+
+def create_indexes(database, statements):
+    """
+    创建索引（已存在则跳过）
+
+    Args:
+        database: 数据库实例
+        statements: [(索引名, 表名, 列定义)]
+    """
+    for name, table, columns in statements:
+        database.execute_sql(f'CREATE INDEX IF NOT EXISTS "{name}" ON "{table}" ({columns})')
+
+
+# ============== 迁移步骤 ==============
+
+@migration(1, "国际版任务表补充租约字段")
+def _add_task_lease_columns(database):
+    from app.models.jimeng_intl_image_task import JimengIntlImageTask
+    from app.models.jimeng_intl_video_task import JimengIntlVideoTask
+    add_missing_columns(database, [JimengIntlImageTask, JimengIntlVideoTask], ["lease_owner", "lease_expires_at"])
+
+
+@migration(2, "任务表和账号表的常用查询索引")
+def _add_query_indexes(database):
+    statements = []
+    for table in ("jimeng_intl_image_task", "jimeng_intl_video_task"):
+        statements += [
+            # 列表分页：isdel = 0 ORDER BY create_at DESC
+            (f"idx_{table}_isdel_create_at", table, '"isdel", "create_at"'),
+            # 调度器认领（status = 0 AND isdel = 0 ORDER BY create_at）、按状态筛选和统计
+            (f"idx_{table}_status_isdel_create_at", table, '"status", "isdel", "create_at"'),
+            # 租约回收：status = 1 AND lease_expires_at < 当前时间
+            (f"idx_{table}_status_lease", table, '"status", "lease_expires_at"'),
+        ]
+    statements += [
+        # 旧版任务表：按账号和状态统计、按时间分页
+        ("idx_jimeng_image_tasks_account_status", "jimeng_image_tasks", '"account_id", "status"'),
+        ("idx_jimeng_image_tasks_created_at", "jimeng_image_tasks", '"created_at"'),
+        # 可用账号查询：按类型、删除状态筛选，按积分排序
+        ("idx_jimeng_intl_account_available", "jimeng_intl_account",
+         '"account_type", "is_deleted", "points", "disabled_at"'),
+    ]
+    create_indexes(database, statements)
+    database.execute_sql("ANALYZE")
+
+
+def create_row_count_triggers(database, table: str, condition: str, bucket: str, columns: str):
+    """
+    创建维护 table_row_count 的触发器，并按当前数据重新统计
+
+    触发器在数据库内执行，其他进程和批量 UPDATE（任务认领、租约回收）修改的行也会被统计
+
+    Args:
+        database: 数据库实例
+        table: 数据表名
+        condition: 行是否计入统计的条件，{row} 替换为 NEW / OLD，如 '{row}."isdel" = 0'
+        bucket: 分组表达式，{row} 替换为 NEW / OLD，如 'CAST({row}."status" AS TEXT)'
+        columns: 影响统计的列，修改这些列时才触发，如 '"status", "isdel"'
+    """
+    def increment(row, delta):
+        value = bucket.format(row=row)
+        return (
+            f"INSERT OR IGNORE INTO \"table_row_count\" (\"source_table\", \"bucket\", \"row_count\") "
+            f"SELECT '{table}', {value}, 0 WHERE {condition.format(row=row)}; "
+            f"UPDATE \"table_row_count\" SET \"row_count\" = \"row_count\" + ({delta}) "
+            f"WHERE \"source_table\" = '{table}' AND \"bucket\" = {value} AND {condition.format(row=row)};"
+        )
+
+    changed = " OR ".join(
+        f"OLD.{column} IS NOT NEW.{column}" for column in (c.strip() for c in columns.split(","))
+    )
+    database.execute_sql(
+        f'CREATE TRIGGER IF NOT EXISTS "trg_{table}_count_insert" AFTER INSERT ON "{table}" '
+        f"BEGIN {increment('NEW', 1)} END"
+    )
+    database.execute_sql(
+        f'CREATE TRIGGER IF NOT EXISTS "trg_{table}_count_delete" AFTER DELETE ON "{table}" '
+        f"BEGIN {increment('OLD', -1)} END"
+    )
+    database.execute_sql(
+        f'CREATE TRIGGER IF NOT EXISTS "trg_{table}_count_update" AFTER UPDATE OF {columns} ON "{table}" '
+        f"WHEN {changed} BEGIN {increment('OLD', -1)} {increment('NEW', 1)} END"
+    )
+
+    database.execute_sql('DELETE FROM "table_row_count" WHERE "source_table" = ?', (table,))
+    rows = f'SELECT * FROM "{table}" AS "t" WHERE {condition.format(row="t")}'
+    database.execute_sql(
+        f'INSERT INTO "table_row_count" ("source_table", "bucket", "row_count") '
+        f"SELECT '{table}', {bucket.format(row='r')}, COUNT(*) FROM ({rows}) AS \"r\" GROUP BY 2"
+    )
+
+
+@migration(3, "触发器维护任务表和账号表的行数统计")
+def _add_row_count_triggers(database):
+    from app.models.table_row_count import TableRowCount
+    TableRowCount.create_table(safe=True)
+
+    for table in ("jimeng_intl_image_task", "jimeng_intl_video_task"):
+        create_row_count_triggers(database, table, '{row}."isdel" = 0',
+                                  'CAST({row}."status" AS TEXT)', '"status", "isdel"')
+    create_row_count_triggers(database, "jimeng_image_tasks", "1",
+                              '{row}."status"', '"status"')
+    for table in ("jimeng_intl_account", "jimeng_account"):
+        create_row_count_triggers(database, table, '{row}."is_deleted" = 0', "''", '"is_deleted"')
+        # 账号列表键集分页：is_deleted = 0 ORDER BY created_at DESC, id DESC
+        create_indexes(database, [(f"idx_{table}_deleted_created_at", table, '"is_deleted", "created_at"')])
+
+
+def create_change_seq_triggers(database, table: str, columns: str):
+    """
+    创建维护 change_seq 的触发器：插入行或 columns 中的列变化后，把该行的 change_seq 设为表内最大值+1
+
+    写事务串行执行，序号按提交顺序单调递增，界面用 change_seq > 上次看到的最大值 查询变化的行不会遗漏
+
+    Args:
+        database: 数据库实例
+        table: 数据表名
+        columns: 界面关心的列，如 '"status", "code", "message"'
+    """
+    def bump(current_max):
+        return f'UPDATE "{table}" SET "change_seq" = {current_max} + 1 WHERE "id" = NEW."id";'
+
+    table_max = f'(SELECT COALESCE(MAX("change_seq"), 0) FROM "{table}")'
+    changed = " OR ".join(
+        f"OLD.{column} IS NOT NEW.{column}" for column in (c.strip() for c in columns.split(","))
+    )
+    database.execute_sql(
+        f'CREATE TRIGGER IF NOT EXISTS "trg_{table}_change_seq_insert" AFTER INSERT ON "{table}" '
+        f"BEGIN {bump(table_max)} END"
+    )
+    # 整行保存可能把 change_seq 写回旧值，此时也重新分配序号；该行原来就是最大序号时表内最大值已经变小，
+    # 所以同时与 OLD.change_seq 比较，保证新序号大于界面已经看到的序号
+    database.execute_sql(
+        f'CREATE TRIGGER IF NOT EXISTS "trg_{table}_change_seq_update" AFTER UPDATE ON "{table}" '
+        f'WHEN {changed} OR NEW."change_seq" < OLD."change_seq" '
+        f'BEGIN {bump(f"MAX({table_max}, OLD.change_seq)")} END'
+    )
+
+
+@migration(4, "国际版任务表增加变更序号")
+def _add_task_change_seq(database):
+    from app.models.jimeng_intl_image_task import JimengIntlImageTask
+    from app.models.jimeng_intl_video_task import JimengIntlVideoTask
+
+    for model, outputs in ((JimengIntlImageTask, "output_images"), (JimengIntlVideoTask, "output_videos")):
+        table = model._meta.table_name
+        if "change_seq" not in {column.name for column in database.get_columns(table)}:
+            # 直接 ADD COLUMN ... NOT NULL DEFAULT 0：SqliteMigrator.add_column 添加非空字段时会重建整张表，
+            # 重建会删除 v3 创建的行数统计触发器
+            database.execute_sql(f'ALTER TABLE "{table}" ADD COLUMN "change_seq" INTEGER NOT NULL DEFAULT 0')
+        database.execute_sql(f'UPDATE "{table}" SET "change_seq" = "id"')
+        create_indexes(database, [(f"idx_{table}_change_seq", table, '"change_seq"')])
+        create_change_seq_triggers(
+            database, table,
+            f'"status", "code", "message", "{outputs}", "account_id", "isdel", "prompt"'
+        )
+
+
+@migration(5, "国际版任务表增加远程任务ID")
+def _add_remote_task_id(database):
+    from app.models.jimeng_intl_image_task import JimengIntlImageTask
+    from app.models.jimeng_intl_video_task import JimengIntlVideoTask
+    add_missing_columns(database, [JimengIntlImageTask, JimengIntlVideoTask], ["remote_task_id"])
+
+
+@migration(6, "国际版任务表的待认领任务部分索引")
+def _add_claim_partial_index(database):
+    for table in ("jimeng_intl_image_task", "jimeng_intl_video_task"):
+        # 调度器认领：status = 0 AND isdel = 0 ORDER BY create_at, id，只需要 id 和 account_id。
+        # 部分索引只包含排队中的任务，不随已完成任务增长；status、isdel 在索引中是常量，保留在开头是为了让
+        # 查询计划在等值条件上与 v2 的状态索引持平，再因为覆盖了查询的列而选中本索引
+        database.execute_sql(
+            f'CREATE INDEX IF NOT EXISTS "idx_{table}_claim" ON "{table}" '
+            f'("status", "isdel", "create_at", "id", "account_id") WHERE "status" = 0 AND "isdel" = 0'
+        )
+    database.execute_sql("ANALYZE")
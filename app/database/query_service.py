@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+"""
+数据库查询服务
+
+界面的查询和修改提交到一个专用线程中按提交顺序执行，界面线程不再直接访问数据库，
+工作进程大量写入时等待锁的是查询线程而不是界面。
+带 key 的请求还没开始执行时，同 key 的新请求会合并到它上面（使用最新的参数，共用同一个结果），
+完成回调保存在请求上，合并进来的每个调用方的回调都会执行（相同的回调只执行一次）
+"""
+import threading
+from collections import deque
+from concurrent.futures import Future
+from app.utils.logger import log
+
+
+class _QueryRequest:
+    """一次排队中的查询"""
+
+    def __init__(self, func, args, kwargs, key):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.key = key
+        self.future = Future()
+        # 完成回调(结果, 异常)，只在请求排队期间（持有锁时）添加
+        self.callbacks = []
+
+    def add_callback(self, callback):
+        """添加完成回调，相同的回调只保留一个"""
+        if callback is not None and callback not in self.callbacks:
+            self.callbacks.append(callback)
+
+
+class DbQueryService:
+    """数据库查询服务（线程安全，不依赖 Qt）"""
+
+    def __init__(self):
+        self._queue = deque()
+        # key -> 还没开始执行的请求
+        self._queued_by_key = {}
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stopped = False
+
+    def submit(self, func, *args, key=None, callback=None, **kwargs) -> Future:
+        """
+        提交查询
+
+        Args:
+            func: 在查询线程中执行的函数，如 JimengIntlImageTask.get_tasks_after
+            *args: 位置参数
+            key: 合并键，同 key 的请求还在排队时只执行最新的一次，None 表示不合并
+            callback: 完成回调(结果, 异常)，在查询线程中执行；合并的请求各自的回调都会执行
+            **kwargs: 关键字参数
+
+        Returns:
+            Future: 查询结果
+        """
+        with self._cond:
+            if self._stopped:
+                request = None
+            else:
+                request = self._queued_by_key.get(key) if key is not None else None
+                if request is not None:
+                    # 还没有开始执行：改为最新的参数，调用方共用同一个结果
+                    request.func, request.args, request.kwargs = func, args, kwargs
+                    request.add_callback(callback)
+                    return request.future
+
+                request = _QueryRequest(func, args, kwargs, key)
+                request.add_callback(callback)
+                self._queue.append(request)
+                if key is not None:
+                    self._queued_by_key[key] = request
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="db-query", daemon=True)
+                    self._thread.start()
+                self._cond.notify()
+                return request.future
+
+        # 服务已停止（程序退出中），直接在调用线程执行
+        request = _QueryRequest(func, args, kwargs, None)
+        request.add_callback(callback)
+        self._execute(request)
+        return request.future
+
+    def stop(self, timeout: float = None):
+        """
+        停止查询线程，已提交的查询执行完后返回
+
+        Args:
+            timeout: 最长等待秒数
+        """
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def _run(self):
+        """查询线程主循环"""
+        while True:
+            with self._cond:
+                while not self._queue and not self._stopped:
+                    self._cond.wait()
+                if not self._queue:
+                    return
+                request = self._queue.popleft()
+                if request.key is not None:
+                    self._queued_by_key.pop(request.key, None)
+            self._execute(request)
+
+    @staticmethod
+    def _execute(request: _QueryRequest):
+        if not request.future.set_running_or_notify_cancel():
+            return
+        result = error = None
+        try:
+            result = request.func(*request.args, **request.kwargs)
+        except Exception as e:
+            log.debug(f"数据库查询失败: {getattr(request.func, '__name__', request.func)}: {e}")
+            error = e
+        if error is None:
+            request.future.set_result(result)
+        else:
+            request.future.set_exception(error)
+
+        # 请求已出队，不会再合并新的回调
+        for callback in request.callbacks:
+            try:
+                callback(result, error)
+            except Exception as e:
+                log.error(f"数据库查询回调执行失败: {e}")
+
+
+# 全局单例
+_db_query_service = None
+
+
+def get_db_query_service() -> DbQueryService:
+    """获取数据库查询服务单例"""
+    global _db_query_service
+    if _db_query_service is None:
+        _db_query_service = DbQueryService()
+    return _db_query_service
@@ -0,0 +1,338 @@
+# -*- coding: utf-8 -*-
+"""
+任务状态批量写入器（write-behind + group commit）
+
+工作线程不再各自执行 task.save()（每次整行 UPDATE 并单独提交一个事务），
+而是把状态变化提交给写入器：
+- 只写入修改过的字段（peewee 的 dirty_fields）
+- 同一任务尚未写入的多次修改合并为一次
+- 后台线程每隔几毫秒把所有线程提交的修改放在一个事务中写入，
+  几十个线程同时执行时事务数（锁竞争、WAL 提交）减少一个数量级
+
+wait=True 时调用方等待包含本次修改的事务提交后返回（其他线程、界面和租约回收都能读到），
+用于任务结束等后续逻辑依赖数据库状态的场景；中间状态可以用 wait=False 不等待。
+某个事务写入失败时改为逐行写入，只有仍然失败的行会在退避等待后重试，多次失败后才放弃并记录任务ID，
+等待中的调用方只会收到自己那一行的错误。
+
+有租约字段的任务按提交时实例上的租约持有者条件更新：租约过期被其他调度器回收后，
+原执行者排队中的修改不会覆盖新执行者的状态
+"""
+import threading
+import time
+from datetime import datetime
+from app.utils.logger import log
+
+# 默认合并等待时间（秒）：收到第一条修改后等待这么久再提交，期间到达的修改一起写入
+DEFAULT_FLUSH_INTERVAL = 0.005
+# 单个事务最多写入的行数
+DEFAULT_MAX_BATCH = 500
+# 一行修改最多尝试写入的次数，超过后放弃并记录日志
+MAX_WRITE_ATTEMPTS = 3
+# 写入失败后第一次重试前的等待时间（秒），之后每次翻倍
+RETRY_BACKOFF = 0.1
+
+# 键中的租约持有者：不按租约条件更新（模型没有租约字段，或本次修改了租约字段）
+_UNGUARDED = object()
+
+
+class StaleLeaseError(Exception):
+    """任务租约已被其他调度器回收，本次修改没有写入"""
+
+
+class _Batch:
+    """一次批量写入，flush() 通过它等待写入完成"""
+
+    __slots__ = ("done",)
+
+    def __init__(self):
+        self.done = threading.Event()
+
+
+class _Waiter:
+    """等待某一行写入结果的调用方"""
+
+    __slots__ = ("done", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.error = None
+
+
+class _PendingWrite:
+    """一行待写入的修改"""
+
+    __slots__ = ("values", "waiters", "attempts", "retry_at")
+
+    def __init__(self):
+        self.values = {}
+        self.waiters = []
+        self.attempts = 0
+        self.retry_at = 0  # time.monotonic() 时间，之前不写入（失败后的退避等待）
+
+
+class TaskStateWriter:
+    """任务状态批量写入器（线程安全）"""
+
+    def __init__(self, database=None, flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+                 max_batch: int = DEFAULT_MAX_BATCH):
+        """
+        初始化写入器（首次提交修改时启动后台线程）
+
+        Args:
+            database: 数据库实例，默认使用全局 db
+            flush_interval: 合并等待时间（秒）
+            max_batch: 单个事务最多写入的行数
+        """
+        if database is None:
+            from app.database.db import db
+            database = db
+        self.database = database
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+
+        self._cond = threading.Condition()
+        # (模型类, 主键, 租约持有者) -> _PendingWrite，按提交顺序保存（dict 保持插入顺序）
+        self._pending = {}
+        # 当前正在收集修改的批次
+        self._batch = _Batch()
+        self._thread = None
+        self._stopping = False
+
+    def save(self, instance, wait: bool = True, timeout: float = None) -> bool:
+        """
+        提交模型实例中修改过的字段
+
+        Args:
+            instance: 模型实例（必须已存在于数据库中）
+            wait: 是否等待写入完成
+            timeout: 最长等待时间（秒），None 表示一直等待
+
+        Returns:
+            bool: 是否有需要写入的字段；wait=True 时写入失败会抛出异常
+
+        Raises:
+            StaleLeaseError: wait=True 且任务租约已被其他调度器回收
+            TimeoutError: wait=True 且超过 timeout 仍未写入
+        """
+        model = type(instance)
+        fields = instance.dirty_fields
+        if not fields:
+            return False
+
+        values = {field: instance.__data__.get(field.name) for field in fields}
+        update_at = model._meta.fields.get("update_at")
+        if update_at is not None and update_at not in values:
+            values[update_at] = datetime.now()
+            instance.update_at = values[update_at]
+        instance._dirty.clear()
+
+        # 实例上的租约持有者（认领时读出）作为更新条件；本次修改了租约字段时不加条件
+        guarded = "lease_owner" in model._meta.fields and all(field.name != "lease_owner" for field in fields)
+        lease_owner = instance.lease_owner if guarded else _UNGUARDED
+
+        key = (model, instance._pk, lease_owner)
+        waiter = _Waiter() if wait else None
+        with self._cond:
+            stopped = self._stopping
+            if not stopped:
+                self._ensure_started()
+                entry = self._pending.get(key)
+                if entry is None:
+                    entry = self._pending[key] = _PendingWrite()
+                entry.values.update(values)
+                if waiter is not None:
+                    entry.waiters.append(waiter)
+                self._cond.notify()
+
+        if stopped:
+            # 写入器已停止（程序退出中），直接写入
+            if self._write({key: values}) and wait:
+                raise self._stale_error(key)
+            return True
+
+        if waiter is not None:
+            if not waiter.done.wait(timeout):
+                raise TimeoutError(f"等待任务状态写入超时: {model.__name__} {instance._pk}")
+            if waiter.error is not None:
+                raise waiter.error
+        return True
+
+    def flush(self, timeout: float = None) -> bool:
+        """
+        等待已提交的修改全部写入
+
+        Args:
+            timeout: 最长等待时间（秒），None 表示一直等待
+
+        Returns:
+            bool: 是否在超时前写入完成
+        """
+        with self._cond:
+            if not self._pending:
+                return True
+            batch = self._batch
+            self._cond.notify()
+        return batch.done.wait(timeout)
+
+    def stop(self, timeout: float = None):
+        """
+        写入剩余修改并停止后台线程（之后提交的修改直接写入）
+
+        Args:
+            timeout: 最长等待时间（秒）
+        """
+        with self._cond:
+            self._stopping = True
+            thread = self._thread
+            self._cond.notify()
+        if thread is not None:
+            thread.join(timeout)
+
+    def _ensure_started(self):
+        """启动后台写入线程（需持有锁）"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="task-state-writer", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        """后台写入线程"""
+        while True:
+            with self._cond:
+                while True:
+                    if not self._pending and self._stopping:
+                        self._thread = None
+                        return
+                    delay = self._next_retry_delay()
+                    if delay is not None and (delay <= 0 or self._stopping):
+                        break
+                    self._cond.wait(delay)
+
+            # 等待一小段时间，让其他线程的修改进入同一个事务
+            if self.flush_interval > 0 and not self._stopping:
+                time.sleep(self.flush_interval)
+
+            with self._cond:
+                pending = self._take_due()
+                batch, self._batch = self._batch, _Batch()
+
+            # 每个事务最多写入 max_batch 行，避免长时间持有写锁
+            items = list(pending.items())
+            for start in range(0, len(items), self.max_batch):
+                self._write_chunk(items[start:start + self.max_batch])
+            batch.done.set()
+
+    def _next_retry_delay(self):
+        """距离最早一行可以写入还要等待的时间（秒），没有待写入的修改时返回 None（需持有锁）"""
+        if not self._pending:
+            return None
+        return min(entry.retry_at for entry in self._pending.values()) - time.monotonic()
+
+    def _take_due(self) -> dict:
+        """取出退避等待已结束的修改，停止中时全部取出（需持有锁）"""
+        now = time.monotonic()
+        due = {}
+        for key in list(self._pending):
+            if self._stopping or self._pending[key].retry_at <= now:
+                due[key] = self._pending.pop(key)
+        return due
+
+    def _write_chunk(self, items: list):
+        """写入一组修改；事务失败时逐行写入，只有仍然失败的行重新排队或放弃"""
+        if len(items) > 1:
+            try:
+                stale = set(self._write({key: entry.values for key, entry in items}))
+            except Exception as e:
+                log.warning(f"批量写入任务状态失败（{len(items)} 条），改为逐行写入: {e}")
+            else:
+                for key, entry in items:
+                    self._finish_write(key, entry, key in stale)
+                return
+
+        for key, entry in items:
+            try:
+                stale = self._write({key: entry.values})
+            except Exception as e:
+                self._retry_or_drop(key, entry, e)
+            else:
+                self._finish_write(key, entry, bool(stale))
+
+    def _finish_write(self, key, entry: _PendingWrite, stale: bool):
+        """写入完成的一行：租约已被回收时丢弃修改，通知等待方"""
+        if not stale:
+            self._finish(entry)
+            return
+        error = self._stale_error(key)
+        log.warning(f"{error}，丢弃修改: 字段={[field.name for field in entry.values]}")
+        self._finish(entry, error)
+
+    @staticmethod
+    def _stale_error(key) -> StaleLeaseError:
+        model, pk, lease_owner = key
+        return StaleLeaseError(f"任务租约已不属于 {lease_owner}: {model.__name__} ID={pk}")
+
+    def _retry_or_drop(self, key, entry: _PendingWrite, error: Exception):
+        """
+        写入失败的一行：未超过重试次数时放回队列，退避等待后重试（之后提交的修改优先），否则放弃并通知等待方
+        """
+        model, pk, _ = key
+        entry.attempts += 1
+        if entry.attempts < MAX_WRITE_ATTEMPTS:
+            delay = RETRY_BACKOFF * 2 ** (entry.attempts - 1)
+            log.warning(f"写入任务状态失败，{delay:.1f} 秒后重试（第 {entry.attempts} 次）: "
+                        f"{model.__name__} ID={pk}, 错误: {error}")
+            with self._cond:
+                newer = self._pending.pop(key, None)
+                if newer is not None:
+                    entry.values.update(newer.values)
+                    entry.waiters.extend(newer.waiters)
+                entry.retry_at = time.monotonic() + delay
+                self._pending[key] = entry
+                self._cond.notify()
+            return
+
+        log.error(f"写入任务状态失败，已放弃: {model.__name__} ID={pk}, 字段="
+                  f"{[field.name for field in entry.values]}, 错误: {error}")
+        self._finish(entry, error)
+
+    @staticmethod
+    def _finish(entry: _PendingWrite, error: Exception = None):
+        """通知等待这一行的调用方"""
+        for waiter in entry.waiters:
+            waiter.error = error
+            waiter.done.set()
+
+    def _write(self, pending: dict) -> list:
+        """
+        在一个事务中写入所有修改
+
+        Args:
+            pending: {(模型类, 主键, 租约持有者): {字段: 值}}
+
+        Returns:
+            list: 租约已被其他调度器回收（持有者不一致）而没有更新任何行的键
+        """
+        stale = []
+        with self.database.atomic('IMMEDIATE'):
+            for key, values in pending.items():
+                model, pk, lease_owner = key
+                query = model.update(values).where(model._meta.primary_key == pk)
+                if lease_owner is not _UNGUARDED:
+                    # lease_owner 为 None（未认领的任务）时 peewee 生成 IS NULL
+                    query = query.where(model.lease_owner == lease_owner)
+                    if query.execute() == 0:
+                        stale.append(key)
+                else:
+                    query.execute()
+        return stale
+
+
+# 全局单例
+_task_state_writer = None
+
+
+def get_task_state_writer() -> TaskStateWriter:
+    """获取任务状态写入器单例"""
+    global _task_state_writer
+    if _task_state_writer is None:
+        _task_state_writer = TaskStateWriter()
+    return _task_state_writer
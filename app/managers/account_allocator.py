@@ -3,11 +3,158 @@
 账号分配管理器
 负责为任务自动分配合适的账号
 """
-from typing import Optional
+import bisect
+import heapq
+import threading
+import time
+from typing import Callable, Optional
+from app.models.config import Config
 from app.models.jimeng_account import JimengAccount
+from app.models.jimeng_intl_account import JimengIntlAccount
 from app.models.jimeng_image_task import JimengImageTask
 from app.utils.logger import log
 
+# 内存计数表与数据库重新对齐的间隔（秒），兜底其他进程或直接写库造成的偏差
+COUNTER_RESYNC_INTERVAL = 300
+# 计入“忙碌”的任务状态
+ACTIVE_STATUSES = ('pending', 'processing')
+# 轮询游标写入配置表的最小间隔（秒）
+CURSOR_CHECKPOINT_INTERVAL = 5
+# 账号环从数据库重新加载的间隔（秒），兜底其他进程或直接写库增删、禁用的账号
+RING_REFRESH_INTERVAL = 60
+
+
+class AccountRing:
+    """
+    账号环：按账号ID排序的循环列表 + 轮询游标
+
+    本进程的账号增删改通过模型的变化监听器增量更新，其他进程的修改在定期重新加载时生效；
+    分配时从游标位置向后取下一个账号，不需要查询数据库；游标定期写入配置表，重启后从上次的位置继续轮询
+    """
+
+    def __init__(self, name: str, account_model, refresh_interval: float = RING_REFRESH_INTERVAL):
+        """
+        初始化账号环（首次分配时从数据库加载）
+
+        Args:
+            name: 环名称，用于配置表中的游标键名
+            account_model: 账号模型（JimengAccount / JimengIntlAccount）
+            refresh_interval: 从数据库重新加载账号的间隔（秒）
+        """
+        self.name = name
+        self.account_model = account_model
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._ids = []  # 按ID升序排列的账号ID
+        self._accounts = {}  # 账号ID -> 账号对象
+        self._cursor = -1  # 上一次分配的账号在 _ids 中的下标
+        self._loaded_at = None
+        self._checkpoint_id = None
+        self._checkpoint_at = 0
+
+        account_model.add_change_listener(self.on_account_changed)
+
+    @property
+    def config_key(self) -> str:
+        """游标在配置表中的键名"""
+        return f"account_rr_cursor_{self.name}"
+
+    def _ensure_loaded(self):
+        """
+        首次使用或到达重新加载间隔时加载所有未删除的账号（需持有锁）
+
+        首次加载恢复配置表中保存的游标，之后重新加载时游标保持在上一次分配的账号上
+        """
+        if self._loaded_at is not None and time.monotonic() - self._loaded_at < self.refresh_interval:
+            return
+
+        if self._loaded_at is not None:
+            last_id = self._ids[self._cursor] if 0 <= self._cursor < len(self._ids) else 0
+        else:
+            try:
+                last_id = int(Config.get_value(self.config_key, 0) or 0)
+            except (TypeError, ValueError):
+                last_id = 0
+            self._checkpoint_id = last_id or None
+
+        model = self.account_model
+        accounts = list(model.select().where(model.is_deleted == 0).order_by(model.id.asc()))
+        self._ids = [account.id for account in accounts]
+        self._accounts = {account.id: account for account in accounts}
+        # 游标指向不大于上次分配账号ID的位置（该账号已删除时从其后一个账号继续）
+        self._cursor = bisect.bisect_right(self._ids, last_id) - 1 if last_id else -1
+        self._loaded_at = time.monotonic()
+    def next(self, accept: Optional[Callable] = None):
+        """
+        从游标位置向后取下一个账号并移动游标
+
+        Args:
+            accept: 过滤函数(账号) -> bool，跳过不满足条件的账号（可选）
+
+        Returns:
+            账号对象（账号环缓存的共享对象，只读）；没有满足条件的账号时返回 None
+        """
+        with self._lock:
+            self._ensure_loaded()
+
+            count = len(self._ids)
+            for step in range(1, count + 1):
+                index = (self._cursor + step) % count
+                account = self._accounts[self._ids[index]]
+                if accept is None or accept(account):
+                    self._cursor = index
+                    self._checkpoint_if_due(account.id)
+                    return account
+            return None
+
+    def _checkpoint_if_due(self, account_id: int):
+        """到达间隔时把游标写入配置表（需持有锁）"""
+        if account_id == self._checkpoint_id or time.monotonic() - self._checkpoint_at < CURSOR_CHECKPOINT_INTERVAL:
+            return
+        try:
+            Config.set_value(self.config_key, str(account_id))
+            self._checkpoint_id = account_id
+            self._checkpoint_at = time.monotonic()
+        except Exception as e:
+            log.warning(f"保存账号轮询游标失败: {e}")
+
+    def flush(self):
+        """立即把游标写入配置表（如退出前）"""
+        with self._lock:
+            if self._loaded_at is None or self._cursor < 0 or not self._ids:
+                return
+            self._checkpoint_at = 0
+            self._checkpoint_if_due(self._ids[self._cursor])
+
+    def on_account_changed(self, account):
+        """
+        账号新增、修改或删除后增量更新账号环
+
+        Args:
+            account: 保存后的账号对象
+        """
+        with self._lock:
+            if self._loaded_at is None:
+                return
+
+            index = bisect.bisect_left(self._ids, account.id)
+            exists = index < len(self._ids) and self._ids[index] == account.id
+
+            if account.is_deleted:
+                if exists:
+                    del self._ids[index]
+                    self._accounts.pop(account.id, None)
+                    # 删除游标之前（含游标）的账号，游标前移，保证下一个仍是原来的下一个
+                    if index <= self._cursor:
+                        self._cursor -= 1
+            elif exists:
+                self._accounts[account.id] = account
+            else:
+                self._ids.insert(index, account.id)
+                self._accounts[account.id] = account
+                if index <= self._cursor:
+                    self._cursor += 1
+
 
 class AccountAllocator:
     """账号分配管理器"""
@@ -16,6 +163,21 @@ class AccountAllocator:
         """初始化"""
         self.allocation_strategy = "round_robin"  # 分配策略: round_robin(轮询), least_busy(最少任务)
 
+        # 内存计数表：{账号ID: {状态: 任务数}}，由一条 GROUP BY 查询加载，之后随任务状态变化增量更新
+        self._lock = threading.Lock()
+        self._accounts = {}
+        self._counters = {}
+        # 小顶堆：(忙碌任务数, 版本号, 账号ID)，版本号不一致的条目已过期
+        self._busy_heap = []
+        self._versions = {}
+        self._loaded_at = None
+
+        JimengImageTask.add_status_listener(self.on_task_status_changed)
+
+        # 轮询分配的账号环（旧版账号表和国际版账号表各一个）
+        self._ring = AccountRing("jimeng", JimengAccount)
+        self._intl_ring = AccountRing("jimeng_intl", JimengIntlAccount)
+
     def set_strategy(self, strategy: str):
         """
         设置分配策略
@@ -46,92 +208,125 @@ class AccountAllocator:
     def _allocate_round_robin(self) -> Optional[JimengAccount]:
         """
         轮询分配策略
-        按账号ID顺序依次分配,循环使用
+        按账号ID顺序依次分配,循环使用（游标保存在内存中并定期写入配置表）
 
         Returns:
             JimengAccount: 分配的账号
         """
         try:
-            # 获取所有账号
-            accounts = list(JimengAccount.get_all_accounts())
-
-            if not accounts:
+            account = self._ring.next()
+            if not account:
                 log.warning("没有可用的即梦账号")
                 return None
 
-            # 获取最近一次分配的账号
-            last_task = JimengImageTask.select().where(
-                JimengImageTask.account_id.is_null(False)
-            ).order_by(JimengImageTask.created_at.desc()).first()
+            log.info(f"[轮询分配] 分配账号 ID: {account.id}")
+            return account
 
-            if not last_task:
-                # 如果没有历史任务,返回第一个账号
-                account = accounts[0]
-                log.info(f"[轮询分配] 首次分配账号: {account.nickname} (ID: {account.id})")
-                return account
+        except Exception as e:
+            log.error(f"轮询分配账号失败: {str(e)}")
+            return None
 
-            # 找到下一个账号
-            last_account_id = last_task.account_id
-            account_ids = [acc.id for acc in accounts]
+    def allocate_intl_account(self, accept: Optional[Callable] = None) -> Optional[JimengIntlAccount]:
+        """
+        轮询分配一个国际版账号（跳过已删除和今天禁用的账号）
 
-            try:
-                current_index = account_ids.index(last_account_id)
-                next_index = (current_index + 1) % len(accounts)
-            except ValueError:
-                # 上次使用的账号已被删除,从第一个开始
-                next_index = 0
-
-            account = accounts[next_index]
-            log.info(f"[轮询分配] 分配账号: {account.nickname} (ID: {account.id})")
-            return account
+        Args:
+            accept: 额外的过滤函数(账号) -> bool，如只要无积分账号、排除繁忙账号
 
+        Returns:
+            JimengIntlAccount: 分配的账号，没有满足条件的账号时返回None
+        """
+        try:
+            return self._intl_ring.next(
+                lambda account: account.is_available() and (accept is None or accept(account))
+            )
         except Exception as e:
-            log.error(f"轮询分配账号失败: {str(e)}")
+            log.error(f"轮询分配国际版账号失败: {str(e)}")
             return None
 
+    def flush(self):
+        """把轮询游标写入配置表"""
+        self._ring.flush()
+        self._intl_ring.flush()
+
     def _allocate_least_busy(self) -> Optional[JimengAccount]:
         """
         最少任务优先策略
-        分配当前正在处理任务数最少的账号
+        分配当前等待中和处理中任务数最少的账号（从内存计数表的小顶堆中取，不查询数据库）
 
         Returns:
             JimengAccount: 分配的账号
         """
         try:
-            # 获取所有账号
-            accounts = list(JimengAccount.get_all_accounts())
+            with self._lock:
+                self._ensure_counters()
 
-            if not accounts:
-                log.warning("没有可用的即梦账号")
-                return None
-
-            # 统计每个账号的处理中任务数
-            account_tasks = {}
-            for account in accounts:
-                # 统计该账号的 processing 状态任务数
-                processing_count = JimengImageTask.select().where(
-                    (JimengImageTask.account_id == account.id) &
-                    (JimengImageTask.status == 'processing')
-                ).count()
+                while self._busy_heap:
+                    busy_count, version, account_id = self._busy_heap[0]
+                    if self._versions.get(account_id) != version:
+                        heapq.heappop(self._busy_heap)
+                        continue
 
-                account_tasks[account.id] = {
-                    'account': account,
-                    'processing_count': processing_count
-                }
+                    account = self._accounts[account_id]
+                    log.info(f"[最少任务分配] 分配账号 ID: {account.id}, 当前忙碌任务数: {busy_count}")
+                    return account
 
-            # 找出任务数最少的账号
-            min_tasks = min(account_tasks.values(), key=lambda x: x['processing_count'])
-            account = min_tasks['account']
-
-            log.info(f"[最少任务分配] 分配账号: {account.nickname} (ID: {account.id}), "
-                    f"当前处理中任务数: {min_tasks['processing_count']}")
-
-            return account
+            log.warning("没有可用的即梦账号")
+            return None
 
         except Exception as e:
             log.error(f"最少任务分配失败: {str(e)}")
             return None
 
+    def _ensure_counters(self):
+        """首次使用或到达对齐间隔时从数据库加载账号和计数表（需持有锁）"""
+        if self._loaded_at is not None and time.monotonic() - self._loaded_at < COUNTER_RESYNC_INTERVAL:
+            return
+
+        accounts = list(JimengAccount.get_all_accounts())
+        self._accounts = {account.id: account for account in accounts}
+        self._counters = JimengImageTask.count_by_account_status(self._accounts.keys())
+        self._busy_heap = []
+        self._versions = {}
+        for account_id in self._accounts:
+            self._push_busy(account_id)
+        self._loaded_at = time.monotonic()
+
+    def _push_busy(self, account_id):
+        """账号忙碌任务数变化后重新入堆（需持有锁）"""
+        counts = self._counters.get(account_id, {})
+        busy_count = sum(counts.get(status, 0) for status in ACTIVE_STATUSES)
+        version = self._versions.get(account_id, 0) + 1
+        self._versions[account_id] = version
+        heapq.heappush(self._busy_heap, (busy_count, version, account_id))
+
+    def on_task_status_changed(self, account_id, old_status, new_status):
+        """
+        任务状态变化时增量更新计数表
+
+        Args:
+            account_id: 账号ID
+            old_status: 旧状态，None 表示新建（或新分配到该账号）
+            new_status: 新状态，None 表示删除
+        """
+        with self._lock:
+            if self._loaded_at is None:
+                return
+
+            counts = self._counters.setdefault(account_id, {})
+            if old_status is not None:
+                counts[old_status] = max(0, counts.get(old_status, 0) - 1)
+            if new_status is not None:
+                counts[new_status] = counts.get(new_status, 0) + 1
+
+            if account_id in self._accounts:
+                self._push_busy(account_id)
+
+    def invalidate(self):
+        """标记计数表过期，下次分配时从数据库重新加载（如账号增删后）"""
+        with self._lock:
+            self._loaded_at = None
+
     def allocate_and_assign(self, task: JimengImageTask) -> bool:
         """
         为任务分配账号并保存
@@ -158,8 +353,9 @@ class AccountAllocator:
             # 更新任务的账号ID
             task.account_id = account.id
             task.save()
+            self.on_task_status_changed(account.id, None, task.status)
 
-            log.info(f"✅ 任务 ID={task.id} 已分配账号: {account.nickname} (ID: {account.id})")
+            log.info(f"✅ 任务 ID={task.id} 已分配账号 ID: {account.id}")
             return True
 
         except Exception as e:
@@ -175,33 +371,20 @@ class AccountAllocator:
         """
         try:
             accounts = list(JimengAccount.get_all_accounts())
+            # 一条 GROUP BY 查询统计所有账号各状态的任务数
+            counts_by_account = JimengImageTask.count_by_account_status([account.id for account in accounts])
             stats = []
 
             for account in accounts:
-                # 统计各状态任务数
-                pending_count = JimengImageTask.select().where(
-                    (JimengImageTask.account_id == account.id) &
-                    (JimengImageTask.status == 'pending')
-                ).count()
-
-                processing_count = JimengImageTask.select().where(
-                    (JimengImageTask.account_id == account.id) &
-                    (JimengImageTask.status == 'processing')
-                ).count()
-
-                success_count = JimengImageTask.select().where(
-                    (JimengImageTask.account_id == account.id) &
-                    (JimengImageTask.status == 'success')
-                ).count()
-
-                failed_count = JimengImageTask.select().where(
-                    (JimengImageTask.account_id == account.id) &
-                    (JimengImageTask.status == 'failed')
-                ).count()
+                counts = counts_by_account.get(account.id, {})
+                pending_count = counts.get('pending', 0)
+                processing_count = counts.get('processing', 0)
+                success_count = counts.get('success', 0)
+                failed_count = counts.get('failed', 0)
 
                 stats.append({
                     'account_id': account.id,
-                    'nickname': account.nickname,
+                    'nickname': getattr(account, 'nickname', f"账号{account.id}"),
                     'pending': pending_count,
                     'processing': processing_count,
                     'success': success_count,
@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+"""
+账号并发与速率限制
+限制同一账号同时执行的任务数，并用令牌桶限制每个账号每分钟发起的生成请求数，
+避免大量线程同时使用同一个 session_id 触发上游限流
+"""
+import threading
+import time
+from typing import Dict, Optional, Set
+from app.utils.config_manager import get_config_manager
+
+# 默认每个账号最多同时执行的任务数（0 表示不限制）；默认不限制，与升级前的行为一致，需要时通过配置开启
+DEFAULT_ACCOUNT_MAX_IN_FLIGHT = 0
+# 默认每个账号每分钟最多发起的生成请求数（0 表示不限制）
+DEFAULT_ACCOUNT_REQUESTS_PER_MINUTE = 0
+# 配置键名
+CONFIG_KEY_ACCOUNT_MAX_IN_FLIGHT = "account_max_in_flight"
+CONFIG_KEY_ACCOUNT_REQUESTS_PER_MINUTE = "account_requests_per_minute"
+
+
+class AccountBusyError(Exception):
+    """账号已达到并发或速率上限，任务需要重新排队"""
+
+    def __init__(self, account_id: int = None):
+        """
+        Args:
+            account_id: 繁忙的账号ID，None 表示所有可用账号都繁忙
+        """
+        if account_id is None:
+            super().__init__("所有可用账号繁忙（已达到并发或速率上限）")
+        else:
+            super().__init__(f"账号 {account_id} 繁忙（已达到并发或速率上限）")
+        self.account_id = account_id
+
+
+class AccountLimiter:
+    """账号并发与速率限制器（线程安全）"""
+
+    def __init__(self, max_in_flight: int = DEFAULT_ACCOUNT_MAX_IN_FLIGHT,
+                 requests_per_minute: int = DEFAULT_ACCOUNT_REQUESTS_PER_MINUTE):
+        """
+        初始化限制器
+
+        Args:
+            max_in_flight: 每个账号最多同时执行的任务数，0 表示不限制
+            requests_per_minute: 每个账号每分钟最多发起的请求数，0 表示不限制
+        """
+        self.max_in_flight = max(0, max_in_flight)
+        self.requests_per_minute = max(0, requests_per_minute)
+
+        # 令牌桶容量（允许的突发请求数）：不超过并发上限，避免空闲账号一次性涌入大量请求
+        if self.max_in_flight and self.requests_per_minute:
+            self.burst = max(1, min(self.max_in_flight, self.requests_per_minute))
+        else:
+            self.burst = max(1, self.requests_per_minute)
+        self.refill_rate = self.requests_per_minute / 60.0  # 每秒补充的令牌数
+
+        self._lock = threading.Lock()
+        # 账号ID -> 执行中的任务数
+        self._inflight: Dict[int, int] = {}
+        # 账号ID -> (剩余令牌数, 上次补充时间)
+        self._buckets: Dict[int, tuple] = {}
+
+    @classmethod
+    def from_config(cls):
+        """根据配置创建限制器"""
+        config_manager = get_config_manager()
+        return cls(
+            max_in_flight=config_manager.get_int(
+                CONFIG_KEY_ACCOUNT_MAX_IN_FLIGHT,
+                DEFAULT_ACCOUNT_MAX_IN_FLIGHT
+            ),
+            requests_per_minute=config_manager.get_int(
+                CONFIG_KEY_ACCOUNT_REQUESTS_PER_MINUTE,
+                DEFAULT_ACCOUNT_REQUESTS_PER_MINUTE
+            ),
+        )
+
+    def _get_tokens(self, account_id: int, now: float) -> float:
+        """补充并返回账号当前的令牌数（需持有锁）"""
+        tokens, last = self._buckets.get(account_id, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - last) * self.refill_rate)
+        self._buckets[account_id] = (tokens, now)
+        return tokens
+
+    def _get_free_slots(self, account_id: int, now: float) -> int:
+        """账号剩余可用的执行数（需持有锁）"""
+        free = None
+        if self.max_in_flight:
+            free = self.max_in_flight - self._inflight.get(account_id, 0)
+        if self.requests_per_minute:
+            tokens = int(self._get_tokens(account_id, now))
+            free = tokens if free is None else min(free, tokens)
+        return max(0, free) if free is not None else -1
+
+    def get_free_slots(self, account_id: int) -> int:
+        """
+        获取账号剩余可同时执行的任务数
+
+        Args:
+            account_id: 账号ID
+
+        Returns:
+            int: 剩余可用数，-1 表示不限制
+        """
+        with self._lock:
+            return self._get_free_slots(account_id, time.monotonic())
+
+    def get_saturated_accounts(self) -> Set[int]:
+        """
+        获取当前已达到上限的账号
+
+        Returns:
+            set: 账号ID集合
+        """
+        now = time.monotonic()
+        with self._lock:
+            account_ids = set(self._inflight) | set(self._buckets)
+            return {account_id for account_id in account_ids if self._get_free_slots(account_id, now) == 0}
+
+    def get_total_free_slots(self, account_ids) -> int:
+        """
+        获取一组账号剩余可用数之和（用于限制未绑定账号任务的认领数量）
+
+        Args:
+            account_ids: 账号ID列表
+
+        Returns:
+            int: 剩余可用数之和，-1 表示不限制
+        """
+        now = time.monotonic()
+        total = 0
+        with self._lock:
+            for account_id in account_ids:
+                free = self._get_free_slots(account_id, now)
+                if free < 0:
+                    return -1
+                total += free
+        return total
+
+    def try_acquire(self, account_id: int) -> bool:
+        """
+        尝试占用账号的一个执行名额（消耗一个令牌）
+
+        Args:
+            account_id: 账号ID
+
+        Returns:
+            bool: 是否占用成功
+        """
+        now = time.monotonic()
+        with self._lock:
+            if self._get_free_slots(account_id, now) == 0:
+                return False
+            self._inflight[account_id] = self._inflight.get(account_id, 0) + 1
+            if self.requests_per_minute:
+                tokens, _ = self._buckets[account_id]
+                self._buckets[account_id] = (tokens - 1, now)
+            return True
+
+    def release(self, account_id: int):
+        """
+        任务结束后释放账号的执行名额
+
+        Args:
+            account_id: 账号ID
+        """
+        with self._lock:
+            count = self._inflight.get(account_id, 0) - 1
+            if count > 0:
+                self._inflight[account_id] = count
+            else:
+                self._inflight.pop(account_id, None)
+
+    def get_next_refill_delay(self) -> Optional[float]:
+        """
+        获取下一个因速率限制而繁忙的账号恢复可用所需的时间
+
+        Returns:
+            float: 秒数；没有因速率限制而繁忙的账号时返回 None
+        """
+        if not self.requests_per_minute:
+            return None
+
+        now = time.monotonic()
+        delay = None
+        with self._lock:
+            for account_id in list(self._buckets):
+                tokens = self._get_tokens(account_id, now)
+                if tokens >= 1:
+                    continue
+                wait = (1 - tokens) / self.refill_rate
+                delay = wait if delay is None else min(delay, wait)
+        return delay
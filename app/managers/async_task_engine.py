@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""
+asyncio 任务执行引擎
+在一个后台线程的事件循环中运行执行器的 execute_task_async 协程，
+等待生成结果期间不占用线程，单个进程即可同时执行成百上千个生成请求
+"""
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from app.utils.logger import log
+
+# 默认最大同时执行的任务数
+DEFAULT_ASYNC_MAX_IN_FLIGHT = 1000
+# 执行数据库操作等同步代码的线程数
+DEFAULT_ASYNC_SYNC_THREADS = 8
+
+
+class AsyncTaskEngine:
+    """asyncio 任务执行引擎"""
+
+    def __init__(self, max_in_flight: int = DEFAULT_ASYNC_MAX_IN_FLIGHT,
+                 sync_threads: int = DEFAULT_ASYNC_SYNC_THREADS, client=None):
+        """
+        初始化引擎
+
+        Args:
+            max_in_flight: 最大同时执行的任务数（调度器按此计算空闲数，超出的任务在引擎中排队）
+            sync_threads: 执行同步代码（数据库读写）的线程数
+            client: 异步API客户端（需实现 start/close），None 表示启动时创建 AsyncJimengApiClient
+        """
+        self.max_in_flight = max_in_flight
+        self._sync_executor = ThreadPoolExecutor(max_workers=sync_threads, thread_name_prefix="async-engine-sync")
+        self._loop = None
+        self._thread = None
+        self._client = client
+        self._started = threading.Event()
+        # 执行名额（在事件循环中创建）和执行中的协程，停止时取消
+        self._slots = None
+        self._running = set()
+
+    def start(self):
+        """启动事件循环线程"""
+        if self._thread is not None:
+            return
+
+        if self._client is None:
+            from app.client.jimeng_async_api_client import AsyncJimengApiClient
+            self._client = AsyncJimengApiClient(max_connections=self.max_in_flight)
+
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run_loop, name="async-task-engine", daemon=True)
+        self._thread.start()
+        self._started.wait()
+        log.info(f"asyncio 执行引擎已启动，最大并发任务数: {self.max_in_flight}")
+
+    def _run_loop(self):
+        """事件循环线程入口"""
+        asyncio.set_event_loop(self._loop)
+        self._slots = asyncio.Semaphore(self.max_in_flight)
+        self._loop.run_until_complete(self._client.start())
+        self._started.set()
+        try:
+            self._loop.run_forever()
+        finally:
+            self._loop.run_until_complete(self._client.close())
+            self._loop.close()
+
+    async def run_sync(self, func, *args):
+        """
+        在线程中执行同步函数（数据库操作），避免阻塞事件循环
+
+        Args:
+            func: 同步函数
+            *args: 参数
+
+        Returns:
+            函数返回值
+        """
+        return await self._loop.run_in_executor(self._sync_executor, func, *args)
+
+    def submit_task(self, executor, task):
+        """
+        提交任务到事件循环
+
+        Args:
+            executor: 任务执行器（需实现 execute_task_async）
+            task: 任务对象
+
+        Returns:
+            concurrent.futures.Future: 结果为是否执行成功；调用其 cancel() 取消执行
+        """
+        return asyncio.run_coroutine_threadsafe(self._run_task(executor, task), self._loop)
+
+    async def _run_task(self, executor, task):
+        """占用一个执行名额后执行任务，同时执行的任务超过 max_in_flight 时在此等待"""
+        current = asyncio.current_task()
+        self._running.add(current)
+        try:
+            async with self._slots:
+                return await executor.execute_task_async(task, self._client, self.run_sync)
+        finally:
+            self._running.discard(current)
+
+    async def _cancel_running(self):
+        """取消所有执行中的协程，并等待它们完成清理（释放账号、任务重新排队）"""
+        running = list(self._running)
+        for coroutine_task in running:
+            coroutine_task.cancel()
+        if running:
+            await asyncio.wait(running)
+        return len(running)
+
+    def add_done_callback(self, future, callback):
+        """
+        为任务添加完成回调，回调在同步线程中执行（避免数据库操作阻塞事件循环）
+
+        Args:
+            future: submit_task 返回的 Future
+            callback: 回调函数，参数为 future
+        """
+        future.add_done_callback(lambda f: self._sync_executor.submit(callback, f))
+
+    def shutdown(self):
+        """停止事件循环；还在执行的任务先取消（执行器让任务重新排队）再停止"""
+        if self._thread is None:
+            return
+
+        cancelled = asyncio.run_coroutine_threadsafe(self._cancel_running(), self._loop).result()
+        if cancelled:
+            log.warning(f"asyncio 执行引擎停止时取消了 {cancelled} 个执行中的任务")
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._thread = None
+        self._sync_executor.shutdown(wait=True)
+        log.info("asyncio 执行引擎已停止")
@@ -0,0 +1,676 @@
+# -*- coding: utf-8 -*-
+"""
+即梦国际版任务执行器基类
+
+图片和视频执行器的状态流转完全相同：认领与租约、账号分配（并发/速率限制、积分预占）、
+同步执行或异步提交后交给轮询服务、保存结果、账号繁忙时重新排队。
+子类只提供任务模型、积分计算、请求参数和输出字段
+"""
+from abc import ABC, abstractmethod
+import asyncio
+from app.models.jimeng_intl_account import JimengIntlAccount
+from app.client.jimeng_api_client import get_jimeng_api_client
+from app.managers.account_limiter import AccountBusyError
+from app.managers.points_ledger import get_points_ledger
+from app.managers.account_allocator import get_account_allocator
+from app.managers.job_poller import JOB_SUBMITTED
+from app.database.task_state_writer import get_task_state_writer
+from app.utils.task_update_bus import get_task_update_bus
+from app.utils.logger import log
+from datetime import datetime
+
+
+class JimengIntlTaskExecutor(ABC):
+    """即梦国际版生成任务执行器基类"""
+
+    # 任务模型类
+    TASK_MODEL = None
+    # 日志中的任务名称，如 "图片"
+    TASK_NAME = ""
+    # 输出数量的量词，如 "张"
+    OUTPUT_UNIT = "个"
+    # 保存后发布到任务更新总线的字段
+    PUBLISHED_TASK_FIELDS = ('status', 'code', 'message', 'account_id')
+
+    def __init__(self):
+        """初始化执行器"""
+        self.client = get_jimeng_api_client()
+        # 账号并发与速率限制器，由调度器设置；为 None 时不限制
+        self.account_limiter = None
+        # 异步任务轮询服务，由调度器设置；为 None 时同步等待生成结果
+        self.job_poller = None
+        # 有积分账号的积分预占账本（图片和视频执行器共用）
+        self.points_ledger = get_points_ledger()
+        # 无积分账号轮询分配
+        self.account_allocator = get_account_allocator()
+        # 任务状态批量写入（只写修改过的字段，多个线程的修改合并到一个事务）
+        self.state_writer = get_task_state_writer()
+        # 任务更新总线（界面据此更新对应的行）
+        self.update_bus = get_task_update_bus()
+
+    def get_task_type(self) -> str:
+        """获取任务类型"""
+        return self.TASK_MODEL.TASK_TYPE
+
+    @abstractmethod
+    def generate(self, client, **kwargs):
+        """
+        调用生成接口
+
+        Args:
+            client: API客户端（同步客户端或 AsyncJimengApiClient，后者返回协程）
+            **kwargs: 接口参数（token、async_job 和生成请求参数）
+
+        Returns:
+            dict: 接口返回结果
+        """
+        pass
+
+    @abstractmethod
+    def get_generation_timeout(self) -> int:
+        """生成超时时间（秒），异步任务轮询超过该时间后标记失败"""
+        pass
+
+    @abstractmethod
+    def get_required_points(self, task) -> int:
+        """任务需要的积分"""
+        pass
+
+    @abstractmethod
+    def build_request(self, task, image_paths) -> dict:
+        """
+        生成请求参数
+
+        Args:
+            task: 任务对象
+            image_paths: 参考图片列表
+
+        Returns:
+            dict: 传给 generate 的参数
+        """
+        pass
+
+    @abstractmethod
+    def set_task_outputs(self, task, output_urls: list):
+        """把生成结果的URL保存到任务的输出字段"""
+        pass
+
+    def allocate_task_account(self, task, required_points: int):
+        """
+        为没有绑定账号的任务分配账号（子类可按模型限制账号类型）
+
+        Returns:
+            tuple: (账号, 积分预占记录)
+        """
+        account, reservation = self.allocate_account(required_points)
+        if not account:
+            raise ValueError(f"没有可用的账号（需要 {required_points} 积分，当前无满足条件的账号）")
+        return account, reservation
+
+    def check_bound_account(self, task, account: JimengIntlAccount, required_points: int):
+        """检查任务绑定的账号能否执行该任务，不能时抛出异常"""
+        # 有积分账号需要检查积分是否足够
+        if account.account_type == 1 and account.points < required_points:
+            raise ValueError(f"账号 {account.id} 积分不足（需要 {required_points}，当前 {account.points}）")
+
+    def save_task(self, task, wait: bool = True):
+        """
+        保存任务状态（只写入修改过的字段），并把界面显示的字段发布到任务更新总线
+
+        Args:
+            task: 任务对象
+            wait: 是否等待写入提交，中间状态传 False
+        """
+        # 取字段的原始值：account_id 发布账号ID，getattr 会为外键查询账号对象
+        changes = {
+            field.name: task.__data__.get(field.name)
+            for field in task.dirty_fields if field.name in self.PUBLISHED_TASK_FIELDS
+        }
+        self.state_writer.save(task, wait=wait)
+        if changes:
+            self.update_bus.publish(self.get_task_type(), task.id, changes)
+
+    def get_pending_tasks(self, limit: int = 10) -> list:
+        """
+        获取待执行的任务
+
+        Args:
+            limit: 最多获取的任务数量
+
+        Returns:
+            list: 待执行任务列表
+        """
+        try:
+            # 获取状态为0（排队中）的任务
+            model = self.TASK_MODEL
+            tasks = model.select().where(
+                (model.status == 0) &
+                (model.isdel == 0)
+            ).order_by(model.create_at.asc()).limit(limit)
+
+            pending_list = list(tasks)
+            if pending_list:
+                log.info(f"扫描到 {len(pending_list)} 个待处理的国际版{self.TASK_NAME}生成任务")
+            return pending_list
+
+        except Exception as e:
+            log.error(f"获取待执行任务失败: {e}")
+            return []
+
+    def claim_pending_tasks(self, limit: int = 10, owner: str = None, lease_seconds: int = 60,
+                            exclude_account_ids=None, account_slots=None, unbound_limit: int = None) -> list:
+        """
+        原子认领待执行的任务（状态 0 -> 1），认领后的任务不会再被其他调度器扫描到
+
+        Args:
+            limit: 最多认领的任务数量（通常为线程池剩余空闲数）
+            owner: 租约持有者（调度器标识）
+            lease_seconds: 租约时长（秒）
+            exclude_account_ids: 跳过绑定了这些账号（繁忙）的任务
+            account_slots: 返回账号剩余可用数的函数
+            unbound_limit: 所有账号剩余名额之和（限制未绑定账号任务的认领）
+
+        Returns:
+            list: 认领成功的任务列表
+        """
+        try:
+            claimed = self.TASK_MODEL.claim_pending_tasks(
+                limit, owner=owner, lease_seconds=lease_seconds,
+                exclude_account_ids=exclude_account_ids,
+                account_slots=account_slots,
+                unbound_limit=unbound_limit
+            )
+            if claimed:
+                log.info(f"认领到 {len(claimed)} 个待处理的国际版{self.TASK_NAME}生成任务")
+            return claimed
+
+        except Exception as e:
+            log.error(f"认领待执行任务失败: {e}")
+            return []
+
+    def release_tasks(self, task_ids) -> int:
+        """
+        释放已认领但未能提交执行的任务，使其重新排队
+
+        Args:
+            task_ids: 任务ID列表
+
+        Returns:
+            int: 释放的任务数量
+        """
+        try:
+            return self.TASK_MODEL.release_tasks(task_ids)
+        except Exception as e:
+            log.error(f"释放任务失败: {e}")
+            return 0
+
+    def renew_leases(self, owner: str, task_ids, lease_seconds: int = 60) -> int:
+        """续期执行中任务的租约（心跳）"""
+        try:
+            return self.TASK_MODEL.renew_leases(owner, task_ids, lease_seconds)
+        except Exception as e:
+            log.error(f"续期任务租约失败: {e}")
+            return 0
+
+    def clear_leases(self, owner: str, task_ids) -> int:
+        """清除已执行结束任务的租约"""
+        try:
+            return self.TASK_MODEL.clear_leases(owner, task_ids)
+        except Exception as e:
+            log.error(f"清除任务租约失败: {e}")
+            return 0
+
+    def requeue_expired_tasks(self) -> int:
+        """回收租约过期的生成中任务，重新排队"""
+        try:
+            count = self.TASK_MODEL.requeue_expired_tasks()
+            if count:
+                log.info(f"回收了 {count} 个租约过期的国际版{self.TASK_NAME}生成任务，已重新排队")
+            return count
+        except Exception as e:
+            log.error(f"回收租约过期任务失败: {e}")
+            return 0
+
+    def execute_task(self, task) -> bool:
+        """
+        执行生成任务
+
+        Args:
+            task: 任务对象
+
+        Returns:
+            bool: 是否执行成功；账号繁忙重新排队时返回 None；异步提交成功时返回 JOB_SUBMITTED
+        """
+        account = reservation = None
+        try:
+            account, request, reservation = self.prepare_task(task)
+
+            if self.job_poller and self.job_poller.should_submit_job(task):
+                # 异步提交：拿到远程任务ID后交给轮询服务，账号名额和预占积分由轮询服务在结束时释放
+                result = self.submit_job(task, account, request)
+                if result is None:
+                    self.job_poller.track(self, task, account, reservation, self.get_generation_timeout())
+                    account = reservation = None
+                    return JOB_SUBMITTED
+            else:
+                # 调用API生成
+                result = self.generate(self.client, token=account.session_id, **request)
+
+            success = self.handle_result(task, account, result)
+            if success:
+                # 扣除预占的积分
+                self.points_ledger.commit(reservation)
+                reservation = None
+
+                # 任务成功后，更新账号积分
+                try:
+                    self.update_account_points(account, self.client.account_check(account.session_id))
+                except Exception as e:
+                    log.warning(f"更新账号 {account.id} 积分失败: {e}")
+
+                log.info(f"任务 {task.id} 执行成功，状态已更新为: 已完成")
+            return success
+
+        except AccountBusyError as e:
+            self.requeue_busy_task(task, e)
+            return None
+
+        except Exception as e:
+            self.fail_task(task, e)
+            return False
+
+        finally:
+            self.release_account(account, reservation)
+
+    async def execute_task_async(self, task, client, run_sync) -> bool:
+        """
+        在 asyncio 引擎中执行生成任务（状态流转与 execute_task 一致）
+
+        Args:
+            task: 任务对象
+            client: 异步API客户端（AsyncJimengApiClient）
+            run_sync: 把同步函数（数据库操作）放到线程中执行的协程函数
+
+        Returns:
+            bool: 是否执行成功；账号繁忙重新排队时返回 None
+
+        Raises:
+            asyncio.CancelledError: 执行被取消，任务已重新排队、账号已释放
+        """
+        if self.job_poller and self.job_poller.should_submit_job(task):
+            # 异步提交只需很短的请求，在线程中执行，结果由轮询服务处理
+            return await run_sync(self.execute_task, task)
+
+        account = reservation = None
+        # 线程中的同步步骤不会因协程取消而中断，用 shield 等待，取消时仍能拿到已占用的账号、知道结果是否已保存
+        prepared = saved = None
+        try:
+            prepared = asyncio.ensure_future(run_sync(self.prepare_task, task))
+            account, request, reservation = await asyncio.shield(prepared)
+
+            # 调用API生成（等待期间不占用线程）
+            result = await self.generate(client, token=account.session_id, **request)
+
+            saved = asyncio.ensure_future(run_sync(self.handle_result, task, account, result))
+            success = await asyncio.shield(saved)
+            if success:
+                self.points_ledger.commit(reservation)
+                reservation = None
+
+                try:
+                    points = await client.account_check(account.session_id)
+                    await run_sync(self.update_account_points, account, points)
+                except Exception as e:
+                    log.warning(f"更新账号 {account.id} 积分失败: {e}")
+
+                log.info(f"任务 {task.id} 执行成功，状态已更新为: 已完成")
+            return success
+
+        except AccountBusyError as e:
+            await run_sync(self.requeue_busy_task, task, e)
+            return None
+
+        except Exception as e:
+            await run_sync(self.fail_task, task, e)
+            return False
+
+        except asyncio.CancelledError:
+            # 引擎停止时取消：等正在执行的同步步骤结束，结果未保存的任务重新排队
+            if prepared is not None and account is None:
+                await asyncio.wait([prepared])
+                if not prepared.cancelled() and prepared.exception() is None:
+                    account, _, reservation = prepared.result()
+            if saved is not None:
+                await asyncio.wait([saved])
+            else:
+                await run_sync(self.requeue_cancelled_task, task)
+            raise
+
+        finally:
+            self.release_account(account, reservation)
+
+    def prepare_task(self, task):
+        """
+        执行前准备：更新状态为生成中并分配账号
+
+        Args:
+            task: 任务对象
+
+        Returns:
+            tuple: (账号, 生成请求参数, 积分预占记录)
+        """
+        task_id = task.id
+        log.info(f"开始执行国际版{self.TASK_NAME}生成任务: ID={task_id}")
+
+        # 更新任务状态为生成中（1）
+        task.status = 1
+        task.update_at = datetime.now()
+        # 中间状态不等待写入，结束时的状态写入会合并或排在它之后
+        self.save_task(task, wait=False)
+        log.debug(f"任务 {task_id} 状态已更新为: 生成中")
+
+        # 获取模型需要的积分
+        required_points = self.get_required_points(task)
+        log.debug(f"任务 {task_id} 使用模型 {task.model}，需要 {required_points} 积分")
+
+        # 获取参考图片；请求参数在占用账号前生成，参数错误时不需要释放账号
+        image_paths = task.get_input_images()
+        log.debug(f"任务 {task_id} 调用API生成{self.TASK_NAME}，参考图片数: {len(image_paths) if image_paths else 0}")
+        request = self.build_request(task, image_paths)
+
+        # 获取账号信息（已达到并发或速率上限的账号不参与分配，有积分账号按积分账本预占积分）
+        reservation = None
+        if not task.account_id:
+            log.warning(f"任务 {task_id} 没有绑定账号，使用随机可用账号")
+            account, reservation = self.allocate_task_account(task, required_points)
+            task.account_id = account.id
+            log.info(f"任务 {task_id} 已绑定账号 {account.id}，积分: {account.points}")
+        else:
+            account = JimengIntlAccount.get_account_by_id(task.account_id)
+            if not account:
+                raise ValueError(f"账号不存在: {task.account_id}")
+            self.check_bound_account(task, account, required_points)
+
+            self.acquire_account(account)
+            if account.account_type == 1:
+                try:
+                    reservation = self.points_ledger.reserve_account(account.id, required_points)
+                except Exception:
+                    # 账号名额已占用但还没有返回给调用方，调用方无法释放
+                    self.release_account(account)
+                    raise
+
+        return account, request, reservation
+
+    def submit_job(self, task, account: JimengIntlAccount, request: dict):
+        """
+        异步提交生成请求并保存远程任务ID；任务已有远程任务ID（重新认领）时直接继续轮询，不重复提交
+
+        Args:
+            task: 任务对象
+            account: 执行任务的账号
+            request: 生成请求参数
+
+        Returns:
+            dict: 提交成功返回 None；接口没有返回远程任务ID时返回接口结果（按同步结果处理，如积分不足）
+        """
+        if task.remote_task_id:
+            log.info(f"任务 {task.id} 继续等待远程任务 {task.remote_task_id} 的结果")
+            return None
+
+        result = self.generate(self.client, token=account.session_id, async_job=True, **request)
+        remote_task_id = result.get("task_id") if isinstance(result, dict) else None
+        if not remote_task_id or result.get("data"):
+            # 服务端不支持异步提交时直接返回了生成结果
+            return result
+
+        # 先保存远程任务ID再开始轮询，程序中途退出后重新认领时可以继续查询结果
+        task.remote_task_id = str(remote_task_id)
+        task.update_at = datetime.now()
+        self.save_task(task)
+        return None
+
+    def finish_job(self, task, account: JimengIntlAccount, reservation,
+                   result: dict, error: str = None) -> bool:
+        """
+        保存异步任务的结果（由轮询服务在保存线程中调用，状态流转与 execute_task 一致）
+
+        Args:
+            task: 任务对象
+            account: 执行任务的账号
+            reservation: 积分预占记录
+            result: 查询到的生成结果（与同步接口返回相同）
+            error: 远程任务失败或超时的原因
+
+        Returns:
+            bool: 是否生成成功
+        """
+        try:
+            if error and not (result and result.get("code") == -2001):
+                raise ValueError(error)
+
+            success = self.handle_result(task, account, result)
+            if success:
+                self.points_ledger.commit(reservation)
+                reservation = None
+
+                try:
+                    self.update_account_points(account, self.client.account_check(account.session_id))
+                except Exception as e:
+                    log.warning(f"更新账号 {account.id} 积分失败: {e}")
+
+                log.info(f"任务 {task.id} 执行成功，状态已更新为: 已完成")
+            return success
+
+        except Exception as e:
+            self.fail_task(task, e)
+            return False
+
+        finally:
+            self.release_account(account, reservation)
+
+    def handle_result(self, task, account: JimengIntlAccount, result: dict) -> bool:
+        """
+        处理API返回结果并保存任务状态
+
+        Args:
+            task: 任务对象
+            account: 执行任务的账号
+            result: API返回结果
+
+        Returns:
+            bool: 是否生成成功
+        """
+        task_id = task.id
+
+        if not result:
+            raise ValueError("API返回空结果")
+
+        log.debug(f"任务 {task_id} API返回结果类型: {type(result).__name__}")
+        log.debug(f"任务 {task_id} API返回结果键: {result.keys() if isinstance(result, dict) else 'N/A'}")
+
+        # 检查是否积分不足
+        code = result.get("code")
+        if code == -2001:
+            log.warning(f"账号 {account.id} 积分不足，禁用该账号今天")
+            JimengIntlAccount.disable_account_today(account.id)
+            self.points_ledger.remove_account(account.id)
+            # 重置任务状态为排队中，等待下次使用其他账号执行
+            task.status = 0
+            task.account_id = None
+            task.remote_task_id = None
+            task.message = "账号积分不足，已重新排队"
+            task.update_at = datetime.now()
+            self.save_task(task)
+            log.info(f"任务 {task_id} 已重新排队，等待其他账号执行")
+            return False
+
+        # 保存结果
+        task.status = 2  # 已完成
+        task.code = str(code) if code else "0"
+        task.message = result.get("message", "生成成功")
+
+        # 提取生成结果的URL
+        output_urls = []
+        if "data" in result and isinstance(result["data"], list):
+            for item in result["data"]:
+                if isinstance(item, dict) and "url" in item:
+                    output_urls.append(item["url"])
+                    log.debug(f"任务 {task_id} 提取到{self.TASK_NAME}URL: {item['url'][:80]}...")
+
+        # 检查是否成功获取输出
+        if not output_urls:
+            # 未获取到输出，标记为失败
+            log.warning(f"任务 {task_id} 未发现输出{self.TASK_NAME}，标记为失败")
+            task.status = 3  # 失败
+            task.code = "no_output"
+            task.message = f"API返回成功但未生成{self.TASK_NAME}"
+            task.update_at = datetime.now()
+            self.save_task(task)
+            return False
+
+        # 保存输出URL到数据库
+        log.info(f"任务 {task_id} 成功生成 {len(output_urls)} {self.OUTPUT_UNIT}{self.TASK_NAME}")
+        self.set_task_outputs(task, output_urls)
+
+        task.update_at = datetime.now()
+        self.save_task(task)
+        return True
+
+    def update_account_points(self, account: JimengIntlAccount, points: int):
+        """
+        任务成功后更新账号积分，有积分账号积分不足时自动禁用
+
+        Args:
+            account: 账号
+            points: 最新积分（小于0表示查询失败）
+        """
+        if points < 0:
+            return
+
+        # 有积分账号如果积分小于4，自动禁用（与积分在同一条 UPDATE 中写入）；
+        # account 是积分账本或账号环缓存的共享对象，不修改它的字段
+        auto_disable = account.account_type == 1 and points < 4
+        JimengIntlAccount.update_points(account.id, points, disable=auto_disable)
+        self.points_ledger.set_balance(account.id, points)
+        log.info(f"账号 {account.id} 积分已更新: {points}")
+
+        if auto_disable:
+            self.points_ledger.remove_account(account.id)
+            log.warning(f"账号 {account.id} 积分不足(当前{points})，已自动禁用")
+
+    def fail_task(self, task, error: Exception):
+        """
+        任务执行异常，更新任务状态为失败
+
+        Args:
+            task: 任务对象
+            error: 异常
+        """
+        log.error(f"任务 {task.id} 执行失败: {error}")
+        try:
+            # 更新任务状态为失败（3）
+            task.status = 3
+            task.code = "error"
+            task.message = str(error)
+            task.update_at = datetime.now()
+            self.save_task(task)
+            log.debug(f"任务 {task.id} 状态已更新为: 失败")
+        except Exception as save_error:
+            log.error(f"保存任务失败状态出错: {save_error}")
+
+    def allocate_account(self, required_points: int = None):
+        """
+        分配账号并占用其执行名额：优先从积分账本中选择可用积分最多的有积分账号并预占积分，
+        没有时轮询使用无积分账号；已达到并发或速率上限的账号不参与分配
+
+        Args:
+            required_points: 需要的积分，None 表示只使用无积分账号
+
+        Returns:
+            tuple: (账号, 积分预占记录)；没有满足条件的账号时返回 (None, None)
+
+        Raises:
+            AccountBusyError: 满足条件的账号都已达到并发或速率上限，或积分都已被执行中的任务预占
+        """
+        busy_ids = self.account_limiter.get_saturated_accounts() if self.account_limiter else set()
+        while True:
+            account, reservation = None, None
+            if required_points is not None:
+                account, reservation = self.points_ledger.reserve(required_points, exclude_ids=busy_ids)
+            if account is None:
+                account = self.account_allocator.allocate_intl_account(
+                    lambda candidate: candidate.account_type == 0 and candidate.id not in busy_ids
+                )
+
+            if account is None:
+                # 有满足条件的账号但都繁忙时重新排队，而不是标记失败
+                if busy_ids and JimengIntlAccount.get_available_free_account():
+                    raise AccountBusyError()
+                if required_points is not None and self.points_ledger.has_balance(required_points):
+                    raise AccountBusyError()
+                return None, None
+
+            if not self.account_limiter or self.account_limiter.try_acquire(account.id):
+                return account, reservation
+
+            # 其他线程刚占满该账号，退还积分后换下一个账号
+            self.points_ledger.release(reservation)
+            busy_ids.add(account.id)
+
+    def acquire_account(self, account: JimengIntlAccount):
+        """
+        占用账号的一个执行名额（并发和速率限制）
+
+        Args:
+            account: 账号
+
+        Raises:
+            AccountBusyError: 账号已达到并发或速率上限
+        """
+        if self.account_limiter and not self.account_limiter.try_acquire(account.id):
+            raise AccountBusyError(account.id)
+
+    def release_account(self, account: JimengIntlAccount, reservation=None):
+        """
+        任务结束后释放账号的执行名额，并退还未扣除的预占积分
+
+        Args:
+            account: 账号，None 表示未占用
+            reservation: 积分预占记录，任务成功时已扣除（传 None）
+        """
+        self.points_ledger.release(reservation)
+        if self.account_limiter and account is not None:
+            self.account_limiter.release(account.id)
+
+    def requeue_cancelled_task(self, task):
+        """
+        执行被取消（asyncio 引擎停止），任务重新排队，由下次启动或其他调度器重新执行
+
+        Args:
+            task: 任务对象
+        """
+        log.info(f"任务 {task.id} 执行被取消，已重新排队")
+        try:
+            task.status = 0
+            task.update_at = datetime.now()
+            self.save_task(task)
+        except Exception as save_error:
+            log.error(f"保存任务排队状态出错: {save_error}")
+
+    def requeue_busy_task(self, task, error: AccountBusyError):
+        """
+        账号繁忙，任务重新排队等待账号空闲（不计为失败）
+
+        Args:
+            task: 任务对象
+            error: 账号繁忙异常
+        """
+        log.info(f"任务 {task.id} {error}，已重新排队")
+        try:
+            task.status = 0
+            task.message = "账号繁忙，已重新排队"
+            task.update_at = datetime.now()
+            self.save_task(task)
+        except Exception as save_error:
+            log.error(f"保存任务排队状态出错: {save_error}")
@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+"""
+异步任务轮询服务
+
+开启异步提交（配置项 jimeng_async_jobs）后，执行器提交生成请求只等待服务端返回远程任务ID，
+随即释放工作线程；生成结果由本服务在一个线程中按账号批量查询，查询间隔随等待时间逐渐拉长。
+任务完成后在小线程池中保存结果（与同步执行相同的状态流转），然后通知调度器
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+from app.client.jimeng_api_client import get_jimeng_api_client
+from app.utils.logger import log
+
+# 执行器提交异步任务后返回该值：任务仍在生成中，工作线程已释放，结果由轮询服务处理
+JOB_SUBMITTED = "submitted"
+
+# 配置键名：是否使用异步提交（需要服务端支持 async 参数和 /v1/tasks/query）
+CONFIG_KEY_ASYNC_JOBS = "jimeng_async_jobs"
+
+# 首次查询和最短查询间隔（秒）
+DEFAULT_JOB_POLL_INTERVAL = 2
+# 最长查询间隔（秒）
+MAX_JOB_POLL_INTERVAL = 30
+# 每次未完成后查询间隔的增长倍数
+JOB_POLL_BACKOFF = 1.5
+# 每个查询请求最多包含的任务数
+JOB_POLL_BATCH_SIZE = 50
+# 保存结果的线程数（保存后还要查询账号积分）
+JOB_COMPLETION_THREADS = 4
+
+
+class PendingJob:
+    """一个等待结果的远程任务"""
+
+    def __init__(self, executor, task, account, reservation, timeout: float):
+        self.executor = executor
+        self.task = task
+        self.account = account
+        self.reservation = reservation
+        self.remote_id = task.remote_task_id
+        self.task_type = executor.get_task_type()
+        self.deadline = time.monotonic() + timeout
+        self.interval = DEFAULT_JOB_POLL_INTERVAL
+        self.next_poll_at = time.monotonic() + self.interval
+
+
+class JobPoller:
+    """异步任务轮询服务（不依赖 Qt，由调度器创建）"""
+
+    def __init__(self, enabled: bool = False,
+                 on_job_finished: Optional[Callable[[str, int, bool], None]] = None,
+                 client=None):
+        """
+        初始化轮询服务
+
+        Args:
+            enabled: 新任务是否使用异步提交；关闭时仍会继续轮询已提交过的任务（remote_task_id 不为空）
+            on_job_finished: 任务结束回调(任务类型, 任务ID, 是否成功)，在保存结果的线程中调用
+            client: API客户端，默认使用全局单例
+        """
+        self.enabled = enabled
+        self.on_job_finished = on_job_finished
+        self.client = client or get_jimeng_api_client()
+        # 远程任务ID -> PendingJob（保存结果完成前一直保留，调度器据此续期租约）
+        self._jobs = {}
+        self._cond = threading.Condition()
+        self._running = False
+        self._thread = None
+        self._completion_pool = None
+
+    def should_submit_job(self, task) -> bool:
+        """任务是否走异步提交（已有远程任务ID的任务总是继续轮询，不重复提交）"""
+        return bool(self.enabled or task.remote_task_id)
+
+    def start(self):
+        """启动轮询线程"""
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+            self._completion_pool = ThreadPoolExecutor(max_workers=JOB_COMPLETION_THREADS,
+                                                       thread_name_prefix="job-completion")
+            self._thread = threading.Thread(target=self._run, name="job-poller", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """
+        停止轮询：等待中的任务重新排队（保留远程任务ID，下次认领时继续轮询），并释放账号名额和预占积分
+        """
+        with self._cond:
+            if not self._running:
+                return
+            self._running = False
+            # 正在保存结果的任务（next_poll_at 为 None）等保存完成，其余的重新排队
+            jobs = [job for job in self._jobs.values() if job.next_poll_at is not None]
+            for job in jobs:
+                del self._jobs[job.remote_id]
+            self._cond.notify_all()
+        self._thread.join()
+        self._completion_pool.shutdown(wait=True)
+
+        for job in jobs:
+            job.executor.release_tasks([job.task.id])
+            job.executor.release_account(job.account, job.reservation)
+        if jobs:
+            log.info(f"任务轮询服务已停止，{len(jobs)} 个生成中的远程任务已重新排队")
+
+    def track(self, executor, task, account, reservation, timeout: float):
+        """
+        登记已提交的远程任务，账号名额和预占积分在任务结束后由轮询服务释放
+
+        Args:
+            executor: 任务执行器（提供 finish_job / release_tasks / release_account）
+            task: 任务对象（remote_task_id 已保存）
+            account: 执行任务的账号
+            reservation: 积分预占记录
+            timeout: 等待结果的最长时间（秒）
+        """
+        job = PendingJob(executor, task, account, reservation, timeout)
+        with self._cond:
+            if not self._running:
+                raise RuntimeError("任务轮询服务未启动")
+            self._jobs[job.remote_id] = job
+            self._cond.notify()
+        log.debug(f"任务 {task.id} 已提交，远程任务ID: {job.remote_id}")
+
+    def get_task_ids(self, task_type: str) -> list:
+        """获取某类任务中等待结果的任务ID（调度器续期租约用）"""
+        with self._cond:
+            return [job.task.id for job in self._jobs.values() if job.task_type == task_type]
+
+    def get_pending_count(self) -> int:
+        """获取等待结果的任务数"""
+        with self._cond:
+            return len(self._jobs)
+
+    def _run(self):
+        """轮询线程主循环：等到最早的查询时间，把到期的任务按账号分批查询"""
+        while True:
+            with self._cond:
+                while self._running:
+                    now = time.monotonic()
+                    next_poll_at = min((job.next_poll_at for job in self._jobs.values()
+                                        if job.next_poll_at is not None), default=None)
+                    if next_poll_at is not None and next_poll_at <= now:
+                        break
+                    self._cond.wait(None if next_poll_at is None else next_poll_at - now)
+                if not self._running:
+                    return
+
+                due = {}
+                for job in self._jobs.values():
+                    if job.next_poll_at is not None and job.next_poll_at <= now:
+                        due.setdefault(job.account.session_id, []).append(job)
+
+            for token, jobs in due.items():
+                for start in range(0, len(jobs), JOB_POLL_BATCH_SIZE):
+                    self._poll_batch(token, jobs[start:start + JOB_POLL_BATCH_SIZE])
+
+    def _poll_batch(self, token: str, jobs: list):
+        """查询一批任务的状态，结束的任务交给保存线程"""
+        statuses = self.client.query_jobs(token, [job.remote_id for job in jobs])
+        now = time.monotonic()
+
+        for job in jobs:
+            if statuses is None:
+                # 查询失败（网络错误等），稍后重试
+                status = None
+            else:
+                status = statuses.get(job.remote_id)
+                if status is None:
+                    self._complete(job, None, "远程任务不存在")
+                    continue
+
+            state = status.get("status") if status else None
+            if state == "succeeded":
+                self._complete(job, status.get("result") or {}, None)
+            elif state == "failed":
+                self._complete(job, status.get("result") or {}, status.get("message") or "生成失败")
+            elif now >= job.deadline:
+                self._complete(job, None, "等待生成结果超时")
+            else:
+                # 未完成：查询间隔逐渐拉长；服务端给出预计剩余时间时按预计时间查询
+                eta = status.get("eta") if status else None
+                if isinstance(eta, (int, float)) and eta > 0:
+                    job.interval = eta
+                else:
+                    job.interval = job.interval * JOB_POLL_BACKOFF
+                job.interval = max(DEFAULT_JOB_POLL_INTERVAL, min(job.interval, MAX_JOB_POLL_INTERVAL))
+                job.next_poll_at = now + job.interval
+
+    def _complete(self, job: PendingJob, result: Optional[dict], error: Optional[str]):
+        """任务结束：停止查询，在保存线程中保存结果"""
+        with self._cond:
+            if self._jobs.get(job.remote_id) is not job:
+                # stop() 已把任务重新排队
+                return
+            job.next_poll_at = None
+        self._completion_pool.submit(self._finish, job, result, error)
+
+    def _finish(self, job: PendingJob, result: Optional[dict], error: Optional[str]):
+        """保存任务结果（保存线程）"""
+        success = False
+        try:
+            success = job.executor.finish_job(job.task, job.account, job.reservation, result, error)
+        except Exception as e:
+            log.error(f"保存远程任务结果失败: {job.task_type} - ID={job.task.id}, 错误={e}")
+        finally:
+            with self._cond:
+                self._jobs.pop(job.remote_id, None)
+
+        if self.on_job_finished is not None:
+            try:
+                self.on_job_finished(job.task_type, job.task.id, bool(success))
+            except Exception as e:
+                log.error(f"任务结束回调执行失败: {e}")
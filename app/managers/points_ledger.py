@@ -0,0 +1,257 @@
+# -*- coding: utf-8 -*-
+"""
+账号积分预占账本
+在内存中记录每个有积分账号的可用积分（数据库积分 - 执行中任务已预占的积分），
+分配账号时原子地预占任务所需积分，任务成功后扣除，失败或重新排队时退还，
+避免多个线程同时选中积分最多的同一个账号后一起超支
+"""
+import heapq
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Iterable, Optional
+from app.utils.logger import log
+
+# 从数据库重新加载账号积分的间隔（秒），用于同步手动修改积分、新增或删除账号
+LEDGER_REFRESH_INTERVAL = 60
+
+
+class PointsReservation:
+    """一次积分预占"""
+
+    __slots__ = ("account_id", "points")
+
+    def __init__(self, account_id: int, points: int):
+        self.account_id = account_id
+        self.points = points
+
+
+class PointsLedger:
+    """账号积分预占账本（线程安全）"""
+
+    def __init__(self, refresh_interval: float = LEDGER_REFRESH_INTERVAL):
+        """
+        初始化账本（首次分配时从数据库加载账号）
+
+        Args:
+            refresh_interval: 从数据库重新加载账号积分的间隔（秒）
+        """
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        # 账号ID -> 账号对象
+        self._accounts: Dict[int, object] = {}
+        # 账号ID -> 已知积分（数据库积分，任务成功后先行扣除）
+        self._balances: Dict[int, int] = {}
+        # 账号ID -> 执行中任务已预占的积分
+        self._reserved: Dict[int, int] = {}
+        # 账号ID -> 版本号，堆中版本号不一致的条目已过期
+        self._versions: Dict[int, int] = {}
+        # 大顶堆：(-可用积分, 版本号, 账号ID)
+        self._heap = []
+        self._loaded_at = None
+
+    def _available(self, account_id: int) -> int:
+        """账号可用积分（需持有锁）"""
+        return self._balances[account_id] - self._reserved.get(account_id, 0)
+
+    def _push(self, account_id: int):
+        """账号可用积分变化后重新入堆，旧条目自动失效（需持有锁）"""
+        version = self._versions.get(account_id, 0) + 1
+        self._versions[account_id] = version
+        heapq.heappush(self._heap, (-self._available(account_id), version, account_id))
+
+    def _is_current(self, entry) -> bool:
+        """堆条目是否仍有效（需持有锁）"""
+        _, version, account_id = entry
+        return account_id in self._balances and self._versions.get(account_id) == version
+
+    def _ensure_loaded(self):
+        """首次使用或到达刷新间隔时从数据库加载有积分账号（需持有锁）"""
+        if self._loaded_at is not None and time.monotonic() - self._loaded_at < self.refresh_interval:
+            return
+        self._load()
+
+    def _load(self):
+        """从数据库加载所有可用的有积分账号，保留执行中任务的预占（需持有锁）"""
+        from app.models.jimeng_intl_account import JimengIntlAccount
+
+        today = datetime.now().date()
+        accounts = list(JimengIntlAccount.select().where(
+            (JimengIntlAccount.account_type == 1) &
+            (JimengIntlAccount.is_deleted == 0) &
+            ((JimengIntlAccount.disabled_at.is_null()) | (JimengIntlAccount.disabled_at < today))
+        ))
+
+        self._accounts = {account.id: account for account in accounts}
+        self._balances = {account.id: account.points for account in accounts}
+        self._heap = []
+        for account_id in self._balances:
+            self._push(account_id)
+        self._loaded_at = time.monotonic()
+        log.debug(f"积分账本已加载 {len(accounts)} 个有积分账号")
+
+    def invalidate(self):
+        """标记账本过期，下次分配时从数据库重新加载（如手动修改了账号）"""
+        with self._lock:
+            self._loaded_at = None
+
+    def reserve(self, points: int, exclude_ids: Optional[Iterable[int]] = None):
+        """
+        从可用积分最多的账号中预占积分
+
+        Args:
+            points: 需要的积分数
+            exclude_ids: 排除的账号ID（如已达到并发上限的账号）
+
+        Returns:
+            tuple: (账号, PointsReservation)；没有可用积分足够的账号时返回 (None, None)。
+                账号对象是账本缓存的共享对象，调用方只读，修改积分用 JimengIntlAccount.update_points
+        """
+        exclude_ids = set(exclude_ids or ())
+        with self._lock:
+            self._ensure_loaded()
+
+            skipped = []
+            result = (None, None)
+            while self._heap:
+                entry = self._heap[0]
+                if not self._is_current(entry):
+                    heapq.heappop(self._heap)
+                    continue
+                account_id = entry[2]
+                if -entry[0] < points:
+                    # 堆顶可用积分最多，不够则其他账号也不够
+                    break
+                heapq.heappop(self._heap)
+                if account_id in exclude_ids:
+                    skipped.append(entry)
+                    continue
+
+                self._reserved[account_id] = self._reserved.get(account_id, 0) + points
+                self._push(account_id)
+                result = (self._accounts[account_id], PointsReservation(account_id, points))
+                break
+
+            for entry in skipped:
+                heapq.heappush(self._heap, entry)
+            return result
+
+    def has_balance(self, points: int) -> bool:
+        """
+        是否有账号的已知积分（不扣除预占）足够
+
+        Args:
+            points: 需要的积分数
+
+        Returns:
+            bool: 是否存在积分足够的账号（用于区分“账号都忙”和“没有账号”）
+        """
+        with self._lock:
+            self._ensure_loaded()
+            return any(balance >= points for balance in self._balances.values())
+
+    def reserve_account(self, account_id: int, points: int) -> PointsReservation:
+        """
+        为已绑定的账号预占积分（不检查可用积分，由调用方检查账号积分是否足够）
+
+        Args:
+            account_id: 账号ID
+            points: 需要的积分数
+
+        Returns:
+            PointsReservation: 预占记录；账号不在账本中（如无积分账号）时返回 None
+        """
+        with self._lock:
+            self._ensure_loaded()
+            if account_id not in self._balances:
+                return None
+            self._reserved[account_id] = self._reserved.get(account_id, 0) + points
+            self._push(account_id)
+            return PointsReservation(account_id, points)
+
+    def commit(self, reservation: Optional[PointsReservation]):
+        """
+        任务成功，扣除预占的积分
+
+        Args:
+            reservation: 预占记录
+        """
+        self._settle(reservation, spent=True)
+
+    def release(self, reservation: Optional[PointsReservation]):
+        """
+        任务失败或重新排队，退还预占的积分
+
+        Args:
+            reservation: 预占记录
+        """
+        self._settle(reservation, spent=False)
+
+    def _settle(self, reservation: Optional[PointsReservation], spent: bool):
+        """结算预占记录"""
+        if reservation is None:
+            return
+        account_id = reservation.account_id
+        with self._lock:
+            reserved = self._reserved.get(account_id, 0) - reservation.points
+            if reserved > 0:
+                self._reserved[account_id] = reserved
+            else:
+                self._reserved.pop(account_id, None)
+
+            if account_id in self._balances:
+                if spent:
+                    self._balances[account_id] -= reservation.points
+                self._push(account_id)
+
+    def set_balance(self, account_id: int, points: int):
+        """
+        用接口查询到的最新积分更新账号余额
+
+        Args:
+            account_id: 账号ID
+            points: 最新积分
+        """
+        with self._lock:
+            if account_id in self._balances:
+                self._balances[account_id] = points
+                self._push(account_id)
+
+    def remove_account(self, account_id: int):
+        """
+        账号被禁用或删除后从账本移除（执行中任务的预占照常结算）
+
+        Args:
+            account_id: 账号ID
+        """
+        with self._lock:
+            self._balances.pop(account_id, None)
+            self._accounts.pop(account_id, None)
+            self._versions.pop(account_id, None)
+
+    def get_available_points(self, account_id: int) -> Optional[int]:
+        """
+        获取账号当前可用积分（已知积分 - 预占积分）
+
+        Args:
+            account_id: 账号ID
+
+        Returns:
+            int: 可用积分；账号不在账本中时返回 None
+        """
+        with self._lock:
+            if account_id not in self._balances:
+                return None
+            return self._available(account_id)
+
+
+# 全局单例
+_points_ledger = None
+
+
+def get_points_ledger() -> PointsLedger:
+    """获取积分账本单例"""
+    global _points_ledger
+    if _points_ledger is None:
+        _points_ledger = PointsLedger()
+    return _points_ledger
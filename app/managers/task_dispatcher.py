@@ -0,0 +1,548 @@
+# -*- coding: utf-8 -*-
+"""
+任务调度器
+不依赖 Qt，负责认领待执行任务、提交到线程池、维护任务租约。
+GUI 中由 GlobalTaskManager（QThread）包装运行，无界面模式由 app.worker 直接运行
+"""
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+from typing import Callable, Optional
+import os
+import socket
+import threading
+import time
+import uuid
+from app.utils.logger import log
+from app.utils.config_manager import get_config_manager
+from app.utils.task_notifier import get_task_notifier
+from app.managers.async_task_engine import DEFAULT_ASYNC_MAX_IN_FLIGHT
+from app.managers.account_limiter import AccountLimiter
+from app.managers.job_poller import JobPoller, JOB_SUBMITTED, CONFIG_KEY_ASYNC_JOBS
+from app.client.jimeng_api_client import get_jimeng_api_client
+from app.client.image_preprocessor import shutdown_image_preprocessor
+
+# 默认任务管理器线程数
+DEFAULT_TASK_MANAGER_THREADS = 50
+# 默认兜底轮询间隔（秒），正常情况下由任务通知唤醒调度
+DEFAULT_POLL_INTERVAL = 30
+# 默认任务租约时长（秒），调度器崩溃后租约到期的任务会被回收
+DEFAULT_TASK_LEASE_SECONDS = 60
+# 配置键名
+CONFIG_KEY_TASK_MANAGER_THREADS = "task_manager_threads"
+CONFIG_KEY_TASK_LEASE_SECONDS = "task_lease_seconds"
+# 执行引擎：thread（线程池，默认）或 asyncio（事件循环，需要 aiohttp）
+CONFIG_KEY_TASK_ENGINE = "task_engine"
+CONFIG_KEY_ASYNC_MAX_IN_FLIGHT = "async_max_in_flight"
+TASK_ENGINE_THREAD = "thread"
+TASK_ENGINE_ASYNCIO = "asyncio"
+
+
+class TaskDispatcher:
+    """任务调度器"""
+
+    def __init__(self, max_workers=None, poll_interval=DEFAULT_POLL_INTERVAL,
+                 on_task_started: Optional[Callable[[str, int], None]] = None,
+                 on_task_finished: Optional[Callable[[str, int, bool], None]] = None,
+                 on_status_changed: Optional[Callable[[str], None]] = None,
+                 external_change_interval: Optional[float] = None):
+        """
+        初始化任务调度器
+
+        Args:
+            max_workers: 线程池最大工作线程数，如不传则从配置读取
+            poll_interval: 兜底轮询间隔（秒），有新任务或任务完成时会立即唤醒调度
+            on_task_started: 任务开始回调(任务类型, 任务ID)
+            on_task_finished: 任务完成回调(任务类型, 任务ID, 是否成功)
+            on_status_changed: 状态变化回调(状态消息)
+            external_change_interval: 检测其他进程写入数据库的间隔（秒），
+                用于多进程共享数据库时及时发现其他进程创建的任务；None 表示不检测
+        """
+        self.on_task_started = on_task_started
+        self.on_task_finished = on_task_finished
+        self.on_status_changed = on_status_changed
+        self.external_change_interval = external_change_interval
+        self._data_version = None
+
+        # 从配置读取线程数
+        if max_workers is None:
+            config_manager = get_config_manager()
+            max_workers = config_manager.get_int(
+                CONFIG_KEY_TASK_MANAGER_THREADS,
+                DEFAULT_TASK_MANAGER_THREADS
+            )
+
+        self.max_workers = max_workers
+        self.poll_interval = poll_interval
+        self.is_running = False
+
+        # 租约：本调度器的唯一标识，以及租约时长和心跳间隔（租约时长的 1/3）
+        self.worker_id = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.lease_seconds = max(10, get_config_manager().get_int(
+            CONFIG_KEY_TASK_LEASE_SECONDS,
+            DEFAULT_TASK_LEASE_SECONDS
+        ))
+        self.heartbeat_interval = self.lease_seconds / 3
+        self._last_heartbeat = 0
+
+        # 执行引擎：线程池或 asyncio 事件循环（run() 中创建）
+        self.engine = get_config_manager().get(CONFIG_KEY_TASK_ENGINE, TASK_ENGINE_THREAD) or TASK_ENGINE_THREAD
+        self.async_max_in_flight = max(1, get_config_manager().get_int(
+            CONFIG_KEY_ASYNC_MAX_IN_FLIGHT,
+            DEFAULT_ASYNC_MAX_IN_FLIGHT
+        ))
+        self.thread_pool = None
+        self.async_engine = None
+
+        # 唤醒事件：新任务创建或任务完成时触发，立即进行下一次调度
+        self._wakeup_event = threading.Event()
+
+        # 已提交到线程池但尚未完成的任务：{(任务类型, 任务ID)}，用于计算空闲线程数
+        self._inflight_tasks = set()
+        self._inflight_lock = threading.Lock()
+
+        # 下一次调度时第一个扫描的执行器下标
+        self._dispatch_offset = 0
+
+        # 账号并发与速率限制（所有执行器共用），上次调度是否因账号繁忙跳过了任务
+        self.account_limiter = AccountLimiter.from_config()
+        self._account_limited = False
+
+        # 异步任务轮询服务：开启异步提交后执行器提交请求即返回，生成结果由轮询服务批量查询
+        self.job_poller = JobPoller(
+            enabled=get_config_manager().get_bool(CONFIG_KEY_ASYNC_JOBS, False),
+            on_job_finished=self._on_job_finished
+        )
+
+        # 注册所有任务执行器
+        self.executors = []
+        self.register_executors()
+
+    def register_executors(self):
+        """注册所有任务执行器"""
+        # 注册即梦国际版图片生成任务执行器
+        from app.managers.jimeng_intl_image_task_executor import JimengIntlImageTaskExecutor
+        self.executors.append(JimengIntlImageTaskExecutor())
+
+        # 注册即梦国际版视频生成任务执行器
+        from app.managers.jimeng_intl_video_task_executor import JimengIntlVideoTaskExecutor
+        self.executors.append(JimengIntlVideoTaskExecutor())
+
+        for executor in self.executors:
+            executor.account_limiter = self.account_limiter
+            executor.job_poller = self.job_poller
+
+        log.info(f"已注册 {len(self.executors)} 个任务执行器")
+
+    def set_max_workers(self, max_workers, save_config=True):
+        """
+        设置线程池最大工作线程数
+
+        Args:
+            max_workers: 最大工作线程数
+            save_config: 是否保存到配置
+        """
+        # 限制范围
+        if max_workers < 1:
+            max_workers = 1
+        if max_workers > 200:
+            max_workers = 200
+
+        self.max_workers = max_workers
+
+        # 保存到配置
+        if save_config:
+            config_manager = get_config_manager()
+            config_manager.set(CONFIG_KEY_TASK_MANAGER_THREADS, max_workers)
+
+        if self.thread_pool:
+            # 重新创建线程池
+            self.thread_pool.shutdown(wait=False)
+            self.thread_pool = ThreadPoolExecutor(max_workers=self.max_workers)
+            get_jimeng_api_client().set_pool_size(self.max_workers)
+            log.info(f"任务管理器线程池大小已更新为: {self.max_workers}")
+            # 线程数变化后立即按新的空闲数调度
+            self.wakeup()
+
+    def set_poll_interval(self, interval):
+        """
+        设置轮询间隔
+
+        Args:
+            interval: 间隔秒数
+        """
+        self.poll_interval = interval
+        log.info(f"轮询间隔已更新为: {self.poll_interval}秒")
+
+    def wakeup(self, task_type=None):
+        """
+        唤醒调度循环，立即扫描待执行任务
+
+        Args:
+            task_type: 触发唤醒的任务类型（仅用于日志）
+        """
+        log.debug(f"任务管理器被唤醒: {task_type or '全部'}")
+        self._wakeup_event.set()
+
+    def run(self):
+        """主循环：等待唤醒（或兜底轮询超时）后检查并执行任务，同时维护任务租约"""
+        self.is_running = True
+        self.start_engine()
+        self.job_poller.start()
+
+        notifier = get_task_notifier()
+        notifier.add_listener(self.wakeup)
+
+        log.info(f"任务管理器启动，执行引擎: {self.engine}, 最大并发: {self.get_capacity()}, "
+                 f"兜底轮询间隔: {self.poll_interval}秒, "
+                 f"租约时长: {self.lease_seconds}秒, 调度器标识: {self.worker_id}")
+        self._emit(self.on_status_changed, "任务管理器已启动")
+
+        # 启动时先回收租约过期的任务（上次崩溃或异常退出遗留的生成中任务）
+        self.requeue_expired_tasks()
+        self._last_heartbeat = time.monotonic()
+
+        while self.is_running:
+            # 先清除事件再扫描，扫描期间到达的通知会让下一次等待立即返回
+            self._wakeup_event.clear()
+
+            try:
+                self.heartbeat_if_due()
+                self.dispatch_pending_tasks()
+            except Exception as e:
+                log.error(f"任务管理器运行错误: {e}")
+
+            # 等待唤醒，超时后兜底扫描一次（不超过心跳间隔）
+            self.wait_for_wakeup()
+
+        notifier.remove_listener(self.wakeup)
+
+        # 关闭线程池，等待执行中的任务结束，期间继续续期租约
+        self.thread_pool.shutdown(wait=False)
+        while self.get_running_count() > 0:
+            self._wakeup_event.clear()
+            self.heartbeat_if_due()
+            self._wakeup_event.wait(self.heartbeat_interval)
+
+        # 还在等待结果的远程任务重新排队（保留远程任务ID），下次启动后继续查询
+        self.job_poller.stop()
+
+        if self.async_engine:
+            self.async_engine.shutdown()
+            self.async_engine = None
+
+        # 关闭参考图片预处理进程，下次启动后使用时重新创建
+        shutdown_image_preprocessor()
+
+        log.info("任务管理器已停止")
+        self._emit(self.on_status_changed, "任务管理器已停止")
+
+    def start_engine(self):
+        """创建执行引擎；配置为 asyncio 但未安装 aiohttp 时回退到线程池"""
+        self.thread_pool = ThreadPoolExecutor(max_workers=self.max_workers)
+        # 每个工作线程都能拿到一条长连接，不会因连接池不够而临时新建连接
+        get_jimeng_api_client().set_pool_size(self.max_workers)
+
+        if self.engine != TASK_ENGINE_ASYNCIO:
+            self.engine = TASK_ENGINE_THREAD
+            return
+
+        from app.client.jimeng_async_api_client import is_async_client_available
+        if not is_async_client_available():
+            log.warning("未安装 aiohttp，asyncio 执行引擎不可用，回退到线程池")
+            self.engine = TASK_ENGINE_THREAD
+            return
+
+        from app.managers.async_task_engine import AsyncTaskEngine
+        self.async_engine = AsyncTaskEngine(max_in_flight=self.async_max_in_flight)
+        self.async_engine.start()
+
+    def get_capacity(self):
+        """
+        获取最大同时执行的任务数
+
+        Returns:
+            int: 线程池为线程数，asyncio 引擎为 async_max_in_flight
+        """
+        if self.async_engine:
+            return self.async_max_in_flight
+        return self.max_workers
+
+    def wait_for_wakeup(self):
+        """等待唤醒事件；开启外部变更检测时，按检测间隔查看数据库是否被其他进程写入"""
+        timeout = min(self.poll_interval, self.heartbeat_interval)
+        if self._account_limited:
+            # 有任务因账号限速被跳过时，在令牌补充后立即重新调度
+            refill_delay = self.account_limiter.get_next_refill_delay()
+            if refill_delay is not None:
+                timeout = min(timeout, max(0.1, refill_delay))
+        if not self.external_change_interval:
+            self._wakeup_event.wait(timeout)
+            return
+
+        deadline = time.monotonic() + timeout
+        while self.is_running and not self._wakeup_event.is_set():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            if self._wakeup_event.wait(min(self.external_change_interval, remaining)):
+                return
+            if self.has_external_changes():
+                return
+
+    def has_external_changes(self):
+        """
+        通过 PRAGMA data_version 判断数据库是否被其他连接提交过修改（开销极小，不扫描任务表）
+
+        Returns:
+            bool: 自上次检查后是否有其他连接的提交
+        """
+        try:
+            from app.database.db import db
+            version = db.execute_sql("PRAGMA data_version").fetchone()[0]
+        except Exception as e:
+            log.debug(f"检测数据库变更失败: {e}")
+            return False
+
+        changed = self._data_version is not None and version != self._data_version
+        self._data_version = version
+        return changed
+
+    def get_running_count(self):
+        """
+        获取执行中的任务数
+
+        Returns:
+            int: 执行中的任务数
+        """
+        with self._inflight_lock:
+            return len(self._inflight_tasks)
+
+    def heartbeat_if_due(self):
+        """到达心跳间隔时续期本调度器持有的租约，并回收其他调度器遗留的过期租约"""
+        if time.monotonic() - self._last_heartbeat < self.heartbeat_interval:
+            return
+        self._last_heartbeat = time.monotonic()
+        self.renew_leases()
+        self.requeue_expired_tasks()
+
+    def renew_leases(self):
+        """为所有执行中的任务续期租约（每种任务类型一条 UPDATE）"""
+        with self._inflight_lock:
+            inflight = list(self._inflight_tasks)
+
+        for executor in self.executors:
+            task_type = executor.get_task_type()
+            task_ids = [task_id for (t, task_id) in inflight if t == task_type]
+            # 已异步提交、等待结果的任务同样由本调度器持有租约
+            task_ids += self.job_poller.get_task_ids(task_type)
+            if task_ids:
+                renewed = executor.renew_leases(self.worker_id, task_ids, self.lease_seconds)
+                log.debug(f"{task_type} 续期租约 {renewed}/{len(task_ids)} 个")
+
+    def requeue_expired_tasks(self):
+        """回收所有执行器中租约过期的生成中任务"""
+        total = 0
+        for executor in self.executors:
+            total += executor.requeue_expired_tasks()
+        if total:
+            self.wakeup()
+        return total
+
+    def get_free_slots(self):
+        """
+        获取执行引擎剩余空闲数
+
+        Returns:
+            int: 空闲数
+        """
+        return max(0, self.get_capacity() - self.get_running_count())
+
+    def dispatch_pending_tasks(self):
+        """按线程池空闲数认领所有执行器的待执行任务并提交到线程池"""
+        free_slots = self.get_free_slots()
+        if free_slots <= 0:
+            log.debug("线程池已满，跳过本次扫描")
+            return
+
+        log.debug(f"开始扫描任务，当前执行器数量: {len(self.executors)}，空闲线程: {free_slots}")
+
+        total_claimed = 0
+
+        # 跳过绑定了繁忙账号的任务；未绑定账号的任务数量不超过所有账号剩余名额之和
+        busy_accounts = self.account_limiter.get_saturated_accounts()
+        unbound_limit = self.get_unbound_account_slots()
+        self._account_limited = bool(busy_accounts) or unbound_limit == 0
+
+        # 轮换执行器顺序，避免某一类任务积压时长期占满线程池
+        executors = self.executors[self._dispatch_offset:] + self.executors[:self._dispatch_offset]
+        self._dispatch_offset = (self._dispatch_offset + 1) % max(1, len(self.executors))
+
+        for executor in executors:
+            if free_slots <= 0:
+                break
+
+            executor_type = executor.get_task_type()
+            log.debug(f"正在认领 {executor_type} 类型的任务，最多 {free_slots} 个")
+
+            # 原子认领待执行任务，数量不超过剩余空闲线程
+            claimed_tasks = executor.claim_pending_tasks(
+                limit=free_slots,
+                owner=self.worker_id,
+                lease_seconds=self.lease_seconds,
+                exclude_account_ids=busy_accounts,
+                account_slots=self.account_limiter.get_free_slots,
+                unbound_limit=unbound_limit
+            )
+
+            if claimed_tasks:
+                log.info(f"认领 {len(claimed_tasks)} 个待处理的 {executor_type} 任务")
+                total_claimed += len(claimed_tasks)
+                free_slots -= len(claimed_tasks)
+                if unbound_limit is not None:
+                    unbound_limit = max(0, unbound_limit - len(claimed_tasks))
+
+            # 提交任务到线程池
+            for task in claimed_tasks:
+                log.debug(f"提交任务到线程池: {executor_type} - 任务ID: {getattr(task, 'id', 'unknown')}")
+                if not self.submit_task(executor, task):
+                    executor.release_tasks([task.id])
+
+        if total_claimed == 0:
+            log.debug("本次扫描未发现待处理任务")
+
+    def get_unbound_account_slots(self):
+        """
+        获取所有可用账号剩余执行名额之和
+
+        Returns:
+            int: 剩余名额，None 表示不限制
+        """
+        from app.models.jimeng_intl_account import JimengIntlAccount
+        try:
+            account_ids = JimengIntlAccount.get_usable_account_ids()
+        except Exception as e:
+            log.error(f"获取可用账号失败: {e}")
+            return None
+
+        # 没有可用账号时不限制，由执行器按原逻辑把任务标记为失败
+        if not account_ids:
+            return None
+        total = self.account_limiter.get_total_free_slots(account_ids)
+        return None if total < 0 else total
+
+    def submit_task(self, executor, task):
+        """
+        提交任务到线程池
+
+        Args:
+            executor: 任务执行器
+            task: 任务对象
+
+        Returns:
+            bool: 是否提交成功
+        """
+        inflight_key = None
+        try:
+            task_id = getattr(task, 'id', None)
+            task_type = executor.get_task_type()
+
+            log.info(f"提交任务到线程池: {task_type} - ID={task_id}")
+
+            # 发送任务开始信号
+            self._emit(self.on_task_started, task_type, task_id)
+
+            inflight_key = (task_type, task_id)
+            with self._inflight_lock:
+                self._inflight_tasks.add(inflight_key)
+
+            # 提交到执行引擎：asyncio 引擎中以协程执行，否则占用一个线程
+            if self.async_engine:
+                future = self.async_engine.submit_task(executor, task)
+            else:
+                future = self.thread_pool.submit(executor.execute_task, task)
+
+            # 添加完成回调
+            def task_done_callback(f):
+                success = False
+                try:
+                    success = f.result()
+                    if success == JOB_SUBMITTED:
+                        # 已异步提交：任务结束由轮询服务通知（_on_job_finished），租约继续由心跳续期
+                        log.info(f"任务已提交，等待结果: {task_type} - ID={task_id}")
+                    else:
+                        log.info(f"任务完成: {task_type} - ID={task_id}, 成功={success}")
+                        self._emit(self.on_task_finished, task_type, task_id, bool(success))
+                except CancelledError:
+                    # asyncio 引擎停止时取消，执行器已把任务重新排队
+                    success = None
+                    log.info(f"任务已取消: {task_type} - ID={task_id}")
+                    self._emit(self.on_task_finished, task_type, task_id, False)
+                except Exception as e:
+                    log.error(f"任务执行异常: {task_type} - ID={task_id}, 错误={str(e)}")
+                    self._emit(self.on_task_finished, task_type, task_id, False)
+                finally:
+                    # 执行结束（成功、失败或重新排队）后释放租约；已异步提交的任务继续持有租约
+                    if success != JOB_SUBMITTED:
+                        executor.clear_leases(self.worker_id, [task_id])
+                    with self._inflight_lock:
+                        self._inflight_tasks.discard(inflight_key)
+                    # 线程空出后立即调度下一批任务（含重新排队的任务）；
+                    # 因账号繁忙重新排队（返回 None）时不唤醒，等占用账号的任务结束后再调度，避免空转
+                    if success is not None or self.get_running_count() == 0:
+                        self.wakeup(task_type)
+
+            if self.async_engine:
+                # 完成回调包含数据库操作，交给引擎的同步线程执行，不阻塞事件循环
+                self.async_engine.add_done_callback(future, task_done_callback)
+            else:
+                future.add_done_callback(task_done_callback)
+            return True
+
+        except Exception as e:
+            log.error(f"提交任务失败: {str(e)}")
+            if inflight_key is not None:
+                with self._inflight_lock:
+                    self._inflight_tasks.discard(inflight_key)
+            return False
+
+    def _on_job_finished(self, task_type, task_id, success):
+        """异步提交的任务结束（轮询服务的保存线程中调用）"""
+        log.info(f"任务完成: {task_type} - ID={task_id}, 成功={success}")
+        self._emit(self.on_task_finished, task_type, task_id, success)
+        for executor in self.executors:
+            if executor.get_task_type() == task_type:
+                executor.clear_leases(self.worker_id, [task_id])
+        self.wakeup(task_type)
+
+    def stop(self):
+        """停止任务管理器"""
+        log.info("正在停止任务管理器...")
+        self.is_running = False
+        self._wakeup_event.set()
+
+    def _emit(self, callback, *args):
+        """调用回调函数，回调异常不影响调度"""
+        if callback is None:
+            return
+        try:
+            callback(*args)
+        except Exception as e:
+            log.error(f"任务调度回调执行失败: {e}")
+
+    def get_status(self):
+        """
+        获取任务管理器状态
+
+        Returns:
+            dict: 状态信息
+        """
+        return {
+            'is_running': self.is_running,
+            'worker_id': self.worker_id,
+            'engine': self.engine,
+            'max_workers': self.max_workers,
+            'capacity': self.get_capacity(),
+            'running_tasks': self.get_running_count(),
+            'polling_jobs': self.job_poller.get_pending_count(),
+            'poll_interval': self.poll_interval,
+            'executor_count': len(self.executors)
+        }
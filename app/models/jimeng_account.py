@@ -2,6 +2,9 @@
 from peewee import Model, AutoField, CharField, IntegerField, DateTimeField
 from datetime import datetime
 from app.database.db import db
+from app.database.keyset import keyset_page
+from app.models.table_row_count import TableRowCount
+from app.utils.logger import log
 
 
 class JimengAccount(Model):
@@ -17,9 +20,35 @@ class JimengAccount(Model):
         database = db
         table_name = "jimeng_account"
 
+    # 账号变化监听器：callback(账号)，新增、修改和删除（软删除）账号后调用
+    _change_listeners = []
+
     def save(self, *args, **kwargs):
-        """重写保存方法"""
-        return super().save(*args, **kwargs)
+        """重写保存方法，保存后通知监听器"""
+        result = super().save(*args, **kwargs)
+        for callback in list(self._change_listeners):
+            try:
+                callback(self)
+            except Exception as e:
+                log.error(f"账号变化监听器执行失败: {e}")
+        return result
+
+    @classmethod
+    def add_change_listener(cls, callback):
+        """
+        注册账号变化监听器（如账号分配器的账号环）
+
+        Args:
+            callback: 回调函数(账号)
+        """
+        if callback not in cls._change_listeners:
+            cls._change_listeners.append(callback)
+
+    @classmethod
+    def remove_change_listener(cls, callback):
+        """移除账号变化监听器"""
+        if callback in cls._change_listeners:
+            cls._change_listeners.remove(callback)
 
     @classmethod
     def get_all_accounts(cls):
@@ -55,6 +84,22 @@ class JimengAccount(Model):
     def get_accounts_by_page(cls, page: int = 1, page_size: int = 20):
         """分页获取账号"""
         query = cls.select().where(cls.is_deleted == 0).order_by(cls.created_at.desc())
-        total = query.count()
+        total = TableRowCount.get_count(cls._meta.table_name)
         rows = query.paginate(page, page_size)
         return list(rows), total
+
+    @classmethod
+    def get_accounts_after(cls, cursor=None, page_size: int = 20):
+        """
+        键集分页：按创建时间倒序获取 cursor 之后的一页账号
+
+        Args:
+            cursor: 上一页最后一个账号的 (created_at, id)，None 表示第一页
+            page_size: 每页数量
+
+        Returns:
+            (账号列表, 总数)
+        """
+        query = cls.select().where(cls.is_deleted == 0)
+        rows = keyset_page(query, cls.created_at, cls.id, cursor, page_size)
+        return rows, TableRowCount.get_count(cls._meta.table_name)
@@ -3,6 +3,10 @@ from peewee import *
 from datetime import datetime
 import json
 from app.database.db import db
+from app.database.keyset import keyset_page
+from app.models.table_row_count import TableRowCount
+from app.database.bulk_insert import insert_many_chunked
+from app.utils.logger import log
 
 
 class JimengImageTask(Model):
@@ -37,6 +41,37 @@ class JimengImageTask(Model):
         database = db
         table_name = 'jimeng_image_tasks'
 
+    # 状态变化监听器：callback(账号ID, 旧状态, 新状态)，旧状态为 None 表示新建，新状态为 None 表示删除
+    _status_listeners = []
+
+    @classmethod
+    def add_status_listener(cls, callback):
+        """
+        注册任务状态变化监听器（如账号分配器的内存计数表）
+
+        Args:
+            callback: 回调函数(账号ID, 旧状态, 新状态)
+        """
+        if callback not in cls._status_listeners:
+            cls._status_listeners.append(callback)
+
+    @classmethod
+    def remove_status_listener(cls, callback):
+        """移除任务状态变化监听器"""
+        if callback in cls._status_listeners:
+            cls._status_listeners.remove(callback)
+
+    @classmethod
+    def _notify_status_change(cls, account_id, old_status, new_status):
+        """通知任务状态变化（未绑定账号的任务不通知）"""
+        if account_id is None or old_status == new_status:
+            return
+        for callback in list(cls._status_listeners):
+            try:
+                callback(account_id, old_status, new_status)
+            except Exception as e:
+                log.error(f"任务状态监听器执行失败: {e}")
+
     def save(self, *args, **kwargs):
         """保存时自动更新时间"""
         self.updated_at = datetime.now()
@@ -89,8 +124,42 @@ class JimengImageTask(Model):
             resolution=resolution,
             status="pending"
         )
+        cls._notify_status_change(task.account_id, None, task.status)
         return task
 
+    @classmethod
+    def bulk_create_tasks(cls, tasks_data, progress=None):
+        """
+        批量创建任务（按批插入，每批一个事务）
+
+        Args:
+            tasks_data: 任务参数列表，每项为 dict，键与 create_task 的参数相同
+            progress: 进度回调(已创建数, 总数)
+
+        Returns:
+            创建的任务ID列表
+        """
+        now = datetime.now()
+        rows = []
+        for t in tasks_data:
+            input_image_paths = t.get('input_image_paths')
+            rows.append({
+                'prompt': t.get('prompt', ''),
+                'account_id': t.get('account_id'),
+                'input_image_path': json.dumps(input_image_paths, ensure_ascii=False) if input_image_paths else None,
+                'image_model': t.get('image_model', ''),
+                'aspect_ratio': t.get('aspect_ratio', '1:1'),
+                'resolution': t.get('resolution', '1024x1024'),
+                'status': 'pending',
+                'created_at': now,
+                'updated_at': now,
+            })
+
+        ids = insert_many_chunked(cls, rows, progress=progress)
+        for row in rows:
+            cls._notify_status_change(row['account_id'], None, 'pending')
+        return ids
+
     @classmethod
     def get_tasks_by_page(cls, page=1, page_size=20, status=None):
         """
@@ -109,11 +178,31 @@ class JimengImageTask(Model):
         if status:
             query = query.where(cls.status == status)
 
-        total = query.count()
+        total = TableRowCount.get_count(cls._meta.table_name, status or None)
         tasks = query.paginate(page, page_size)
 
         return list(tasks), total
 
+    @classmethod
+    def get_tasks_after(cls, cursor=None, page_size=20, status=None):
+        """
+        键集分页：按创建时间倒序获取 cursor 之后的一页任务，耗时与页码和任务总数无关
+
+        Args:
+            cursor: 上一页最后一个任务的 (created_at, id)，None 表示第一页
+            page_size: 每页数量
+            status: 状态筛选（可选）
+
+        Returns:
+            (tasks列表, 总数)
+        """
+        query = cls.select()
+        if status:
+            query = query.where(cls.status == status)
+        tasks = keyset_page(query, cls.created_at, cls.id, cursor, page_size)
+        total = TableRowCount.get_count(cls._meta.table_name, status or None)
+        return tasks, total
+
     @classmethod
     def get_task_by_id(cls, task_id):
         """
@@ -145,10 +234,12 @@ class JimengImageTask(Model):
         """
         try:
             task = cls.get_by_id(task_id)
+            old_status = task.status
             task.status = status
             if error_message:
                 task.error_message = error_message
             task.save()
+            cls._notify_status_change(task.account_id, old_status, status)
             return True
         except cls.DoesNotExist:
             return False
@@ -177,8 +268,10 @@ class JimengImageTask(Model):
             if len(output_paths) > 3:
                 task.output_image_4 = output_paths[3]
 
+            old_status = task.status
             task.status = "success"
             task.save()
+            cls._notify_status_change(task.account_id, old_status, task.status)
             return True
         except cls.DoesNotExist:
             return False
@@ -197,10 +290,31 @@ class JimengImageTask(Model):
         try:
             task = cls.get_by_id(task_id)
             task.delete_instance()
+            cls._notify_status_change(task.account_id, task.status, None)
             return True
         except cls.DoesNotExist:
             return False
 
+    @classmethod
+    def count_by_account_status(cls, account_ids=None):
+        """
+        按账号和状态统计任务数（一条 GROUP BY 查询）
+
+        Args:
+            account_ids: 只统计这些账号（可选）
+
+        Returns:
+            dict: {账号ID: {状态: 任务数}}
+        """
+        query = cls.select(cls.account_id, cls.status, fn.COUNT(cls.id)).where(cls.account_id.is_null(False))
+        if account_ids is not None:
+            query = query.where(cls.account_id.in_(list(account_ids)))
+
+        stats = {}
+        for account_id, status, count in query.group_by(cls.account_id, cls.status).tuples():
+            stats.setdefault(account_id, {})[status] = count
+        return stats
+
     def get_output_images(self):
         """
         获取所有输出图片路径列表
@@ -2,6 +2,9 @@
 from peewee import Model, AutoField, CharField, DateTimeField, IntegerField
 from datetime import datetime
 from app.database.db import db
+from app.database.keyset import keyset_page
+from app.models.table_row_count import TableRowCount
+from app.utils.logger import log
 
 
 class JimengIntlAccount(Model):
@@ -18,9 +21,41 @@ class JimengIntlAccount(Model):
         database = db
         table_name = "jimeng_intl_account"
 
+    # 账号变化监听器：callback(账号)，新增、修改和删除（软删除）账号后调用
+    _change_listeners = []
+
     def save(self, *args, **kwargs):
-        """重写保存方法"""
-        return super().save(*args, **kwargs)
+        """重写保存方法，保存后通知监听器"""
+        result = super().save(*args, **kwargs)
+        for callback in list(self._change_listeners):
+            try:
+                callback(self)
+            except Exception as e:
+                log.error(f"账号变化监听器执行失败: {e}")
+        return result
+
+    @classmethod
+    def add_change_listener(cls, callback):
+        """
+        注册账号变化监听器（如账号分配器的账号环）
+
+        Args:
+            callback: 回调函数(账号)
+        """
+        if callback not in cls._change_listeners:
+            cls._change_listeners.append(callback)
+
+    @classmethod
+    def remove_change_listener(cls, callback):
+        """移除账号变化监听器"""
+        if callback in cls._change_listeners:
+            cls._change_listeners.remove(callback)
+
+    def is_available(self) -> bool:
+        """是否可用（未删除，且今天未被禁用）"""
+        if self.is_deleted:
+            return False
+        return self.disabled_at is None or self.disabled_at.date() < datetime.now().date()
 
     @classmethod
     def get_all_accounts(cls):
@@ -56,12 +91,28 @@ class JimengIntlAccount(Model):
     def get_accounts_by_page(cls, page: int = 1, page_size: int = 20):
         """分页获取账号"""
         query = cls.select().where(cls.is_deleted == 0).order_by(cls.created_at.desc())
-        total = query.count()
+        total = TableRowCount.get_count(cls._meta.table_name)
         rows = query.paginate(page, page_size)
         return list(rows), total
 
     @classmethod
-    def get_available_account(cls, required_points: int = 0):
+    def get_accounts_after(cls, cursor=None, page_size: int = 20):
+        """
+        键集分页：按创建时间倒序获取 cursor 之后的一页账号
+
+        Args:
+            cursor: 上一页最后一个账号的 (created_at, id)，None 表示第一页
+            page_size: 每页数量
+
+        Returns:
+            (账号列表, 总数)
+        """
+        query = cls.select().where(cls.is_deleted == 0)
+        rows = keyset_page(query, cls.created_at, cls.id, cursor, page_size)
+        return rows, TableRowCount.get_count(cls._meta.table_name)
+
+    @classmethod
+    def get_available_account(cls, required_points: int = 0, exclude_ids=None):
         """
         获取一个可用的账号（排除今天禁用的和已删除的）
 
@@ -71,6 +122,7 @@ class JimengIntlAccount(Model):
 
         Args:
             required_points: 需要的积分数，默认为0（不检查积分）
+            exclude_ids: 排除的账号ID（如已达到并发上限的账号）
 
         Returns:
             JimengIntlAccount: 可用的账号，如果没有返回None
@@ -87,6 +139,8 @@ class JimengIntlAccount(Model):
         # 如果需要检查积分，过滤满足积分要求的账号
         if required_points > 0:
             query = query.where(cls.points >= required_points)
+        if exclude_ids:
+            query = query.where(cls.id.not_in(list(exclude_ids)))
 
         account = query.order_by(cls.points.desc()).first()
 
@@ -99,28 +153,80 @@ class JimengIntlAccount(Model):
             (cls.is_deleted == 0) &
             ((cls.disabled_at.is_null()) | (cls.disabled_at < today))
         )
+        if exclude_ids:
+            query = query.where(cls.id.not_in(list(exclude_ids)))
 
         account = query.order_by(cls.created_at.asc()).first()
 
         return account
 
     @classmethod
-    def get_available_account_for_nanobanana(cls):
+    def get_available_account_for_nanobanana(cls, exclude_ids=None):
         """
         获取一个无积分账号用于 NanoBanana 模型（排除今天禁用的和已删除的）
 
+        Args:
+            exclude_ids: 排除的账号ID（如已达到并发上限的账号）
+
+        Returns:
+            JimengIntlAccount: 无积分账号，如果没有返回None
+        """
+        return cls.get_available_free_account(exclude_ids=exclude_ids)
+
+    @classmethod
+    def get_available_free_account(cls, exclude_ids=None):
+        """
+        获取一个无积分账号（排除今天禁用的和已删除的），按创建时间优先
+
+        Args:
+            exclude_ids: 排除的账号ID（如已达到并发上限的账号）
+
         Returns:
             JimengIntlAccount: 无积分账号，如果没有返回None
         """
         today = datetime.now().date()
 
-        account = cls.select().where(
+        query = cls.select().where(
             (cls.account_type == 0) &
             (cls.is_deleted == 0) &
             ((cls.disabled_at.is_null()) | (cls.disabled_at < today))
-        ).order_by(cls.created_at.asc()).first()
+        )
+        if exclude_ids:
+            query = query.where(cls.id.not_in(list(exclude_ids)))
 
-        return account
+        return query.order_by(cls.created_at.asc()).first()
+
+    @classmethod
+    def get_usable_account_ids(cls) -> list:
+        """
+        获取所有可用账号的ID（排除今天禁用的和已删除的，不检查积分）
+
+        Returns:
+            list: 账号ID列表
+        """
+        today = datetime.now().date()
+        return [row[0] for row in cls.select(cls.id).where(
+            (cls.is_deleted == 0) &
+            ((cls.disabled_at.is_null()) | (cls.disabled_at < today))
+        ).tuples()]
+
+    @classmethod
+    def update_points(cls, account_id: int, points: int, disable: bool = False) -> bool:
+        """
+        按主键更新账号积分（不修改账号对象：积分账本和账号环缓存的账号对象由多个线程共用）
+
+        Args:
+            account_id: 账号ID
+            points: 最新积分
+            disable: 是否同时禁用账号（设置禁用日期为今天）
+
+        Returns:
+            bool: 账号是否存在
+        """
+        values = {cls.points: points}
+        if disable:
+            values[cls.disabled_at] = datetime.now()
+        return cls.update(values).where(cls.id == account_id).execute() > 0
 
     @classmethod
     def disable_account_today(cls, account_id: int) -> bool:
@@ -2,10 +2,15 @@ from peewee import Model, AutoField, IntegerField, CharField, TextField, DateTim
 from datetime import datetime
 from app.database.db import db
 from app.models.jimeng_intl_account import JimengIntlAccount
+from app.models.task_queue_mixin import TaskQueueMixin
+from app.utils.task_notifier import get_task_notifier
 import json
 
 
-class JimengIntlImageTask(Model):
+class JimengIntlImageTask(TaskQueueMixin, Model):
+    # 任务类型（与执行器一致，用于唤醒调度器）
+    TASK_TYPE = "jimeng_intl_image"
+
     id = AutoField(primary_key=True)
 
     prompt = TextField()
@@ -15,6 +20,12 @@ class JimengIntlImageTask(Model):
 
     status = IntegerField(default=0)
 
+    lease_owner = CharField(max_length=100, null=True)
+    lease_expires_at = DateTimeField(null=True)
+
+    # 远程任务ID：异步提交后由服务端返回，结果由任务轮询服务查询；重新认领时据此继续轮询而不是重复提交
+    remote_task_id = CharField(max_length=100, null=True)
+
     account_id = ForeignKeyField(JimengIntlAccount, null=True, backref='intl_image_tasks')
 
     input_images = TextField(null=True)
@@ -28,6 +39,9 @@ class JimengIntlImageTask(Model):
 
     isdel = IntegerField(default=0)
 
+    # 变更序号：插入或界面相关字段变化时由触发器设为表内最大值+1，界面据此只查询变化的任务
+    change_seq = IntegerField(default=0)
+
     class Meta:
         database = db
         table_name = "jimeng_intl_image_task"
@@ -65,7 +79,7 @@ class JimengIntlImageTask(Model):
             self.output_images = None
 
     @classmethod
-    def create_task(cls, prompt: str, account_id: int = None, ratio: str = "1:1", model: str = "jimeng-4.5", resolution: str = "2k", input_images=None):
+    def create_task(cls, prompt: str, account_id: int = None, ratio: str = "1:1", model: str = "jimeng-4.5", resolution: str = "2k", input_images=None, notify: bool = True):
         if account_id is not None:
             acc = JimengIntlAccount.select().where((JimengIntlAccount.id == account_id) & (JimengIntlAccount.is_deleted == 0)).first()
             if not acc:
@@ -73,7 +87,7 @@ class JimengIntlImageTask(Model):
         input_json = None
         if input_images:
             input_json = json.dumps(input_images, ensure_ascii=False)
-        return cls.create(
+        task = cls.create(
             prompt=prompt,
             account_id=account_id,
             ratio=ratio,
@@ -82,11 +96,23 @@ class JimengIntlImageTask(Model):
             status=0,
             input_images=input_json
         )
+        if notify:
+            get_task_notifier().notify(cls.TASK_TYPE)
+        return task
+
+    @classmethod
+    def _bulk_task_params(cls, task_data: dict) -> dict:
+        """批量创建时图片任务特有的字段"""
+        return {
+            'ratio': task_data.get('ratio', '1:1'),
+            'model': task_data.get('model', 'jimeng-4.5'),
+            'resolution': task_data.get('resolution', '2k'),
+        }
 
     @classmethod
     def get_tasks_by_page(cls, page: int = 1, page_size: int = 20):
         query = cls.select().where(cls.isdel == 0).order_by(cls.create_at.desc())
-        total = query.count()
+        total = cls.get_total_count()
         rows = query.paginate(page, page_size)
         return list(rows), total
 
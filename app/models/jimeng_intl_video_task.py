@@ -3,11 +3,16 @@ from peewee import Model, AutoField, IntegerField, CharField, TextField, DateTim
 from datetime import datetime
 from app.database.db import db
 from app.models.jimeng_intl_account import JimengIntlAccount
+from app.models.task_queue_mixin import TaskQueueMixin
+from app.utils.task_notifier import get_task_notifier
 import json
 
 
-class JimengIntlVideoTask(Model):
+class JimengIntlVideoTask(TaskQueueMixin, Model):
     """即梦国际版视频任务模型"""
+    # 任务类型（与执行器一致，用于唤醒调度器）
+    TASK_TYPE = "jimeng_intl_video"
+
     id = AutoField(primary_key=True)
 
     # 提示词
@@ -29,6 +34,13 @@ class JimengIntlVideoTask(Model):
     # 任务状态: 0-排队中, 1-生成中, 2-已完成, 3-失败
     status = IntegerField(default=0)
 
+    # 租约：认领任务的调度器标识和租约到期时间，执行期间由心跳续期
+    lease_owner = CharField(max_length=100, null=True)
+    lease_expires_at = DateTimeField(null=True)
+
+    # 远程任务ID：异步提交后由服务端返回，结果由任务轮询服务查询；重新认领时据此继续轮询而不是重复提交
+    remote_task_id = CharField(max_length=100, null=True)
+
     # 关联账号
     account_id = ForeignKeyField(JimengIntlAccount, null=True, backref='intl_video_tasks')
 
@@ -49,6 +61,9 @@ class JimengIntlVideoTask(Model):
     # 软删除标记
     isdel = IntegerField(default=0)
 
+    # 变更序号：插入或界面相关字段变化时由触发器设为表内最大值+1，界面据此只查询变化的任务
+    change_seq = IntegerField(default=0)
+
     class Meta:
         database = db
         table_name = "jimeng_intl_video_task"
@@ -92,8 +107,13 @@ class JimengIntlVideoTask(Model):
     @classmethod
     def create_task(cls, prompt: str, account_id: int = None, ratio: str = "16:9",
                     model: str = "jimeng-video-3.0", duration: str = "5s",
-                    quality: str = "1080p", input_images=None, **kwargs):
-        """创建视频任务"""
+                    quality: str = "1080p", input_images=None, notify: bool = True, **kwargs):
+        """
+        创建视频任务
+
+        Args:
+            notify: 是否立即唤醒任务调度器（批量添加时由调用方统一通知）
+        """
         if account_id is not None:
             acc = JimengIntlAccount.select().where(
                 (JimengIntlAccount.id == account_id) & (JimengIntlAccount.is_deleted == 0)
@@ -105,7 +125,7 @@ class JimengIntlVideoTask(Model):
         if input_images:
             input_json = json.dumps(input_images, ensure_ascii=False)
 
-        return cls.create(
+        task = cls.create(
             prompt=prompt,
             account_id=account_id,
             ratio=ratio,
@@ -115,12 +135,25 @@ class JimengIntlVideoTask(Model):
             status=0,
             input_images=input_json
         )
+        if notify:
+            get_task_notifier().notify(cls.TASK_TYPE)
+        return task
+
+    @classmethod
+    def _bulk_task_params(cls, task_data: dict) -> dict:
+        """批量创建时视频任务特有的字段"""
+        return {
+            'ratio': task_data.get('ratio', '16:9'),
+            'model': task_data.get('model', 'jimeng-video-3.0'),
+            'duration': task_data.get('duration', '5s'),
+            'quality': task_data.get('quality', '1080p'),
+        }
 
     @classmethod
     def get_tasks_by_page(cls, page: int = 1, page_size: int = 20):
         """分页获取任务列表"""
         query = cls.select().where(cls.isdel == 0).order_by(cls.create_at.desc())
-        total = query.count()
+        total = cls.get_total_count()
         rows = query.paginate(page, page_size)
         return list(rows), total
 
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+from peewee import Model, CharField, IntegerField, CompositeKey, fn
+from app.database.db import db
+
+
+class TableRowCount(Model):
+    """
+    行数统计表
+
+    由数据库触发器在插入、删除和修改状态时增量维护（见 app/database/migrations.py），
+    列表分页直接读取，不再对任务表和账号表执行 COUNT(*)。
+    任务表按状态分组（只统计未删除的任务），账号表只有一个分组（未删除的账号）
+    """
+    source_table = CharField(max_length=100, verbose_name="数据表")
+    bucket = CharField(max_length=50, default="", verbose_name="分组（状态）")
+    row_count = IntegerField(default=0, verbose_name="行数")
+
+    class Meta:
+        database = db
+        table_name = "table_row_count"
+        primary_key = CompositeKey("source_table", "bucket")
+
+    @classmethod
+    def get_count(cls, source_table: str, bucket=None) -> int:
+        """
+        获取行数
+
+        Args:
+            source_table: 数据表名
+            bucket: 分组（任务状态），None 表示所有分组之和
+
+        Returns:
+            int: 行数
+        """
+        query = cls.select(fn.COALESCE(fn.SUM(cls.row_count), 0)).where(cls.source_table == source_table)
+        if bucket is not None:
+            query = query.where(cls.bucket == str(bucket))
+        return query.scalar() or 0
+
+    @classmethod
+    def get_counts(cls, source_table: str) -> dict:
+        """
+        获取各分组的行数
+
+        Args:
+            source_table: 数据表名
+
+        Returns:
+            dict: {分组: 行数}
+        """
+        query = cls.select(cls.bucket, cls.row_count).where(cls.source_table == source_table)
+        return {bucket: count for bucket, count in query.tuples()}
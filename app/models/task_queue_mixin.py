@@ -0,0 +1,333 @@
+# -*- coding: utf-8 -*-
+"""
+任务队列公共方法
+
+图片任务和视频任务表结构相同的部分（状态、租约、账号、变更序号）共用这些类方法：
+批量创建、原子认领、租约续期与回收、键集分页和增量变化查询
+"""
+from datetime import datetime, timedelta
+from peewee import fn
+from app.database.keyset import keyset_page
+from app.database.bulk_insert import insert_many_chunked
+from app.models.table_row_count import TableRowCount
+from app.models.jimeng_intl_account import JimengIntlAccount
+from app.utils.task_notifier import get_task_notifier
+from app.utils.task_update_bus import get_task_update_bus
+import json
+
+
+class TaskQueueMixin:
+    """
+    任务队列公共方法（与 peewee Model 一起继承）
+
+    子类需要定义 TASK_TYPE 和 status、lease_owner、lease_expires_at、account_id、
+    remote_task_id、input_images、create_at、update_at、isdel、change_seq 等字段，并实现 _bulk_task_params
+    """
+    TASK_TYPE = None
+
+    @classmethod
+    def _bulk_task_params(cls, task_data: dict) -> dict:
+        """
+        批量创建时任务类型特有的字段（比例、模型等），未提供的使用默认值
+
+        Args:
+            task_data: 单个任务的参数
+
+        Returns:
+            dict: {字段名: 值}
+        """
+        return {}
+
+    @classmethod
+    def bulk_create_tasks(cls, tasks_data, progress=None, notify: bool = True) -> list:
+        """
+        批量创建任务：账号只校验一次，按批插入（每批一个事务）
+
+        Args:
+            tasks_data: 任务参数列表，每项为 dict，键与 create_task 的参数相同
+            progress: 进度回调(已创建数, 总数)
+            notify: 全部创建后是否唤醒任务调度器
+
+        Returns:
+            list: 创建的任务ID列表
+        """
+        account_ids = {t.get('account_id') for t in tasks_data if t.get('account_id') is not None}
+        if account_ids:
+            valid_ids = {acc.id for acc in JimengIntlAccount.select(JimengIntlAccount.id).where(
+                (JimengIntlAccount.id.in_(list(account_ids))) & (JimengIntlAccount.is_deleted == 0)
+            )}
+            if account_ids - valid_ids:
+                raise ValueError("invalid account_id")
+
+        now = datetime.now()
+        rows = []
+        for t in tasks_data:
+            input_images = t.get('input_images')
+            row = {
+                'prompt': t.get('prompt', ''),
+                'account_id': t.get('account_id'),
+                'status': 0,
+                'input_images': json.dumps(input_images, ensure_ascii=False) if input_images else None,
+                'create_at': now,
+                'update_at': now,
+            }
+            row.update(cls._bulk_task_params(t))
+            rows.append(row)
+
+        ids = insert_many_chunked(cls, rows, progress=progress)
+        if notify and ids:
+            get_task_notifier().notify(cls.TASK_TYPE)
+        return ids
+
+    @classmethod
+    def claim_pending_tasks(cls, limit: int = 10, owner: str = None, lease_seconds: int = 60,
+                            exclude_account_ids=None, account_slots=None, unbound_limit: int = None):
+        """
+        原子认领待执行任务：在一个 IMMEDIATE 事务中把最早的排队任务（状态0）置为生成中（状态1）
+
+        多个调度器（或多个进程）同时认领时，同一个任务只会被认领一次
+
+        Args:
+            limit: 最多认领的任务数量
+            owner: 认领者标识（租约持有者）
+            lease_seconds: 租约时长（秒），持有者需在到期前续期
+            exclude_account_ids: 跳过绑定了这些账号的任务（账号繁忙），继续认领后面的任务
+            account_slots: 返回账号剩余可用数的函数（-1 表示不限制），同一账号认领的任务数不超过该值
+            unbound_limit: 所有账号剩余名额之和，已认领数达到该值后不再认领未绑定账号的任务，None 表示不限制
+
+        Returns:
+            list: 认领成功的任务列表
+        """
+        if limit <= 0:
+            return []
+
+        with cls._meta.database.atomic('IMMEDIATE'):
+            query = cls.select(cls.id, cls.account_id).where((cls.status == 0) & (cls.isdel == 0))
+            if exclude_account_ids:
+                query = query.where(cls.account_id.is_null() | cls.account_id.not_in(list(exclude_account_ids)))
+            if unbound_limit is not None and unbound_limit <= 0:
+                query = query.where(cls.account_id.is_null(False))
+
+            if account_slots is None and unbound_limit is None:
+                ids = [row.id for row in query.order_by(cls.create_at.asc(), cls.id.asc()).limit(limit)]
+            else:
+                ids = cls._pick_claimable_ids(query.order_by(cls.create_at.asc(), cls.id.asc()), limit,
+                                              account_slots, unbound_limit)
+            if not ids:
+                return []
+
+            now = datetime.now()
+            cls.update(
+                status=1,
+                lease_owner=owner,
+                lease_expires_at=now + timedelta(seconds=lease_seconds),
+                update_at=now
+            ).where(
+                (cls.id.in_(ids)) & (cls.status == 0)
+            ).execute()
+
+            claimed = list(cls.select().where(
+                (cls.id.in_(ids)) & (cls.status == 1) & (cls.lease_owner == owner)
+            ).order_by(cls.create_at.asc(), cls.id.asc()))
+
+        get_task_update_bus().publish_many(cls.TASK_TYPE, [task.id for task in claimed], {'status': 1})
+        return claimed
+
+    @classmethod
+    def _pick_claimable_ids(cls, query, limit: int, account_slots=None, unbound_limit: int = None) -> list:
+        """
+        按创建顺序挑选可认领的任务，跳过账号已无剩余名额的任务
+
+        Args:
+            query: 已排序的排队任务查询（包含 id、account_id）
+            limit: 最多挑选的数量
+            account_slots: 返回账号剩余可用数的函数（-1 表示不限制）
+            unbound_limit: 所有账号剩余名额之和
+
+        Returns:
+            list: 任务ID列表
+        """
+        ids = []
+        account_counts = {}
+        slots_cache = {}
+
+        # 只扫描有限的行数，避免排队任务很多时长时间持有写锁
+        for row in query.limit(max(limit * 10, 500)).tuples():
+            task_id, account_id = row
+            if account_id is None:
+                # 所有账号的剩余名额由已挑选的任务（含绑定账号的任务）共同占用
+                if unbound_limit is not None and len(ids) >= unbound_limit:
+                    continue
+            elif account_slots is not None:
+                if account_id not in slots_cache:
+                    slots_cache[account_id] = account_slots(account_id)
+                slots = slots_cache[account_id]
+                if 0 <= slots <= account_counts.get(account_id, 0):
+                    continue
+                account_counts[account_id] = account_counts.get(account_id, 0) + 1
+
+            ids.append(task_id)
+            if len(ids) >= limit:
+                break
+
+        return ids
+
+    @classmethod
+    def release_tasks(cls, task_ids) -> int:
+        """
+        释放已认领但未能执行的任务（状态1 -> 0）
+
+        Args:
+            task_ids: 任务ID列表
+
+        Returns:
+            int: 释放的任务数量
+        """
+        if not task_ids:
+            return 0
+        condition = (cls.id.in_(list(task_ids))) & (cls.status == 1)
+        return cls._requeue_where(condition)
+
+    @classmethod
+    def renew_leases(cls, owner: str, task_ids, lease_seconds: int = 60) -> int:
+        """
+        续期租约（心跳），只续期仍由 owner 持有且处于生成中的任务
+
+        Args:
+            owner: 租约持有者
+            task_ids: 任务ID列表
+            lease_seconds: 新的租约时长（秒）
+
+        Returns:
+            int: 续期的任务数量
+        """
+        if not task_ids:
+            return 0
+        return cls.update(
+            lease_expires_at=datetime.now() + timedelta(seconds=lease_seconds)
+        ).where(
+            (cls.id.in_(list(task_ids))) & (cls.lease_owner == owner) & (cls.status == 1)
+        ).execute()
+
+    @classmethod
+    def clear_leases(cls, owner: str, task_ids) -> int:
+        """
+        任务执行结束后清除租约
+
+        Args:
+            owner: 租约持有者
+            task_ids: 任务ID列表
+
+        Returns:
+            int: 清除的任务数量
+        """
+        if not task_ids:
+            return 0
+        return cls.update(lease_owner=None, lease_expires_at=None).where(
+            (cls.id.in_(list(task_ids))) & (cls.lease_owner == owner)
+        ).execute()
+
+    @classmethod
+    def requeue_expired_tasks(cls) -> int:
+        """
+        回收租约已过期（或没有租约）的生成中任务，重新排队
+
+        持有者崩溃或退出后不再续期，租约到期的任务由任意调度器一次性批量回收
+
+        Returns:
+            int: 重新排队的任务数量
+        """
+        now = datetime.now()
+        condition = (cls.status == 1) & ((cls.lease_expires_at.is_null()) | (cls.lease_expires_at < now))
+        return cls._requeue_where(condition)
+
+    @classmethod
+    def _requeue_where(cls, condition) -> int:
+        """
+        把满足条件的生成中任务重新排队（状态1 -> 0，清除租约），并把变化发布到任务更新总线
+
+        Args:
+            condition: 查询条件（需包含 status == 1）
+
+        Returns:
+            int: 重新排队的任务数量
+        """
+        # 在同一个写事务中查出ID再更新，发布的ID与实际修改的行一致
+        with cls._meta.database.atomic('IMMEDIATE'):
+            ids = [row.id for row in cls.select(cls.id).where(condition)]
+            if not ids:
+                return 0
+            count = cls.update(
+                status=0, lease_owner=None, lease_expires_at=None, update_at=datetime.now()
+            ).where(condition).execute()
+
+        get_task_update_bus().publish_many(cls.TASK_TYPE, ids, {'status': 0})
+        return count
+
+    @classmethod
+    def get_tasks_after(cls, cursor=None, page_size: int = 20):
+        """
+        键集分页：按创建时间倒序获取 cursor 之后的一页任务，耗时与页码和任务总数无关
+
+        Args:
+            cursor: 上一页最后一个任务的 (create_at, id)，None 表示第一页
+            page_size: 每页数量
+
+        Returns:
+            (tasks列表, 总数)
+        """
+        query = cls.select().where(cls.isdel == 0)
+        rows = keyset_page(query, cls.create_at, cls.id, cursor, page_size)
+        return rows, cls.get_total_count()
+
+    @classmethod
+    def get_changes_since(cls, change_seq: int, limit: int = 500):
+        """
+        获取变更序号大于 change_seq 的任务（新建、状态或结果变化、删除）
+
+        Args:
+            change_seq: 上次看到的最大变更序号
+            limit: 最多返回的任务数
+
+        Returns:
+            (任务列表（按变更序号升序，包含已删除的任务）, 新的最大变更序号)
+        """
+        rows = list(cls.select().where(cls.change_seq > change_seq).order_by(cls.change_seq).limit(limit))
+        return rows, (rows[-1].change_seq if rows else change_seq)
+
+    @classmethod
+    def get_max_change_seq(cls) -> int:
+        """获取当前最大变更序号"""
+        return cls.select(fn.MAX(cls.change_seq)).scalar() or 0
+
+    @classmethod
+    def get_total_count(cls, status: int = None) -> int:
+        """
+        获取未删除的任务数（读取触发器维护的统计，不执行 COUNT(*)）
+
+        Args:
+            status: 任务状态，None 表示所有状态
+
+        Returns:
+            int: 任务数
+        """
+        return TableRowCount.get_count(cls._meta.table_name, status)
+
+    @classmethod
+    def retry_task(cls, task_id: int) -> bool:
+        """
+        把任务重置为排队中（清除远程任务ID，重新提交生成），并唤醒任务调度器
+
+        Args:
+            task_id: 任务ID
+
+        Returns:
+            bool: 任务是否存在
+        """
+        updated = cls.update(
+            status=0, code=None, message=None, remote_task_id=None, update_at=datetime.now()
+        ).where((cls.id == task_id) & (cls.isdel == 0)).execute()
+        if updated:
+            get_task_update_bus().publish(cls.TASK_TYPE, task_id, {'status': 0, 'code': None, 'message': None})
+            get_task_notifier().notify(cls.TASK_TYPE)
+        return updated > 0
@@ -0,0 +1,674 @@
+# -*- coding: utf-8 -*-
+"""
+本地模拟即梦API服务
+
+不依赖真实服务即可运行 JimengApiClient、执行器和 GlobalTaskManager，用于在本机做可复现的吞吐量和延迟测试。
+实现客户端用到的全部接口：
+
+- POST /token/receive                查询积分
+- POST /v1/images/generations        文生图（JSON）
+- POST /v1/images/compositions       图生图（multipart 或 JSON 远程地址）
+- POST /v1/videos/generations        视频生成（JSON 或 multipart）
+- POST /v1/tasks/query               查询异步任务（请求带 async 参数时生成接口只返回 task_id）
+- POST /v1/files/upload              上传参考图片
+- GET  /files/<名称>                 生成结果（小的占位文件）
+- GET  /stats                        请求统计（各接口请求数、状态码、最大并发等）
+
+生成耗时按延迟分布随机（见 parse_latency），可设置 HTTP 错误率、生成失败率和每个 token 的积分，
+积分不够本次消耗时返回 -2001。随机数使用固定种子（--seed），便于复现同样的延迟和错误分布。
+
+用法:
+    python -m app.tools.mock_jimeng_server --port 8800
+    python -m app.tools.mock_jimeng_server --image-latency uniform:2,6 --video-latency normal:20,5 \\
+        --error-rate 0.05 --fail-rate 0.02 --credits tokenA=100 --credits tokenB=8 --default-credits 1000
+
+然后把配置项 jimeng_api 设为 http://127.0.0.1:8800
+"""
+import argparse
+import hashlib
+import itertools
+import json
+import math
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from app.managers.jimeng_intl_image_task_executor import IMAGE_MODEL_POINTS_MAP
+from app.managers.jimeng_intl_video_task_executor import get_video_points_cost
+from app.utils.logger import log
+
+DEFAULT_PORT = 8800
+# 每次生成返回的图片数
+DEFAULT_IMAGES_PER_TASK = 4
+# 完成后的异步任务保留时间（秒），超过后查询不到
+JOB_RETENTION_SECONDS = 3600
+# 清理过期异步任务的间隔（秒）
+JOB_PURGE_INTERVAL = 60
+# 上传地址有效期（秒）
+UPLOAD_EXPIRES_IN = 3600
+# 读取请求体时每次读取的字节数
+READ_CHUNK_SIZE = 64 * 1024
+
+# 1x1 PNG，作为生成结果的占位文件
+PLACEHOLDER_PNG = bytes.fromhex(
+    "89504e470d0a1a0a0000000d4948445200000001000000010806000000"
+    "1f15c4890000000b49444154789c6360000200000500017a5eab3f0000000049454e44ae426082"
+)
+# 最小的 MP4 文件头（ftyp box），作为视频结果的占位文件
+PLACEHOLDER_MP4 = b"\x00\x00\x00\x18ftypisom\x00\x00\x02\x00isommp42"
+
+
+def parse_latency(spec):
+    """
+    解析延迟分布
+
+    Args:
+        spec: 分布描述（秒），支持：
+            "2"                 固定值
+            "uniform:1,3"       均匀分布
+            "normal:5,1"        正态分布（均值, 标准差），小于0时取0
+            "exp:3"             指数分布（均值）
+            "lognormal:4,0.5"   对数正态分布（中位数, sigma），长尾延迟
+
+    Returns:
+        callable: 采样函数(random.Random) -> 秒数
+
+    Raises:
+        ValueError: 无法识别的分布
+    """
+    spec = str(spec).strip()
+    name, _, args = spec.partition(":")
+    if not args:
+        value = float(name)
+        return lambda rng: value
+
+    params = [float(x) for x in args.split(",")]
+    name = name.lower()
+    if name == "uniform" and len(params) == 2:
+        return lambda rng: rng.uniform(params[0], params[1])
+    if name == "normal" and len(params) == 2:
+        return lambda rng: max(0.0, rng.gauss(params[0], params[1]))
+    if name == "exp" and len(params) == 1:
+        return lambda rng: rng.expovariate(1.0 / params[0]) if params[0] > 0 else 0.0
+    if name == "lognormal" and len(params) == 2:
+        return lambda rng: rng.lognormvariate(math.log(params[0]), params[1])
+    raise ValueError(f"无法识别的延迟分布: {spec}")
+
+
+class MockJimengConfig:
+    """模拟服务参数"""
+
+    def __init__(self, image_latency="uniform:1,3", video_latency="uniform:5,10", submit_latency="0.05",
+                 error_rate: float = 0.0, error_status: int = 500, fail_rate: float = 0.0,
+                 credits: dict = None, default_credits: int = None,
+                 images_per_task: int = DEFAULT_IMAGES_PER_TASK, upload_enabled: bool = True, seed: int = 0):
+        """
+        Args:
+            image_latency: 图片生成耗时分布（见 parse_latency）
+            video_latency: 视频生成耗时分布
+            submit_latency: 异步提交、查询积分、上传等接口的响应耗时分布
+            error_rate: 生成接口返回 HTTP 错误的概率（不消耗积分）
+            error_status: HTTP 错误的状态码，如 500 / 503 / 429
+            fail_rate: 生成失败的概率（同步接口返回没有结果的数据，异步任务状态为 failed，积分退还）
+            credits: 每个 token 的初始积分 {token: 积分}
+            default_credits: 未在 credits 中的 token 的初始积分，None 表示不限积分（查询积分返回0，与无积分账号一致）
+            images_per_task: 每次图片生成返回的图片数
+            upload_enabled: 是否提供上传接口，关闭时返回404（客户端回退为随请求上传）
+            seed: 随机数种子
+        """
+        self.image_latency = parse_latency(image_latency)
+        self.video_latency = parse_latency(video_latency)
+        self.submit_latency = parse_latency(submit_latency)
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.fail_rate = fail_rate
+        self.credits = dict(credits or {})
+        self.default_credits = default_credits
+        self.images_per_task = images_per_task
+        self.upload_enabled = upload_enabled
+        self.seed = seed
+
+
+class MockJob:
+    """一个异步生成任务"""
+
+    def __init__(self, job_id: str, token: str, result: dict, failed: bool, duration: float):
+        self.job_id = job_id
+        self.token = token
+        self.result = result
+        self.failed = failed
+        self.created_at = time.monotonic()
+        self.done_at = self.created_at + duration
+
+
+class MockJimengState:
+    """模拟服务状态：积分、异步任务和统计（线程安全）"""
+
+    def __init__(self, config: MockJimengConfig):
+        self.config = config
+        self._rng = random.Random(config.seed)
+        self._balances = dict(config.credits)
+        self._jobs = {}
+        self._last_purge = time.monotonic()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    def random(self) -> float:
+        with self._lock:
+            return self._rng.random()
+
+    def sample(self, distribution) -> float:
+        with self._lock:
+            return distribution(self._rng)
+
+    def next_id(self, prefix: str) -> str:
+        return f"{prefix}{next(self._ids)}"
+
+    def get_balance(self, token: str):
+        """获取积分，None 表示不限积分"""
+        with self._lock:
+            return self._balances.get(token, self.config.default_credits)
+
+    def set_balance(self, token: str, credits):
+        """设置积分，None 表示不限积分"""
+        with self._lock:
+            self._balances[token] = credits
+
+    def charge(self, token: str, cost: int) -> bool:
+        """扣除积分，不够时返回 False"""
+        with self._lock:
+            balance = self._balances.get(token, self.config.default_credits)
+            if balance is None:
+                return True
+            if balance < cost:
+                self.stats["credits_exhausted"] += 1
+                return False
+            self._balances[token] = balance - cost
+            return True
+
+    def refund(self, token: str, cost: int):
+        """退还积分（生成失败）"""
+        with self._lock:
+            balance = self._balances.get(token, self.config.default_credits)
+            if balance is not None:
+                self._balances[token] = balance + cost
+
+    def add_job(self, job: MockJob):
+        with self._lock:
+            self._jobs[job.job_id] = job
+            self._purge_jobs()
+
+    def get_jobs(self, token: str, job_ids: list) -> list:
+        """获取 token 提交的任务（其他 token 的任务和不存在的任务不返回）"""
+        with self._lock:
+            jobs = [self._jobs.get(job_id) for job_id in job_ids]
+        return [job for job in jobs if job is not None and job.token == token]
+
+    def _purge_jobs(self):
+        """定期删除过期的已完成任务（需持有 _lock）"""
+        now = time.monotonic()
+        if now - self._last_purge < JOB_PURGE_INTERVAL:
+            return
+        self._last_purge = now
+        expire_before = now - JOB_RETENTION_SECONDS
+        for job_id in [j for j, job in self._jobs.items() if job.done_at < expire_before]:
+            del self._jobs[job_id]
+
+    def reset_stats(self):
+        """清空统计"""
+        with self._lock:
+            self.stats = {
+                "requests": {},
+                "status": {},
+                "credits_exhausted": 0,
+                "generated": 0,
+                "failed": 0,
+                "jobs_submitted": 0,
+                "reference_images": 0,
+                "uploaded_bytes": 0,
+                "in_flight": 0,
+                "max_in_flight": 0,
+                "max_in_flight_by_token": {},
+            }
+            self._in_flight_by_token = {}
+
+    def begin_request(self, path: str, token: str):
+        with self._lock:
+            stats = self.stats
+            stats["requests"][path] = stats["requests"].get(path, 0) + 1
+            stats["in_flight"] += 1
+            stats["max_in_flight"] = max(stats["max_in_flight"], stats["in_flight"])
+            if token:
+                count = self._in_flight_by_token.get(token, 0) + 1
+                self._in_flight_by_token[token] = count
+                by_token = stats["max_in_flight_by_token"]
+                by_token[token] = max(by_token.get(token, 0), count)
+
+    def end_request(self, token: str, status: int):
+        with self._lock:
+            stats = self.stats
+            stats["in_flight"] -= 1
+            stats["status"][str(status)] = stats["status"].get(str(status), 0) + 1
+            if token:
+                self._in_flight_by_token[token] -= 1
+
+    def count(self, key: str, value: int = 1):
+        with self._lock:
+            self.stats[key] += value
+
+    def get_stats(self) -> dict:
+        """获取统计（含各 token 剩余积分）"""
+        with self._lock:
+            stats = json.loads(json.dumps(self.stats))
+            stats["balances"] = dict(self._balances)
+            stats["pending_jobs"] = sum(1 for job in self._jobs.values() if job.done_at > time.monotonic())
+            return stats
+
+
+def read_multipart(rfile, length: int, boundary: bytes):
+    """
+    按块读取 multipart 请求体，只保留普通字段，文件内容只统计大小
+
+    Args:
+        rfile: 请求输入流
+        length: 请求体长度
+        boundary: 分隔符
+
+    Returns:
+        tuple: ({字段名: [值]}, 文件数, 文件总字节数)
+    """
+    delimiter = b"\r\n--" + boundary
+    fields = {}
+    file_count = 0
+    file_bytes = 0
+    # 在开头补 \r\n，第一个分隔符与后续分隔符格式相同
+    buf = b"\r\n"
+    state = "preamble"
+    name, is_file, value = None, False, []
+    remaining = length
+
+    while True:
+        if remaining > 0:
+            chunk = rfile.read(min(READ_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            buf += chunk
+        progressed = True
+        while progressed:
+            progressed = False
+            if state in ("preamble", "body"):
+                idx = buf.find(delimiter)
+                if idx < 0:
+                    # 末尾可能是不完整的分隔符，保留下来与下一块拼接
+                    keep = len(delimiter)
+                    if len(buf) > keep:
+                        if state == "body" and is_file:
+                            file_bytes += len(buf) - keep
+                        elif state == "body":
+                            value.append(buf[:-keep])
+                        buf = buf[-keep:]
+                    break
+                if state == "body":
+                    if is_file:
+                        file_count += 1
+                        file_bytes += idx
+                    else:
+                        value.append(buf[:idx])
+                        fields.setdefault(name, []).append(b"".join(value).decode("utf-8", "replace"))
+                buf = buf[idx + len(delimiter):]
+                state = "after"
+                progressed = True
+            elif state == "after":
+                if len(buf) < 2:
+                    break
+                if buf.startswith(b"--"):
+                    state = "done"
+                    break
+                buf = buf[2:]
+                state = "headers"
+                progressed = True
+            elif state == "headers":
+                idx = buf.find(b"\r\n\r\n")
+                if idx < 0:
+                    break
+                headers = buf[:idx].decode("utf-8", "replace")
+                buf = buf[idx + 4:]
+                disposition = next((line for line in headers.split("\r\n")
+                                    if line.lower().startswith("content-disposition")), "")
+                name = _get_header_param(disposition, "name")
+                is_file = _get_header_param(disposition, "filename") is not None
+                value = []
+                state = "body"
+                progressed = True
+        if remaining <= 0:
+            break
+    return fields, file_count, file_bytes
+
+
+def _get_header_param(header: str, param: str):
+    """从 Content-Disposition 中取参数值，如 name="images" """
+    for item in header.split(";")[1:]:
+        key, _, value = item.strip().partition("=")
+        if key.lower() == param:
+            return value.strip('"')
+    return None
+
+
+class MockJimengHandler(BaseHTTPRequestHandler):
+    """请求处理（每个连接一个线程，生成耗时直接在线程中等待）"""
+
+    protocol_version = "HTTP/1.1"
+    server_version = "MockJimeng/1.0"
+
+    @property
+    def state(self) -> MockJimengState:
+        return self.server.state
+
+    def log_message(self, format, *args):
+        # 压测时每个请求一行访问日志的开销太大，请求数见 /stats
+        pass
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path == "/stats":
+            self._send_json(200, self.state.get_stats())
+        elif path.startswith("/files/"):
+            body = PLACEHOLDER_MP4 if path.endswith(".mp4") else PLACEHOLDER_PNG
+            self._send(200, body, "video/mp4" if path.endswith(".mp4") else "image/png")
+        else:
+            self._send_json(404, {"code": 404, "message": "Not Found"})
+
+    def do_POST(self):
+        path = urlparse(self.path).path
+        token = self._get_token()
+        self.state.begin_request(path, token)
+        status = 500
+        try:
+            if token is None:
+                self._read_body()
+                status = self._send_json(401, {"code": 401, "message": "缺少 Authorization"})
+            elif path == "/token/receive":
+                self._read_body()
+                status = self._handle_token_receive(token)
+            elif path in ("/v1/images/generations", "/v1/images/compositions", "/v1/videos/generations"):
+                status = self._handle_generation(path, token)
+            elif path == "/v1/tasks/query":
+                status = self._handle_query(token)
+            elif path == "/v1/files/upload":
+                status = self._handle_upload()
+            elif path == "/stats/reset":
+                self._read_body()
+                self.state.reset_stats()
+                status = self._send_json(200, {"code": 0})
+            else:
+                self._read_body()
+                status = self._send_json(404, {"code": 404, "message": "Not Found"})
+        finally:
+            self.state.end_request(token, status)
+
+    def _handle_token_receive(self, token: str) -> int:
+        time.sleep(self.state.sample(self.state.config.submit_latency))
+        total = self.state.get_balance(token) or 0
+        return self._send_json(200, [{
+            "token": token[:20],
+            "credits": {"giftCredit": 0, "purchaseCredit": total, "vipCredit": 0, "totalCredit": total},
+        }])
+
+    def _handle_generation(self, path: str, token: str) -> int:
+        data, image_count = self._read_request()
+        self.state.count("reference_images", image_count)
+        config = self.state.config
+        is_video = path == "/v1/videos/generations"
+        async_job = str(data.get("async", "")).lower() == "true"
+
+        if not data.get("prompt"):
+            return self._send_json(400, {"code": 400, "message": "prompt 不能为空"})
+
+        if self.state.random() < config.error_rate:
+            time.sleep(self.state.sample(config.submit_latency))
+            return self._send_json(config.error_status, {"code": config.error_status, "message": "模拟服务错误"})
+
+        model = str(data.get("model") or "")
+        if is_video:
+            cost = get_video_points_cost(model, f"{data.get('duration', 5)}s")
+        else:
+            cost = IMAGE_MODEL_POINTS_MAP.get(model.lower(), 4)
+        if not self.state.charge(token, cost):
+            time.sleep(self.state.sample(config.submit_latency))
+            return self._send_json(200, {"code": -2001, "message": "积分不足"})
+
+        duration = self.state.sample(config.video_latency if is_video else config.image_latency)
+        failed = self.state.random() < config.fail_rate
+        result = self._build_result(is_video, failed)
+
+        if async_job:
+            job = MockJob(self.state.next_id("job-"), token, result, failed, duration)
+            if failed:
+                self.state.refund(token, cost)
+            self.state.add_job(job)
+            self.state.count("jobs_submitted")
+            self.state.count("failed" if failed else "generated")
+            time.sleep(self.state.sample(config.submit_latency))
+            return self._send_json(200, {"task_id": job.job_id, "status": "queued"})
+
+        time.sleep(duration)
+        if failed:
+            self.state.refund(token, cost)
+        self.state.count("failed" if failed else "generated")
+        return self._send_json(200, result)
+
+    def _build_result(self, is_video: bool, failed: bool) -> dict:
+        """生成与真实接口相同格式的结果"""
+        created = int(time.time())
+        if failed:
+            return {"created": created, "code": 1000, "message": "模拟生成失败", "data": []}
+        base = f"http://{self.headers.get('Host', 'localhost')}/files"
+        if is_video:
+            data = [{"url": f"{base}/{self.state.next_id('video-')}.mp4"}]
+        else:
+            data = [{"url": f"{base}/{self.state.next_id('image-')}.png"}
+                    for _ in range(self.state.config.images_per_task)]
+        return {"created": created, "data": data}
+
+    def _handle_query(self, token: str) -> int:
+        data = self._read_json()
+        job_ids = [str(job_id) for job_id in data.get("task_ids") or []]
+        time.sleep(self.state.sample(self.state.config.submit_latency))
+
+        now = time.monotonic()
+        items = []
+        for job in self.state.get_jobs(token, job_ids):
+            item = {"task_id": job.job_id}
+            if now < job.done_at:
+                item["status"] = "running"
+                item["eta"] = round(job.done_at - now, 2)
+            elif job.failed:
+                item["status"] = "failed"
+                item["message"] = job.result.get("message")
+                item["result"] = job.result
+            else:
+                item["status"] = "succeeded"
+                item["result"] = job.result
+            items.append(item)
+        return self._send_json(200, {"data": items})
+
+    def _handle_upload(self) -> int:
+        if not self.state.config.upload_enabled:
+            self._read_body()
+            return self._send_json(404, {"code": 404, "message": "Not Found"})
+
+        content_type = self.headers.get("Content-Type", "")
+        length = int(self.headers.get("Content-Length") or 0)
+        boundary = _get_header_param(content_type, "boundary")
+        if not content_type.startswith("multipart/form-data") or not boundary:
+            self._read_body()
+            return self._send_json(400, {"code": 400, "message": "需要 multipart/form-data"})
+
+        _, file_count, file_bytes = read_multipart(self.rfile, length, boundary.encode())
+        if not file_count:
+            return self._send_json(400, {"code": 400, "message": "缺少文件"})
+        self.state.count("uploaded_bytes", file_bytes)
+        time.sleep(self.state.sample(self.state.config.submit_latency))
+        name = hashlib.sha256(self.state.next_id("upload-").encode()).hexdigest()[:16]
+        base = f"http://{self.headers.get('Host', 'localhost')}/files"
+        return self._send_json(200, {"url": f"{base}/{name}.png", "expires_in": UPLOAD_EXPIRES_IN})
+
+    def _read_request(self):
+        """
+        读取生成请求（JSON 或 multipart）
+
+        Returns:
+            tuple: (参数字典, 参考图片数)
+        """
+        content_type = self.headers.get("Content-Type", "")
+        if content_type.startswith("multipart/form-data"):
+            length = int(self.headers.get("Content-Length") or 0)
+            boundary = _get_header_param(content_type, "boundary")
+            fields, file_count, file_bytes = read_multipart(self.rfile, length, (boundary or "").encode())
+            self.state.count("uploaded_bytes", file_bytes)
+            data = {key: values[-1] for key, values in fields.items()}
+            return data, file_count + len(fields.get("filePaths", []))
+        if content_type.startswith("application/json"):
+            data = self._read_json()
+            return data, len(data.get("images") or data.get("filePaths") or [])
+        # 表单（application/x-www-form-urlencoded）只用于没有图片的视频请求
+        fields = parse_qs(self._read_body().decode("utf-8", "replace"))
+        return {key: values[-1] for key, values in fields.items()}, len(fields.get("filePaths", []))
+
+    def _read_body(self) -> bytes:
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def _read_json(self) -> dict:
+        try:
+            data = json.loads(self._read_body() or b"{}")
+        except ValueError:
+            return {}
+        return data if isinstance(data, dict) else {}
+
+    def _get_token(self):
+        auth = self.headers.get("Authorization", "")
+        if auth.startswith("Bearer ") and auth[7:].strip():
+            return auth[7:].strip()
+        return None
+
+    def _send_json(self, status: int, data) -> int:
+        return self._send(status, json.dumps(data, ensure_ascii=False).encode("utf-8"), "application/json")
+
+    def _send(self, status: int, body: bytes, content_type: str) -> int:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        return status
+
+
+class MockJimengServer(ThreadingHTTPServer):
+    """模拟即梦API服务"""
+
+    daemon_threads = True
+    # 大量并发连接同时到达时不被拒绝
+    request_queue_size = 1024
+
+    def __init__(self, config: MockJimengConfig = None, host: str = "127.0.0.1", port: int = 0):
+        """
+        创建服务（调用 start() 后在后台线程中运行，或直接调用 serve_forever()）
+
+        Args:
+            config: 模拟参数，默认使用 MockJimengConfig()
+            host: 监听地址
+            port: 监听端口，0 表示随机端口
+        """
+        super().__init__((host, port), MockJimengHandler)
+        self.state = MockJimengState(config or MockJimengConfig())
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        """服务地址，可直接作为配置项 jimeng_api 或 JimengApiClient(base_url=...)"""
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> str:
+        """
+        在后台线程中运行
+
+        Returns:
+            str: 服务地址
+        """
+        self._thread = threading.Thread(target=self.serve_forever, name="mock-jimeng", daemon=True)
+        self._thread.start()
+        return self.base_url
+
+    def stop(self):
+        """停止服务"""
+        self.shutdown()
+        self.server_close()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+def parse_credits(items: list) -> dict:
+    """解析命令行的 token=积分 列表"""
+    credits = {}
+    for item in items or []:
+        token, sep, value = item.rpartition("=")
+        if not sep or not token:
+            raise argparse.ArgumentTypeError(f"积分格式应为 token=积分: {item}")
+        credits[token] = int(value)
+    return credits
+
+
+def main(argv=None):
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="VideoRobot 本地模拟即梦API服务")
+    parser.add_argument("--host", default="127.0.0.1", help="监听地址（默认 127.0.0.1）")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"监听端口（默认 {DEFAULT_PORT}）")
+    parser.add_argument("--image-latency", default="uniform:1,3", help="图片生成耗时分布（默认 uniform:1,3）")
+    parser.add_argument("--video-latency", default="uniform:5,10", help="视频生成耗时分布（默认 uniform:5,10）")
+    parser.add_argument("--submit-latency", default="0.05", help="提交、查询、上传接口耗时分布（默认 0.05）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="生成接口返回 HTTP 错误的概率")
+    parser.add_argument("--error-status", type=int, default=500, help="HTTP 错误状态码（默认 500）")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="生成失败的概率")
+    parser.add_argument("--credits", action="append", metavar="TOKEN=积分", help="token 的初始积分，可重复")
+    parser.add_argument("--default-credits", type=int, default=None,
+                        help="其他 token 的初始积分（默认不限积分）")
+    parser.add_argument("--images-per-task", type=int, default=DEFAULT_IMAGES_PER_TASK,
+                        help=f"每次图片生成返回的图片数（默认 {DEFAULT_IMAGES_PER_TASK}）")
+    parser.add_argument("--no-upload", action="store_true", help="不提供上传接口（返回404）")
+    parser.add_argument("--seed", type=int, default=0, help="随机数种子（默认 0）")
+    args = parser.parse_args(argv)
+
+    config = MockJimengConfig(
+        image_latency=args.image_latency,
+        video_latency=args.video_latency,
+        submit_latency=args.submit_latency,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        fail_rate=args.fail_rate,
+        credits=parse_credits(args.credits),
+        default_credits=args.default_credits,
+        images_per_task=args.images_per_task,
+        upload_enabled=not args.no_upload,
+        seed=args.seed,
+    )
+    server = MockJimengServer(config, host=args.host, port=args.port)
+    log.info(f"模拟即梦API服务已启动: {server.base_url}（统计: {server.base_url}/stats）")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        log.info("模拟即梦API服务已停止")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+"""
+监听器注册表
+任务通知器和任务更新总线共用的线程安全监听器列表：注册、移除，并在发布者的线程中依次回调
+"""
+import threading
+from typing import Callable, List
+from app.utils.logger import log
+
+
+class ListenerRegistry:
+    """监听器注册表（线程安全，不依赖 Qt）"""
+
+    # 回调失败时日志中的名称
+    NAME = "监听器"
+
+    def __init__(self):
+        self._listeners: List[Callable] = []
+        self._lock = threading.Lock()
+
+    def add_listener(self, callback: Callable):
+        """
+        注册监听器（重复注册只保留一个）
+
+        Args:
+            callback: 回调函数，参数由子类的发布方法决定
+        """
+        with self._lock:
+            if callback not in self._listeners:
+                self._listeners.append(callback)
+
+    def remove_listener(self, callback: Callable):
+        """移除监听器"""
+        with self._lock:
+            if callback in self._listeners:
+                self._listeners.remove(callback)
+
+    def _emit(self, *args):
+        """在当前线程中依次调用所有监听器，单个回调出错不影响其他回调"""
+        with self._lock:
+            listeners = list(self._listeners)
+
+        for callback in listeners:
+            try:
+                callback(*args)
+            except Exception as e:
+                log.error(f"{self.NAME}回调执行失败: {e}")
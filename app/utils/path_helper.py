@@ -42,4 +42,26 @@ def get_logs_dir():
     if not os.path.exists(logs_dir):
         os.makedirs(logs_dir, exist_ok=True)
 
-    return logs_dir
\ No newline at end of file
+    return logs_dir
+
+
+def get_thumbnail_cache_dir():
+    """获取缩略图缓存目录"""
+    app_dir = get_app_data_dir()
+    thumbnail_dir = os.path.join(app_dir, "thumbnails")
+
+    if not os.path.exists(thumbnail_dir):
+        os.makedirs(thumbnail_dir, exist_ok=True)
+
+    return thumbnail_dir
+
+
+def get_image_cache_dir():
+    """获取参考图片预处理缓存目录"""
+    app_dir = get_app_data_dir()
+    image_cache_dir = os.path.join(app_dir, "image_cache")
+
+    if not os.path.exists(image_cache_dir):
+        os.makedirs(image_cache_dir, exist_ok=True)
+
+    return image_cache_dir
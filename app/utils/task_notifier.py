@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+"""
+任务通知器
+模型层创建或重置任务后通过它唤醒任务调度器，调度器无需等待下一次轮询
+"""
+from typing import Optional
+from app.utils.listener_registry import ListenerRegistry
+
+
+class TaskNotifier(ListenerRegistry):
+    """任务通知器（线程安全），监听器参数为任务类型（None 表示所有类型）"""
+
+    NAME = "任务通知"
+
+    def notify(self, task_type: Optional[str] = None):
+        """
+        通知有新的待执行任务
+
+        Args:
+            task_type: 任务类型，如 jimeng_intl_image；None 表示所有类型
+        """
+        self._emit(task_type)
+
+
+# 全局单例
+_task_notifier = None
+
+
+def get_task_notifier() -> TaskNotifier:
+    """获取任务通知器单例"""
+    global _task_notifier
+    if _task_notifier is None:
+        _task_notifier = TaskNotifier()
+    return _task_notifier
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+"""
+任务更新总线
+执行器保存任务状态后、模型层批量修改任务状态（认领、释放、回收租约、重试）后发布变化的字段，
+界面订阅后只更新对应的行，任务管理器运行期间界面无需轮询数据库
+"""
+from app.utils.listener_registry import ListenerRegistry
+
+
+class TaskUpdateBus(ListenerRegistry):
+    """任务更新总线（线程安全，不依赖 Qt），监听器参数为 (任务类型, 任务ID, {字段名: 新值})"""
+
+    NAME = "任务更新"
+
+    def publish(self, task_type: str, task_id: int, changes: dict):
+        """
+        发布任务变化
+
+        Args:
+            task_type: 任务类型，如 jimeng_intl_image
+            task_id: 任务ID
+            changes: 变化的字段 {字段名: 新值}
+        """
+        self._emit(task_type, task_id, changes)
+
+    def publish_many(self, task_type: str, task_ids, changes: dict):
+        """
+        发布多个任务的相同变化（批量 UPDATE 后调用）
+
+        Args:
+            task_type: 任务类型
+            task_ids: 任务ID列表
+            changes: 变化的字段 {字段名: 新值}
+        """
+        for task_id in task_ids:
+            self._emit(task_type, task_id, dict(changes))
+
+
+# 全局单例
+_task_update_bus = None
+
+
+def get_task_update_bus() -> TaskUpdateBus:
+    """获取任务更新总线单例"""
+    global _task_update_bus
+    if _task_update_bus is None:
+        _task_update_bus = TaskUpdateBus()
+    return _task_update_bus
@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+"""
+缩略图服务
+
+图片在线程池中解码并缩放（QImage 可以在非界面线程使用），结果放入内存 LRU 缓存，
+同时保存到 get_app_data_dir() 下的缩略图目录；再次打开同一页时直接读取内存或磁盘上的小图，
+大尺寸参考图片不会阻塞界面线程。
+检查原图是否修改（os.stat）也在工作线程中执行：界面线程只查询 路径 -> 缓存键 的映射，
+列表重新加载（模型重置）时由 refreshKeys() 让映射在后台重新检查一次
+"""
+import os
+import hashlib
+from collections import OrderedDict
+from PyQt5.QtCore import Qt, QObject, QRunnable, QThreadPool, QSize, pyqtSignal
+from PyQt5.QtGui import QImage, QImageReader, QPixmap
+from app.utils.path_helper import get_thumbnail_cache_dir
+from app.utils.logger import log
+
+# 缩略图边长
+THUMBNAIL_SIZE = 80
+# 内存中最多缓存的缩略图数量（80x80 每张约 25KB）
+THUMBNAIL_MEMORY_CACHE_SIZE = 512
+# 解码图片的线程数
+THUMBNAIL_WORKER_THREADS = 2
+
+
+def get_thumbnail_key(path: str, size: int = THUMBNAIL_SIZE):
+    """
+    获取缩略图缓存键（路径 + 修改时间 + 文件大小），原图修改后缓存自动失效
+
+    Args:
+        path: 原图路径
+        size: 缩略图边长
+
+    Returns:
+        str: 缓存键，文件不存在时返回 None
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return f"{path}|{stat.st_mtime_ns}|{stat.st_size}|{size}"
+
+
+def load_thumbnail_image(path: str, cache_file: str, size: int = THUMBNAIL_SIZE) -> QImage:
+    """
+    读取磁盘缓存的缩略图，没有时解码原图并写入缓存（在工作线程中调用）
+
+    Args:
+        path: 原图路径
+        cache_file: 缩略图缓存文件路径
+        size: 缩略图边长
+
+    Returns:
+        QImage: 缩略图，解码失败时为空图片
+    """
+    if os.path.exists(cache_file):
+        image = QImage(cache_file)
+        if not image.isNull():
+            return image
+
+    reader = QImageReader(path)
+    reader.setAutoTransform(True)
+    original_size = reader.size()
+    if original_size.isValid():
+        # 让解码器直接按缩小后的尺寸解码（JPEG 可以跳过大部分像素），不必先解码出完整的大图
+        reader.setScaledSize(original_size.scaled(QSize(size, size), Qt.KeepAspectRatio))
+    image = reader.read()
+    if image.isNull():
+        return image
+    if image.width() > size or image.height() > size:
+        image = image.scaled(size, size, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+
+    # 先写临时文件再替换，其他线程不会读到写了一半的缓存
+    temp_file = f"{cache_file}.{os.getpid()}.{id(image)}.tmp"
+    try:
+        if image.save(temp_file, "PNG"):
+            os.replace(temp_file, cache_file)
+    except OSError as e:
+        log.debug(f"保存缩略图缓存失败: {e}")
+    finally:
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+    return image
+
+
+class _ThumbnailSignals(QObject):
+    """工作线程 -> 界面线程的信号（对象属于界面线程，信号自动排队）"""
+    loaded = pyqtSignal(str, str, QImage, bool)  # 原图路径, 缓存键（文件不存在时为空）, 缩略图, 内存中是否已有
+
+
+class _ThumbnailJob(QRunnable):
+    """检查原图并解码一张缩略图"""
+
+    def __init__(self, signals: _ThumbnailSignals, path: str, cache_dir: str, size: int, cached_keys):
+        super().__init__()
+        self.signals = signals
+        self.path = path
+        self.cache_dir = cache_dir
+        self.size = size
+        # 界面线程的内存缓存（只做成员判断），原图未修改且已缓存时不再解码
+        self.cached_keys = cached_keys
+
+    def run(self):
+        key = get_thumbnail_key(self.path, self.size) or ""
+        if not key or key in self.cached_keys:
+            self.signals.loaded.emit(self.path, key, QImage(), bool(key))
+            return
+
+        cache_file = os.path.join(self.cache_dir, hashlib.sha1(key.encode("utf-8")).hexdigest() + ".png")
+        try:
+            image = load_thumbnail_image(self.path, cache_file, self.size)
+        except Exception as e:
+            log.debug(f"生成缩略图失败: {self.path}, {e}")
+            image = QImage()
+        self.signals.loaded.emit(self.path, key, image, False)
+
+
+class ThumbnailService(QObject):
+    """缩略图服务（只在界面线程调用）"""
+
+    # 缩略图加载完成（原图路径），界面收到后重绘
+    thumbnailReady = pyqtSignal(str)
+
+    def __init__(self, size: int = THUMBNAIL_SIZE, max_items: int = THUMBNAIL_MEMORY_CACHE_SIZE,
+                 max_threads: int = THUMBNAIL_WORKER_THREADS, parent=None):
+        super().__init__(parent)
+        self.size = size
+        self.max_items = max_items
+        self.cache_dir = get_thumbnail_cache_dir()
+        # 缓存键 -> QPixmap（解码失败为 None），按最近使用排序
+        self._cache = OrderedDict()
+        # 原图路径 -> 缓存键（文件不存在为 None），由工作线程检查后更新
+        self._keys = {}
+        # refreshKeys() 之前的映射，重新检查完成前继续显示旧的缩略图
+        self._stale_keys = {}
+        # 正在检查或解码的原图路径
+        self._pending = set()
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(max_threads)
+        self._signals = _ThumbnailSignals(self)
+        self._signals.loaded.connect(self._onLoaded)
+
+    def get(self, path: str):
+        """
+        获取缩略图，未缓存时提交到线程池解码，完成后发出 thumbnailReady
+
+        Args:
+            path: 原图路径
+
+        Returns:
+            QPixmap: 缩略图；正在加载、文件不存在或无法解码时返回 None（用 isPending 区分）
+        """
+        if not path:
+            return None
+        key = self._keys.get(path, ...)
+        if key is ...:
+            # 还没有检查过原图（或已过期），在工作线程中检查，期间显示旧的缩略图
+            self._load(path)
+            key = self._stale_keys.get(path)
+        elif key is not None and key not in self._cache:
+            # 已被 LRU 淘汰
+            self._load(path)
+            return None
+
+        if key is None or key not in self._cache:
+            return None
+        self._cache.move_to_end(key)
+        return self._cache[key]
+
+    def isPending(self, path: str) -> bool:
+        """缩略图是否正在加载"""
+        return path in self._pending
+
+    def refreshKeys(self):
+        """列表重新加载时调用：之后请求的缩略图在后台重新检查原图是否修改"""
+        # 只保留内存中仍有缩略图的映射
+        merged = {**self._stale_keys, **self._keys}
+        self._stale_keys = {path: key for path, key in merged.items() if key in self._cache}
+        self._keys = {}
+
+    def _load(self, path: str):
+        """提交到线程池检查原图并解码"""
+        if path in self._pending:
+            return
+        self._pending.add(path)
+        self._pool.start(_ThumbnailJob(self._signals, path, self.cache_dir, self.size, self._cache))
+
+    def _onLoaded(self, path: str, key: str, image: QImage, cached: bool):
+        """工作线程完成（界面线程）：更新路径映射，把解码结果转换为 QPixmap 放入 LRU 缓存"""
+        self._pending.discard(path)
+        self._stale_keys.pop(path, None)
+        if not key:
+            self._keys[path] = None
+        elif cached and key not in self._cache:
+            # 检查之后刚被淘汰，下次绘制时重新解码
+            self._keys.pop(path, None)
+        else:
+            self._keys[path] = key
+            if not cached:
+                self._cache[key] = None if image.isNull() else QPixmap.fromImage(image)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_items:
+                self._cache.popitem(last=False)
+        self.thumbnailReady.emit(path)
+
+
+# 全局单例
+_thumbnail_service = None
+
+
+def get_thumbnail_service() -> ThumbnailService:
+    """获取缩略图服务单例（需要在创建 QApplication 之后调用）"""
+    global _thumbnail_service
+    if _thumbnail_service is None:
+        _thumbnail_service = ThumbnailService()
+    return _thumbnail_service
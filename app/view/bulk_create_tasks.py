@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+"""
+批量创建任务
+在后台线程中调用模型的 bulk_create_tasks，界面显示进度，导入上万行时窗口不会卡住
+"""
+from PyQt5.QtCore import Qt, QThread, pyqtSignal
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout
+from qfluentwidgets import Dialog, BodyLabel, ProgressBar
+from app.utils.logger import log
+
+
+class BulkCreateTasksThread(QThread):
+    """批量创建任务线程"""
+    progress = pyqtSignal(int, int)  # (已创建数, 总数)
+    succeeded = pyqtSignal(list)  # 创建的任务ID列表
+    failed = pyqtSignal(str)  # 错误信息
+
+    def __init__(self, create_func, tasks_data, parent=None):
+        """
+        Args:
+            create_func: 模型的 bulk_create_tasks 方法
+            tasks_data: 任务参数列表
+        """
+        super().__init__(parent)
+        self.create_func = create_func
+        self.tasks_data = tasks_data
+
+    def run(self):
+        try:
+            ids = self.create_func(self.tasks_data, progress=self.progress.emit)
+            self.succeeded.emit(ids)
+        except Exception as e:
+            log.error(f"批量创建任务失败: {e}")
+            self.failed.emit(str(e))
+
+
+def run_bulk_create(parent, create_func, tasks_data, on_finished):
+    """
+    显示进度对话框并在后台线程中批量创建任务
+
+    Args:
+        parent: 父窗口
+        create_func: 模型的 bulk_create_tasks 方法
+        tasks_data: 任务参数列表
+        on_finished: 完成回调(任务ID列表, 错误信息)，在主线程执行，成功时错误信息为 None
+    """
+    total = len(tasks_data)
+
+    loading_dlg = Dialog("", "", parent)
+    loading_dlg.setFixedWidth(400)
+    loading_dlg.setFixedHeight(150)
+    loading_dlg.yesButton.setVisible(False)
+    loading_dlg.cancelButton.setVisible(False)
+    loading_dlg.titleLabel.setVisible(False)
+
+    main_widget = QWidget(loading_dlg)
+    layout = QVBoxLayout(main_widget)
+    layout.setContentsMargins(24, 20, 24, 20)
+    layout.setSpacing(12)
+
+    title_label = BodyLabel("正在添加任务", main_widget)
+    title_label.setStyleSheet("font-size: 15px; font-weight: bold;")
+    layout.addWidget(title_label)
+
+    status_label = BodyLabel(f"已添加 0/{total} 个任务", main_widget)
+    status_label.setStyleSheet("font-size: 12px; color: rgba(255, 255, 255, 0.65);")
+    layout.addWidget(status_label)
+
+    progress_container = QWidget(main_widget)
+    progress_layout = QHBoxLayout(progress_container)
+    progress_layout.setContentsMargins(0, 0, 0, 0)
+    progress_layout.setSpacing(10)
+
+    progress_bar = ProgressBar(progress_container)
+    progress_bar.setRange(0, max(1, total))
+    progress_bar.setFixedHeight(5)
+    progress_layout.addWidget(progress_bar, 1)
+
+    progress_text = BodyLabel("0%", progress_container)
+    progress_text.setStyleSheet("font-size: 11px; color: rgba(255, 255, 255, 0.6); min-width: 30px;")
+    progress_text.setAlignment(Qt.AlignRight | Qt.AlignVCenter)
+    progress_layout.addWidget(progress_text)
+
+    layout.addWidget(progress_container)
+    loading_dlg.textLayout.addWidget(main_widget)
+
+    def on_progress(current, count):
+        status_label.setText(f"已添加 {current}/{count} 个任务")
+        progress_bar.setValue(current)
+        percentage = int((current / count * 100)) if count > 0 else 0
+        progress_text.setText(f"{percentage}%")
+
+    def on_succeeded(ids):
+        loading_dlg.close()
+        on_finished(ids, None)
+
+    def on_failed(error):
+        loading_dlg.close()
+        on_finished([], error)
+
+    # 线程信号排队到主线程，对话框显示后才会处理，不会在 exec 之前关闭对话框
+    thread = BulkCreateTasksThread(create_func, tasks_data, parent)
+    thread.progress.connect(on_progress)
+    thread.succeeded.connect(on_succeeded)
+    thread.failed.connect(on_failed)
+    thread.finished.connect(thread.deleteLater)
+    thread.start()
+
+    loading_dlg.exec()
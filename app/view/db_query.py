@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""
+界面数据库访问
+把查询提交到数据库查询线程（app/database/query_service.py），完成后在界面线程回调
+"""
+from PyQt5.QtCore import QObject, Qt, pyqtSignal
+from app.database.query_service import get_db_query_service
+
+
+class _QueryResultRelay(QObject):
+    """把查询线程的结果转到界面线程（对象属于界面线程，信号排队执行）"""
+    finished = pyqtSignal(object, object, object)  # 回调, 结果, 异常
+
+    def __init__(self):
+        super().__init__()
+        self.finished.connect(self._deliver, Qt.QueuedConnection)
+
+    @staticmethod
+    def _deliver(callback, result, error):
+        callback(result, error)
+
+
+class _RelayCallback:
+    """查询线程中执行的完成回调：转发到界面线程；包装同一个界面回调的对象相等，合并时只执行一次"""
+
+    __slots__ = ("relay", "callback")
+
+    def __init__(self, relay: _QueryResultRelay, callback):
+        self.relay = relay
+        self.callback = callback
+
+    def __call__(self, result, error):
+        self.relay.finished.emit(self.callback, result, error)
+
+    def __eq__(self, other):
+        return isinstance(other, _RelayCallback) and other.callback == self.callback
+
+    def __hash__(self):
+        return hash(self.callback)
+
+
+_relay = None
+
+
+def run_query(func, *args, on_finished=None, key=None, **kwargs):
+    """
+    在数据库查询线程中执行 func(*args, **kwargs)
+
+    Args:
+        func: 查询或修改函数，如 JimengIntlImageTask.get_tasks_after
+        on_finished: 完成回调(结果, 异常)，在界面线程执行，成功时异常为 None
+        key: 合并键，同 key 的请求还在排队时只执行最新的一次（如重复请求同一页），
+            合并的每个调用方的回调都会执行
+
+    Returns:
+        Future: 查询结果
+    """
+    global _relay
+    if _relay is None:
+        _relay = _QueryResultRelay()
+
+    callback = _RelayCallback(_relay, on_finished) if on_finished is not None else None
+    return get_db_query_service().submit(func, *args, key=key, callback=callback, **kwargs)
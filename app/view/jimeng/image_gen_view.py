@@ -8,6 +8,8 @@ from qfluentwidgets import (PrimaryPushButton, PushButton, TableWidget, ComboBox
                             Action, MessageBox, RoundMenu)
 from app.utils.logger import log
 from app.models.jimeng_image_task import JimengImageTask
+from app.view.bulk_create_tasks import run_bulk_create
+from app.view.db_query import run_query
 import os
 
 
@@ -147,15 +149,29 @@ class ImageGenView(QWidget):
         self.loadTasks()
 
     def loadTasks(self):
-        """加载任务数据"""
+        """加载任务数据（在数据库查询线程中查询，完成后回调 onTasksLoaded）"""
+        run_query(
+            self._queryPage, self.current_page, self.page_size,
+            key=(id(self), 'loadTasks'),
+            on_finished=self.onTasksLoaded
+        )
+
+    @staticmethod
+    def _queryPage(page, page_size):
+        """查询一页任务（查询线程）"""
+        tasks, total_count = JimengImageTask.get_tasks_by_page(page=page, page_size=page_size)
+        return page, page_size, tasks, total_count
+
+    def onTasksLoaded(self, result, error):
+        """任务查询完成（界面线程）"""
         try:
-            from app.models.jimeng_image_task import JimengImageTask
+            if error:
+                raise error
 
-            # 从数据库分页获取任务
-            tasks, total_count = JimengImageTask.get_tasks_by_page(
-                page=self.current_page,
-                page_size=self.page_size
-            )
+            page, page_size, tasks, total_count = result
+            if page != self.current_page or page_size != self.page_size:
+                # 翻页期间的旧结果，等最新的查询
+                return
 
             # 清空表格 - 彻底清除所有widget和内容
             old_row_count = self.taskTable.rowCount()
@@ -327,17 +343,20 @@ class ImageGenView(QWidget):
 
     def onLastPage(self):
         """末页"""
-        try:
-            from app.models.jimeng_image_task import JimengImageTask
-            _, total_count = JimengImageTask.get_tasks_by_page(
-                page=1,
-                page_size=self.page_size
-            )
-            total_pages = (total_count + self.page_size - 1) // self.page_size if total_count > 0 else 1
+        page_size = self.page_size
+
+        def on_finished(result, error):
+            if error:
+                log.error(f"跳转到末页失败: {error}")
+                return
+            if page_size != self.page_size:
+                return
+            _, total_count = result
+            total_pages = (total_count + page_size - 1) // page_size if total_count > 0 else 1
             self.current_page = total_pages
             self.loadTasks()
-        except Exception as e:
-            log.error(f"跳转到末页失败: {e}")
+
+        run_query(JimengImageTask.get_tasks_by_page, page=1, page_size=page_size, on_finished=on_finished)
 
     def onAddTask(self):
         """添加任务"""
@@ -391,57 +410,40 @@ class ImageGenView(QWidget):
         dialog.exec()
 
     def onBatchTasksAdded(self, tasks_data_list):
-        """批量任务添加完成"""
-        try:
-            from app.models.jimeng_image_task import JimengImageTask
-
-            success_count = 0
-            fail_count = 0
-
-            for task_data in tasks_data_list:
-                try:
-                    task = JimengImageTask.create_task(
-                        prompt=task_data['prompt'],
-                        input_image_paths=task_data.get('input_image_paths', []),
-                        image_model=task_data.get('image_model', '图片 4.0'),
-                        aspect_ratio=task_data['aspect_ratio'],
-                        resolution=task_data['resolution']
-                    )
-                    success_count += 1
-                except Exception as e:
-                    log.error(f"创建任务失败: {e}")
-                    fail_count += 1
-
-            log.info(f"批量添加完成: 成功 {success_count} 个, 失败 {fail_count} 个")
-
-            if success_count > 0:
-                InfoBar.success(
-                    title="批量添加成功",
-                    content=f"成功添加 {success_count} 个任务" + (f"，{fail_count} 个失败" if fail_count > 0 else ""),
-                    parent=self,
-                    duration=3000,
-                    position=InfoBarPosition.TOP
-                )
-
-                # 刷新列表
-                self.loadTasks()
-            else:
+        """批量任务添加完成（在后台线程中批量插入）"""
+        rows = [{
+            'prompt': task_data['prompt'],
+            'input_image_paths': task_data.get('input_image_paths', []),
+            'image_model': task_data.get('image_model', '图片 4.0'),
+            'aspect_ratio': task_data['aspect_ratio'],
+            'resolution': task_data['resolution'],
+        } for task_data in tasks_data_list]
+
+        def on_finished(ids, error):
+            if error:
+                log.error(f"批量添加任务失败: {error}")
                 InfoBar.error(
                     title="批量添加失败",
-                    content="所有任务添加失败",
+                    content=error,
                     parent=self,
                     position=InfoBarPosition.TOP
                 )
+                return
 
-        except Exception as e:
-            log.error(f"批量添加任务失败: {e}")
-            InfoBar.error(
-                title="批量添加失败",
-                content=str(e),
+            log.info(f"批量添加完成: 成功 {len(ids)} 个")
+            InfoBar.success(
+                title="批量添加成功",
+                content=f"成功添加 {len(ids)} 个任务",
                 parent=self,
+                duration=3000,
                 position=InfoBarPosition.TOP
             )
 
+            # 刷新列表
+            self.loadTasks()
+
+        run_bulk_create(self, JimengImageTask.bulk_create_tasks, rows, on_finished)
+
     def onRefresh(self):
         """刷新"""
         log.info("刷新任务列表")
@@ -701,29 +703,38 @@ class ImageGenView(QWidget):
             if msg_box.exec():
                 log.info(f"删除任务 ID={task_id}")
 
-                # 删除任务
-                success = JimengImageTask.delete_task(task_id)
-
-                if success:
-                    log.info(f"任务 ID={task_id} 已删除")
-
-                    InfoBar.success(
-                        title="删除成功",
-                        content=f"任务 #{task_id} 已删除",
-                        parent=self,
-                        duration=2000,
-                        position=InfoBarPosition.TOP
-                    )
-
-                    # 刷新列表
-                    self.loadTasks()
-                else:
-                    InfoBar.error(
-                        title="删除失败",
-                        content="任务不存在",
-                        parent=self,
-                        position=InfoBarPosition.TOP
-                    )
+                # 删除任务（查询线程）
+                def on_finished(success, error):
+                    if error:
+                        log.error(f"删除任务失败: {error}")
+                        InfoBar.error(
+                            title="删除失败",
+                            content=str(error),
+                            parent=self,
+                            position=InfoBarPosition.TOP
+                        )
+                    elif success:
+                        log.info(f"任务 ID={task_id} 已删除")
+
+                        InfoBar.success(
+                            title="删除成功",
+                            content=f"任务 #{task_id} 已删除",
+                            parent=self,
+                            duration=2000,
+                            position=InfoBarPosition.TOP
+                        )
+
+                        # 刷新列表
+                        self.loadTasks()
+                    else:
+                        InfoBar.error(
+                            title="删除失败",
+                            content="任务不存在",
+                            parent=self,
+                            position=InfoBarPosition.TOP
+                        )
+
+                run_query(JimengImageTask.delete_task, task_id, on_finished=on_finished)
 
         except Exception as e:
             log.error(f"删除任务失败: {e}")
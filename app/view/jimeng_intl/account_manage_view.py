@@ -7,6 +7,7 @@ from qfluentwidgets import (PrimaryPushButton, PushButton, TableWidget, ComboBox
                             BodyLabel, CheckBox, Action, RoundMenu, MessageBox, LineEdit)
 from app.models.jimeng_intl_account import JimengIntlAccount
 from app.utils.logger import log
+from app.view.db_query import run_query
 from datetime import datetime
 
 
@@ -87,6 +88,9 @@ class AccountManageIntlView(QWidget):
         self.setObjectName("accountManageIntl")
         self.current_page = 1
         self.page_size = 20
+        # 键集分页游标：第 n 页对应 page_cursors[n - 1]（上一页最后一行的 (created_at, id)），第一页为 None
+        self.page_cursors = [None]
+        self.next_page_cursor = None
         self._initUI()
 
     def _initUI(self):
@@ -187,9 +191,29 @@ class AccountManageIntlView(QWidget):
         self.loadAccounts()
 
     def loadAccounts(self):
-        """加载账号列表"""
+        """在数据库线程中查询当前页账号，完成后更新表格"""
+        # 结果返回前禁用翻页，避免用上一页的游标翻页
+        self.prevPageBtn.setEnabled(False)
+        self.nextPageBtn.setEnabled(False)
+        run_query(self._queryPage, self.page_cursors[self.current_page - 1], self.page_size,
+                  key=(id(self), 'loadAccounts'), on_finished=self.onAccountsLoaded)
+
+    @staticmethod
+    def _queryPage(cursor, page_size):
+        """查询一页账号（数据库线程）"""
+        accounts, total_count = JimengIntlAccount.get_accounts_after(cursor, page_size)
+        return cursor, page_size, accounts, total_count
+
+    def onAccountsLoaded(self, result, error):
+        """账号列表查询完成"""
         try:
-            accounts, total_count = JimengIntlAccount.get_accounts_by_page(self.current_page, self.page_size)
+            if error:
+                raise error
+            cursor, page_size, accounts, total_count = result
+            if (cursor, page_size) != (self.page_cursors[self.current_page - 1], self.page_size):
+                # 查询期间已经翻到其他页，等待最新一页的结果
+                return
+            self.next_page_cursor = (accounts[-1].created_at, accounts[-1].id) if accounts else None
 
             self.table.clearContents()
             self.table.setRowCount(len(accounts))
@@ -278,6 +302,7 @@ class AccountManageIntlView(QWidget):
         except Exception as e:
             log.error(f"加载账号列表失败: {e}")
             self.table.setRowCount(0)
+            self.prevPageBtn.setEnabled(self.current_page > 1)
             InfoBar.error(title="加载失败", content=str(e), parent=self, position=InfoBarPosition.TOP)
 
     def _create_loading_dialog(self, total_items: int, title: str = "正在处理") -> tuple:
@@ -447,12 +472,17 @@ class AccountManageIntlView(QWidget):
             return
 
         msg_box = MessageBox("确认删除", f"确定要删除选中的 {len(selected_ids)} 个账号吗？", self)
-        if msg_box.exec():
-            success_count = 0
-            for account_id in selected_ids:
-                if JimengIntlAccount.delete_account(account_id):
-                    success_count += 1
+        if not msg_box.exec():
+            return
 
+        def delete_accounts(account_ids):
+            return sum(1 for account_id in account_ids if JimengIntlAccount.delete_account(account_id))
+
+        def on_finished(success_count, error):
+            if error:
+                log.error(f"批量删除账号失败: {error}")
+                InfoBar.error(title="删除失败", content=str(error), parent=self, position=InfoBarPosition.TOP)
+                return
             self.loadAccounts()
             InfoBar.success(
                 title="删除成功",
@@ -462,6 +492,8 @@ class AccountManageIntlView(QWidget):
                 position=InfoBarPosition.TOP
             )
 
+        run_query(delete_accounts, selected_ids, on_finished=on_finished)
+
     def onBatchCheckPoints(self):
         """批量查询积分"""
         selected_ids = self._getSelectedAccountIds()
@@ -703,17 +735,23 @@ class AccountManageIntlView(QWidget):
     def onDeleteAccount(self, account_id: int):
         """删除单个账号"""
         msg_box = MessageBox("确认删除", f"确定要删除账号 #{account_id} 吗？", self)
-        if msg_box.exec():
-            if JimengIntlAccount.delete_account(account_id):
+        if not msg_box.exec():
+            return
+
+        def on_finished(ok, error):
+            if ok:
                 InfoBar.success(title="删除成功", content=f"账号 #{account_id} 已删除", parent=self, duration=2000, position=InfoBarPosition.TOP)
                 self.loadAccounts()
             else:
-                InfoBar.error(title="删除失败", content="账号不存在", parent=self, position=InfoBarPosition.TOP)
+                InfoBar.error(title="删除失败", content=str(error) if error else "账号不存在", parent=self, position=InfoBarPosition.TOP)
+
+        run_query(JimengIntlAccount.delete_account, account_id, on_finished=on_finished)
 
     def onPageSizeChanged(self, size):
         """每页显示数量改变"""
         self.page_size = int(size)
         self.current_page = 1
+        self.page_cursors = [None]
         self.loadAccounts()
 
     def onPrevPage(self):
@@ -724,5 +762,9 @@ class AccountManageIntlView(QWidget):
 
     def onNextPage(self):
         """下一页"""
+        if self.next_page_cursor is None:
+            return
+        # 下一页从当前页最后一行之后开始，丢弃之前从更深页返回时保留的游标
+        self.page_cursors = self.page_cursors[:self.current_page] + [self.next_page_cursor]
         self.current_page += 1
         self.loadAccounts()
@@ -0,0 +1,352 @@
+# -*- coding: utf-8 -*-
+"""
+国际版任务列表的表格模型和委托
+
+表格不再为每一行创建复选框、缩略图和按钮控件：数据保存在 TaskTableModel 中，
+复选框、缩略图和操作按钮由委托直接绘制，只有可见的行才会绘制（缩略图在后台解码），每页几千行也不会卡住界面
+"""
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex, QRect, QEvent, pyqtSignal
+from PyQt5.QtGui import QColor
+from PyQt5.QtWidgets import QStyle, QStyleOptionButton, QApplication
+from qfluentwidgets import TableItemDelegate
+from app.utils.thumbnail_service import get_thumbnail_service
+
+# 自定义数据角色
+TaskIdRole = Qt.UserRole  # 任务ID
+ThumbnailRole = Qt.UserRole + 1  # 缩略图本地路径
+ActionsEnabledRole = Qt.UserRole + 2  # 可用的操作集合
+CheckedRole = Qt.UserRole + 3  # 是否勾选
+
+STATUS_TEXT_MAP = {0: "排队中", 1: "生成中", 2: "已完成", 3: "失败"}
+STATUS_COLOR_MAP = {2: QColor("#34C759"), 3: QColor("#FF3B30")}
+
+
+class TaskTableModel(QAbstractTableModel):
+    """
+    任务列表模型（一页任务）
+
+    子类通过 COLUMNS 定义列（列类型, 表头），并按需重写 getEnabledActions
+    """
+    COLUMNS = []
+    # 提示词列最多显示的字符数
+    PROMPT_LENGTH = 50
+    # 会在执行中变化的字段（与执行器发布到任务更新总线的字段一致），推送和增量刷新时按这些字段更新行
+    STATE_FIELDS = ('status', 'code', 'message', 'account_id')
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.tasks = []
+        self.checked_ids = set()
+        self._rows = {}
+        self._column_index = {key: column for column, (key, _) in enumerate(self.COLUMNS)}
+
+    def setTasks(self, tasks: list):
+        """
+        替换当前页的任务，已勾选的任务如果仍在本页则保持勾选
+
+        Args:
+            tasks: 任务列表
+        """
+        self.beginResetModel()
+        self.tasks = list(tasks)
+        self._rows = {task.id: row for row, task in enumerate(self.tasks)}
+        self.checked_ids &= set(self._rows)
+        # 重新加载后在后台重新检查参考图片是否修改
+        get_thumbnail_service().refreshKeys()
+        self.endResetModel()
+
+    def taskAt(self, row: int):
+        """获取指定行的任务，行号无效时返回 None"""
+        if 0 <= row < len(self.tasks):
+            return self.tasks[row]
+        return None
+
+    def rowOfTask(self, task_id: int):
+        """获取任务所在的行号，不在当前页时返回 None"""
+        return self._rows.get(task_id)
+
+    def columnOf(self, key: str) -> int:
+        """获取列类型对应的列号"""
+        return self._column_index[key]
+
+    def taskState(self, task) -> dict:
+        """
+        获取任务中 STATE_FIELDS 的当前值（外键取账号ID，不查询账号表）
+
+        Args:
+            task: 任务对象
+
+        Returns:
+            dict: {字段名: 值}
+        """
+        return {name: task.__data__.get(name) for name in self.STATE_FIELDS}
+
+    def updateTask(self, task_id: int, changes: dict):
+        """
+        更新任务的字段并重绘所在的行
+
+        Args:
+            task_id: 任务ID
+            changes: {字段名: 新值}
+        """
+        row = self._rows.get(task_id)
+        if row is None:
+            return
+        task = self.tasks[row]
+        for name, value in changes.items():
+            setattr(task, name, value)
+        self.dataChanged.emit(self.index(row, 0), self.index(row, len(self.COLUMNS) - 1))
+
+    def checkedTaskIds(self) -> list:
+        """获取已勾选的任务ID（按行顺序）"""
+        return [task.id for task in self.tasks if task.id in self.checked_ids]
+
+    def setAllChecked(self, checked: bool):
+        """勾选或取消勾选当前页的所有任务"""
+        self.checked_ids = set(self._rows) if checked else set()
+        if self.tasks:
+            column = self.columnOf('check')
+            self.dataChanged.emit(self.index(0, column), self.index(len(self.tasks) - 1, column))
+
+    def toggleChecked(self, index: QModelIndex):
+        """切换指定行的勾选状态"""
+        task = self.taskAt(index.row())
+        if task is None:
+            return
+        if task.id in self.checked_ids:
+            self.checked_ids.discard(task.id)
+        else:
+            self.checked_ids.add(task.id)
+        self.dataChanged.emit(index, index)
+
+    def getEnabledActions(self, task) -> set:
+        """
+        获取任务可用的操作
+
+        Args:
+            task: 任务对象
+
+        Returns:
+            set: 操作名集合，如 {'download'}；默认没有可用操作
+        """
+        return set()
+
+    def getParamsText(self, task) -> tuple:
+        """参数列的 (显示文本, 提示)，有参数列的子类实现"""
+        return "", ""
+
+    @staticmethod
+    def getThumbnailPath(task) -> str:
+        """第一张参考图片的本地路径，没有时返回空字符串"""
+        inputs = task.get_input_images()
+        path = (inputs[0] if inputs else "") or ""
+        path = path.strip()
+        if path.lower().startswith("file:///"):
+            path = path[8:].replace('/', '\\')
+        return path
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.tasks)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole and 0 <= section < len(self.COLUMNS):
+            return self.COLUMNS[section][1]
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        task = self.taskAt(index.row()) if index.isValid() else None
+        if task is None:
+            return None
+        key = self.COLUMNS[index.column()][0]
+
+        if role == TaskIdRole:
+            return task.id
+        if role == Qt.TextAlignmentRole:
+            return Qt.AlignCenter
+        if key == 'check' and role == CheckedRole:
+            return task.id in self.checked_ids
+        if key == 'id' and role == Qt.DisplayRole:
+            return str(task.id)
+        if key == 'thumbnail' and role == ThumbnailRole:
+            return self.getThumbnailPath(task)
+        if key == 'prompt':
+            prompt = task.prompt or ""
+            if role == Qt.DisplayRole:
+                return prompt[:self.PROMPT_LENGTH] + ("..." if len(prompt) > self.PROMPT_LENGTH else "")
+            if role == Qt.ToolTipRole:
+                return prompt
+        if key == 'params' and role in (Qt.DisplayRole, Qt.ToolTipRole):
+            text, tooltip = self.getParamsText(task)
+            return text if role == Qt.DisplayRole else tooltip
+        if key == 'status':
+            if role == Qt.DisplayRole:
+                return STATUS_TEXT_MAP.get(task.status, "-")
+            if role == Qt.ForegroundRole:
+                return STATUS_COLOR_MAP.get(task.status)
+            if role == Qt.ToolTipRole and task.status == 3 and task.message:
+                return f"失败原因: {task.message}"
+        if key == 'actions' and role == ActionsEnabledRole:
+            return self.getEnabledActions(task)
+        return None
+
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.NoItemFlags
+        return Qt.ItemIsEnabled | Qt.ItemIsSelectable
+
+
+class ImageTaskTableModel(TaskTableModel):
+    """国际版图片任务列表模型"""
+    COLUMNS = [('check', ""), ('id', "ID"), ('thumbnail', "参考图片"), ('prompt', "提示词"),
+               ('status', "状态"), ('actions', "操作")]
+    PROMPT_LENGTH = 50
+    STATE_FIELDS = TaskTableModel.STATE_FIELDS + ('output_images',)
+
+    def getEnabledActions(self, task) -> set:
+        # 只有成功的任务才能下载，成功的任务不能重试和查看原因
+        return {'download'} if task.status == 2 else {'retry', 'reason'}
+
+
+class VideoTaskTableModel(TaskTableModel):
+    """国际版视频任务列表模型"""
+    COLUMNS = [('check', ""), ('id', "ID"), ('thumbnail', "首帧图"), ('prompt', "提示词"),
+               ('params', "参数"), ('status', "状态"), ('actions', "操作")]
+    PROMPT_LENGTH = 40
+    STATE_FIELDS = TaskTableModel.STATE_FIELDS + ('output_videos',)
+
+    def getEnabledActions(self, task) -> set:
+        # 只有成功状态(2)才能下载，只有失败状态(3)才能重试和查看原因
+        if task.status == 2:
+            return {'download'}
+        if task.status == 3:
+            return {'retry', 'reason'}
+        return set()
+
+    def getParamsText(self, task) -> tuple:
+        return (f"{task.ratio} | {task.duration} | {task.quality}",
+                f"比例: {task.ratio}\n时长: {task.duration}\n质量: {task.quality}")
+
+
+class CheckBoxDelegate(TableItemDelegate):
+    """勾选列委托：在单元格中央绘制复选框，点击切换勾选状态"""
+
+    INDICATOR_SIZE = 18
+
+    def _indicatorRect(self, rect: QRect) -> QRect:
+        size = self.INDICATOR_SIZE
+        return QRect(rect.center().x() - size // 2, rect.center().y() - size // 2, size, size)
+
+    def paint(self, painter, option, index):
+        super().paint(painter, option, index)
+        button = QStyleOptionButton()
+        button.rect = self._indicatorRect(option.rect)
+        button.state = QStyle.State_Enabled | (QStyle.State_On if index.data(CheckedRole) else QStyle.State_Off)
+        style = option.widget.style() if option.widget else QApplication.style()
+        style.drawPrimitive(QStyle.PE_IndicatorCheckBox, button, painter, option.widget)
+
+    def editorEvent(self, event, model, option, index):
+        if event.type() == QEvent.MouseButtonRelease and event.button() == Qt.LeftButton:
+            if option.rect.contains(event.pos()):
+                model.toggleChecked(index)
+                return True
+        return super().editorEvent(event, model, option, index)
+
+
+class ThumbnailDelegate(TableItemDelegate):
+    """缩略图列委托：只有可见的行会请求缩略图，由缩略图服务在后台解码，加载完成后重绘表格"""
+
+    def __init__(self, parent):
+        super().__init__(parent)
+        self.thumbnail_service = get_thumbnail_service()
+        self.thumbnail_service.thumbnailReady.connect(lambda path: parent.viewport().update())
+
+    def paint(self, painter, option, index):
+        super().paint(painter, option, index)
+        path = index.data(ThumbnailRole)
+        pixmap = self.thumbnail_service.get(path)
+        if pixmap is None and self.thumbnail_service.isPending(path):
+            return
+        painter.save()
+        if pixmap is None:
+            painter.setPen(option.palette.color(option.palette.Text))
+            painter.drawText(option.rect, Qt.AlignCenter, "无图片")
+        else:
+            x = option.rect.x() + (option.rect.width() - pixmap.width()) // 2
+            y = option.rect.y() + (option.rect.height() - pixmap.height()) // 2
+            painter.drawPixmap(x, y, pixmap)
+        painter.restore()
+
+
+class ActionButtonsDelegate(TableItemDelegate):
+    """操作列委托：绘制一排按钮，点击可用的按钮时发出 actionTriggered(操作名, 任务ID)"""
+
+    actionTriggered = pyqtSignal(str, int)
+
+    BUTTON_WIDTH = 60
+    BUTTON_HEIGHT = 32
+    SPACING = 5
+
+    def __init__(self, parent, actions: list):
+        """
+        Args:
+            parent: 表格
+            actions: [(操作名, 按钮文字)]，如 [('download', "下载")]
+        """
+        super().__init__(parent)
+        self.actions = actions
+        # 正在按下的按钮 (行, 操作名)
+        self._pressed = None
+
+    def _buttonRects(self, rect: QRect) -> list:
+        count = len(self.actions)
+        total_width = count * self.BUTTON_WIDTH + (count - 1) * self.SPACING
+        x = rect.x() + (rect.width() - total_width) // 2
+        y = rect.y() + (rect.height() - self.BUTTON_HEIGHT) // 2
+        return [
+            QRect(x + i * (self.BUTTON_WIDTH + self.SPACING), y, self.BUTTON_WIDTH, self.BUTTON_HEIGHT)
+            for i in range(count)
+        ]
+
+    def _actionAt(self, option, pos):
+        for (action, _), rect in zip(self.actions, self._buttonRects(option.rect)):
+            if rect.contains(pos):
+                return action
+        return None
+
+    def paint(self, painter, option, index):
+        super().paint(painter, option, index)
+        enabled_actions = index.data(ActionsEnabledRole) or set()
+        style = option.widget.style() if option.widget else QApplication.style()
+        for (action, text), rect in zip(self.actions, self._buttonRects(option.rect)):
+            button = QStyleOptionButton()
+            button.rect = rect
+            button.text = text
+            button.state = QStyle.State_Raised
+            if action in enabled_actions:
+                button.state |= QStyle.State_Enabled
+                if self._pressed == (index.row(), action):
+                    button.state |= QStyle.State_Sunken
+            style.drawControl(QStyle.CE_PushButton, button, painter, option.widget)
+
+    def editorEvent(self, event, model, option, index):
+        if event.type() not in (QEvent.MouseButtonPress, QEvent.MouseButtonRelease) \
+                or event.button() != Qt.LeftButton:
+            return super().editorEvent(event, model, option, index)
+
+        action = self._actionAt(option, event.pos())
+        enabled = action is not None and action in (index.data(ActionsEnabledRole) or set())
+        # 按下和松开时重绘按钮的按下状态
+        if option.widget:
+            option.widget.viewport().update(option.rect)
+        if event.type() == QEvent.MouseButtonPress:
+            self._pressed = (index.row(), action) if enabled else None
+            return enabled
+
+        pressed, self._pressed = self._pressed, None
+        if enabled and pressed == (index.row(), action):
+            self.actionTriggered.emit(action, index.data(TaskIdRole))
+            return True
+        return pressed is not None
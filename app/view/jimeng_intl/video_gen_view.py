@@ -6,15 +6,23 @@ from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QTableWidgetItem
                              QTableWidget, QAbstractItemView, QStackedWidget,
                              QScrollArea, QGridLayout)
 from datetime import datetime
-from qfluentwidgets import (PrimaryPushButton, PushButton, TableWidget, ComboBox,
+from qfluentwidgets import (PrimaryPushButton, PushButton, TableView, ComboBox,
                            FluentIcon as FIF, InfoBar, InfoBarPosition, Dialog,
                            TextEdit, BodyLabel, CheckBox, Action, RoundMenu,
                            MessageBox, LineEdit, Pivot, ProgressBar)
 from app.models.jimeng_intl_video_task import JimengIntlVideoTask
 from app.view.jimeng.add_image_task_dialog import MultiImageDropWidget
 from app.utils.logger import log
+from app.utils.task_notifier import get_task_notifier
+from app.managers.global_task_manager import get_global_task_manager
+from app.view.bulk_create_tasks import run_bulk_create
+from app.view.db_query import run_query
+from app.view.jimeng_intl.task_table import VideoTaskTableModel, CheckBoxDelegate, ThumbnailDelegate, ActionButtonsDelegate
 import os
 
+# 增量刷新每次最多查询的变化任务数，超过时重新加载当前页
+CHANGE_FEED_LIMIT = 500
+
 
 class AddVideoTaskIntlDialog(Dialog):
     """添加视频任务对话框"""
@@ -128,6 +136,11 @@ class VideoGenIntlView(QWidget):
         self.setObjectName("videoGenIntl")
         self.current_page = 1
         self.page_size = 20
+        # 键集分页游标：第 n 页对应 page_cursors[n - 1]（上一页最后一行的 (create_at, id)），第一页为 None
+        self.page_cursors = [None]
+        self.next_page_cursor = None
+        # 增量刷新：已看到的最大变更序号
+        self.change_seq = 0
 
         # 用于智能刷新的数据缓存：{task_id: task_state}
         # task_state 包含会影响UI的字段：status, code, message
@@ -136,7 +149,14 @@ class VideoGenIntlView(QWidget):
         # 添加自动刷新计时器
         self.auto_refresh_timer = QTimer()
         self.auto_refresh_timer.timeout.connect(self.onAutoRefresh)
-        self.auto_refresh_timer.start(5000)  # 5秒刷新一次
+
+        # 任务管理器运行期间由执行器推送任务变化（tasks_updated 信号），不再轮询数据库
+        self.task_manager = get_global_task_manager()
+        self.task_manager.tasks_updated.connect(self.onTasksUpdated)
+        self.task_manager.started.connect(self.auto_refresh_timer.stop)
+        self.task_manager.finished.connect(self.onTaskManagerFinished)
+        if not self.task_manager.isRunning():
+            self.auto_refresh_timer.start(5000)  # 5秒刷新一次
 
         self._initUI()
 
@@ -171,12 +191,19 @@ class VideoGenIntlView(QWidget):
         layout.addLayout(top)
 
         # 任务表格
-        self.table = TableWidget(self)
+        self.table = TableView(self)
         self.table.setBorderVisible(True)
         self.table.setBorderRadius(8)
         self.table.setWordWrap(False)
-        self.table.setColumnCount(7)
-        self.table.setHorizontalHeaderLabels(["", "ID", "首帧图", "提示词", "参数", "状态", "操作"])
+        # 复选框、缩略图和操作按钮由委托绘制，不为每一行创建控件，只有可见的行会绘制
+        self.task_model = VideoTaskTableModel(self)
+        self.table.setModel(self.task_model)
+        self.table.setItemDelegateForColumn(self.task_model.columnOf('check'), CheckBoxDelegate(self.table))
+        self.table.setItemDelegateForColumn(self.task_model.columnOf('thumbnail'), ThumbnailDelegate(self.table))
+        self.action_delegate = ActionButtonsDelegate(
+            self.table, [('download', "下载"), ('retry', "重试"), ('reason', "原因")])
+        self.action_delegate.actionTriggered.connect(self.onTaskAction)
+        self.table.setItemDelegateForColumn(self.task_model.columnOf('actions'), self.action_delegate)
         header = self.table.horizontalHeader()
         header.setSectionResizeMode(0, QHeaderView.Fixed)
         header.setSectionResizeMode(1, QHeaderView.Fixed)
@@ -187,8 +214,10 @@ class VideoGenIntlView(QWidget):
         header.setSectionResizeMode(6, QHeaderView.Fixed)
         self.table.verticalHeader().setVisible(False)
         self.table.verticalHeader().setDefaultSectionSize(100)
-        self.table.setSelectionBehavior(TableWidget.SelectRows)
-        self.table.setSelectionMode(TableWidget.ExtendedSelection)
+        # 行高固定，表格不需要逐行计算高度
+        self.table.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.setSelectionMode(QAbstractItemView.ExtendedSelection)
         self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
         self.table.setContextMenuPolicy(Qt.CustomContextMenu)
         self.table.customContextMenuRequested.connect(self.showContextMenu)
@@ -199,7 +228,7 @@ class VideoGenIntlView(QWidget):
         sizeLabel = BodyLabel("每页显示:", self)
         bottom.addWidget(sizeLabel)
         self.pageSizeCombo = ComboBox(self)
-        self.pageSizeCombo.addItems(['10', '20', '50', '100'])
+        self.pageSizeCombo.addItems(['10', '20', '50', '100', '500', '1000'])
         self.pageSizeCombo.setCurrentText('20')
         self.pageSizeCombo.currentTextChanged.connect(self.onPageSizeChanged)
         self.pageSizeCombo.setFixedWidth(100)
@@ -227,145 +256,45 @@ class VideoGenIntlView(QWidget):
         self.loadTasks()
 
     def loadTasks(self):
-        """加载任务列表"""
-        try:
-            tasks, total_count = JimengIntlVideoTask.get_tasks_by_page(self.current_page, self.page_size)
-
-            # 清理旧内容
-            old_row_count = self.table.rowCount()
-            for r in range(old_row_count):
-                for c in range(self.table.columnCount()):
-                    w = self.table.cellWidget(r, c)
-                    if w:
-                        self.table.removeCellWidget(r, c)
-                        w.setParent(None)
-                        w.deleteLater()
-            self.table.clearContents()
-            self.table.setRowCount(0)
-            QApplication.processEvents()
-
-            self.table.setRowCount(len(tasks))
-            for row, task in enumerate(tasks):
-                self.table.setRowHeight(row, 100)
-
-                # 复选框
-                checkbox = CheckBox()
-                container = QWidget(self.table)
-                container.setFixedHeight(self.table.rowHeight(row))
-                c_layout = QHBoxLayout(container)
-                c_layout.setContentsMargins(0, 0, 0, 0)
-                c_layout.setSpacing(0)
-                c_layout.setAlignment(Qt.AlignCenter)
-                c_layout.addWidget(checkbox, 0, Qt.AlignCenter)
-                self.table.setCellWidget(row, 0, container)
-
-                # ID
-                id_item = QTableWidgetItem(str(task.id))
-                id_item.setTextAlignment(Qt.AlignCenter)
-                self.table.setItem(row, 1, id_item)
-
-                # 首帧图
-                first_img = None
-                inputs = task.get_input_images()
-                if inputs:
-                    first_img = inputs[0]
-                p = first_img or ""
-                p = p.strip()
-                if p.lower().startswith("file:///"):
-                    p = p[8:].replace('/', '\\')
-                if p and os.path.exists(p):
-                    img_label = QLabel()
-                    pixmap = QPixmap(p)
-                    scaled = pixmap.scaled(80, 80, Qt.KeepAspectRatio, Qt.SmoothTransformation)
-                    img_label.setPixmap(scaled)
-                    img_label.setAlignment(Qt.AlignCenter)
-                    img_label.setFixedSize(96, 96)
-                    self.table.setCellWidget(row, 2, img_label)
-                else:
-                    item_img = QTableWidgetItem("无图片")
-                    item_img.setTextAlignment(Qt.AlignCenter)
-                    self.table.setItem(row, 2, item_img)
-
-                # 提示词
-                pt = task.prompt or ""
-                short = pt[:40] + ("..." if len(pt) > 40 else "")
-                item_prompt = QTableWidgetItem(short)
-                item_prompt.setToolTip(pt)
-                item_prompt.setTextAlignment(Qt.AlignCenter)
-                self.table.setItem(row, 3, item_prompt)
-
-                # 参数信息
-                params = f"{task.ratio} | {task.duration} | {task.quality}"
-                item_params = QTableWidgetItem(params)
-                item_params.setTextAlignment(Qt.AlignCenter)
-                item_params.setToolTip(f"比例: {task.ratio}\n时长: {task.duration}\n质量: {task.quality}")
-                self.table.setItem(row, 4, item_params)
-
-                # 状态
-                status_map = {0: "排队中", 1: "生成中", 2: "已完成", 3: "失败"}
-                item_status = QTableWidgetItem(status_map.get(task.status, "-"))
-                item_status.setData(Qt.UserRole, task.id)
-                item_status.setTextAlignment(Qt.AlignCenter)
-
-                # 如果失败，显示失败原因
-                if task.status == 3 and task.message:
-                    item_status.setToolTip(f"失败原因: {task.message}")
-
-                if task.status == 2:
-                    item_status.setForeground(QColor("#34C759"))
-                elif task.status == 3:
-                    item_status.setForeground(QColor("#FF3B30"))
-
-                self.table.setItem(row, 5, item_status)
-
-                # 操作按钮
-                action_container = QWidget(self.table)
-                action_container.setFixedHeight(self.table.rowHeight(row))
-                action_layout = QHBoxLayout(action_container)
-                action_layout.setContentsMargins(0, 0, 0, 0)
-                action_layout.setSpacing(5)
-                action_layout.setAlignment(Qt.AlignCenter)
-
-                download_btn = PushButton("下载", action_container)
-                download_btn.setFixedWidth(60)
-                # 只有成功状态(2)才能下载
-                download_btn.setEnabled(task.status == 2)
-                download_btn.clicked.connect(lambda checked, tid=task.id: self.onDownloadTask(tid))
-                action_layout.addWidget(download_btn)
-
-                retry_btn = PushButton("重试", action_container)
-                retry_btn.setFixedWidth(60)
-                # 只有失败状态(3)才能重试
-                retry_btn.setEnabled(task.status == 3)
-                retry_btn.clicked.connect(lambda checked, tid=task.id: self.onRetryTask(tid))
-                action_layout.addWidget(retry_btn)
-
-                reason_btn = PushButton("原因", action_container)
-                reason_btn.setFixedWidth(60)
-                # 只有失败状态(3)才能查看原因
-                reason_btn.setEnabled(task.status == 3)
-                reason_btn.clicked.connect(lambda checked, tid=task.id: self.onShowFailReason(tid))
-                action_layout.addWidget(reason_btn)
-
-                self.table.setCellWidget(row, 6, action_container)
-
-                # 初始化缓存
-                self.task_cache[task.id] = {
-                    'status': task.status,
-                    'code': task.code,
-                    'message': task.message
-                }
-
-            # 更新分页信息
-            total_pages = (total_count + self.page_size - 1) // self.page_size if total_count > 0 else 1
-            self.pageInfoLabel.setText(f"第 {self.current_page} 页，共 {total_count} 条")
+        """在数据库线程中查询当前页，完成后更新表格（界面线程不执行查询）"""
+        # 结果返回前禁用翻页，避免用上一页的游标翻页
+        self.prevPageBtn.setEnabled(False)
+        self.nextPageBtn.setEnabled(False)
+        run_query(self._queryPage, self.page_cursors[self.current_page - 1], self.page_size,
+                  key=(id(self), 'loadTasks'), on_finished=self.onTasksLoaded)
+
+    @staticmethod
+    def _queryPage(cursor, page_size):
+        """查询一页任务（数据库线程）"""
+        # 先记录变更序号再查询，查询期间发生的变化会在下次增量刷新时再更新一次
+        change_seq = JimengIntlVideoTask.get_max_change_seq()
+        tasks, total_count = JimengIntlVideoTask.get_tasks_after(cursor, page_size)
+        return cursor, page_size, change_seq, tasks, total_count
+
+    def onTasksLoaded(self, result, error):
+        """当前页查询完成"""
+        if error:
+            log.error(f"加载视频任务失败: {error}")
+            self.task_model.setTasks([])
             self.prevPageBtn.setEnabled(self.current_page > 1)
-            self.nextPageBtn.setEnabled(self.current_page < total_pages)
+            InfoBar.error(title="加载失败", content=str(error), parent=self, position=InfoBarPosition.TOP)
+            return
 
-        except Exception as e:
-            log.error(f"加载视频任务失败: {e}")
-            self.table.setRowCount(0)
-            InfoBar.error(title="加载失败", content=str(e), parent=self, position=InfoBarPosition.TOP)
+        cursor, page_size, change_seq, tasks, total_count = result
+        if (cursor, page_size) != (self.page_cursors[self.current_page - 1], self.page_size):
+            # 查询期间已经翻到其他页，等待最新一页的结果
+            return
+
+        self.change_seq = change_seq
+        self.next_page_cursor = (tasks[-1].create_at, tasks[-1].id) if tasks else None
+        self.task_model.setTasks(tasks)
+        self.task_cache = {task.id: self.task_model.taskState(task) for task in tasks}
+
+            # 更新分页信息
+        total_pages = (total_count + self.page_size - 1) // self.page_size if total_count > 0 else 1
+        self.pageInfoLabel.setText(f"第 {self.current_page} 页，共 {total_count} 条")
+        self.prevPageBtn.setEnabled(self.current_page > 1)
+        self.nextPageBtn.setEnabled(self.current_page < total_pages)
 
     def onAddTask(self):
         """添加任务"""
@@ -385,71 +314,90 @@ class VideoGenIntlView(QWidget):
         except Exception as e:
             log.debug(f"自动刷新任务列表失败: {e}")
 
-    def smartRefreshTasks(self):
-        """智能刷新：只更新有变化的任务行"""
-        try:
-            tasks, total_count = JimengIntlVideoTask.get_tasks_by_page(self.current_page, self.page_size)
-
-            # 遍历当前显示的任务，检查是否有变化
-            for row, task in enumerate(tasks):
-                # 构建当前任务的状态快照
-                current_state = {
-                    'status': task.status,
-                    'code': task.code,
-                    'message': task.message
-                }
-
-                # 检查这个任务是否在缓存中且状态是否改变
-                task_id = task.id
-                if task_id in self.task_cache:
-                    cached_state = self.task_cache[task_id]
-                    # 如果状态没有变化，跳过这一行
-                    if cached_state == current_state:
-                        continue
+    def onTasksUpdated(self, task_type: str, updates: dict):
+        """
+        任务管理器推送的任务变化（已合并），只更新当前页中对应的行
 
-                # 状态有变化，更新缓存并刷新这一行
-                self.task_cache[task_id] = current_state
-                self.updateTaskRow(row, task)
+        Args:
+            task_type: 任务类型
+            updates: {任务ID: {字段名: 新值}}
+        """
+        if task_type != JimengIntlVideoTask.TASK_TYPE:
+            return
+        for task_id, changes in updates.items():
+            if self.task_model.rowOfTask(task_id) is None:
+                continue
+            # 推送的字段（状态、错误码、消息、输出、账号）全部写入行中的任务，与数据库保持一致
+            current_state = dict(self.task_cache.get(task_id, {}))
+            current_state.update(changes)
+            if self.task_cache.get(task_id) == current_state:
+                continue
+            self.task_cache[task_id] = current_state
+            self.task_model.updateTask(task_id, changes)
+
+    def onTaskManagerFinished(self):
+        """任务管理器停止后恢复轮询，并先补上停止推送前后的变化"""
+        self.smartRefreshTasks()
+        if self.isVisible():
+            self.auto_refresh_timer.start(5000)
 
-        except Exception as e:
-            log.debug(f"智能刷新失败: {e}")
+    def smartRefreshTasks(self):
+        """增量刷新：在数据库线程中查询上次刷新后变化的任务，完成后更新当前页中对应的行"""
+        run_query(JimengIntlVideoTask.get_changes_since, self.change_seq, CHANGE_FEED_LIMIT,
+                  key=(id(self), 'changes'), on_finished=self.onChangesLoaded)
+
+    def onChangesLoaded(self, result, error):
+        """增量刷新查询完成"""
+        if error:
+            log.debug(f"智能刷新失败: {error}")
+            return
+        tasks, change_seq = result
+        if not tasks or change_seq <= self.change_seq:
+            return
+        self.change_seq = change_seq
+
+        # 变化太多时直接重新加载当前页
+        reload_page = len(tasks) >= CHANGE_FEED_LIMIT
+        for task in tasks:
+            row = self.task_model.rowOfTask(task.id)
+            if row is None:
+                # 新建的任务（或从其他页恢复的任务）落在当前页范围内时需要重新加载
+                if not task.isdel and self._isInCurrentPage(task):
+                    reload_page = True
+                continue
+            if task.isdel:
+                reload_page = True
+                continue
+
+            current_state = self.task_model.taskState(task)
+            if self.task_cache.get(task.id) == current_state:
+                continue
+            self.task_cache[task.id] = current_state
+            self.updateTaskRow(task)
+
+        if reload_page:
+            self.loadTasks()
 
-    def updateTaskRow(self, row: int, task):
+    def _isInCurrentPage(self, task) -> bool:
+        """任务按 (创建时间, ID) 倒序排列时是否属于当前页"""
+        key = (task.create_at, task.id)
+        start = self.page_cursors[self.current_page - 1]
+        if start is not None and key >= start:
+            return False
+        return self.next_page_cursor is None or key > self.next_page_cursor
+
+    def updateTaskRow(self, task):
         """更新表格中的单一任务行"""
-        try:
-            # 更新状态列
-            status_map = {0: "排队中", 1: "生成中", 2: "已完成", 3: "失败"}
-            item_status = self.table.item(row, 5)
-            if item_status:
-                item_status.setText(status_map.get(task.status, "-"))
-                item_status.setData(Qt.UserRole, task.id)
-                item_status.setTextAlignment(Qt.AlignCenter)
-
-                # 根据状态设置文字颜色
-                if task.status == 2:  # 已完成
-                    item_status.setForeground(QColor("#34C759"))  # 绿色
-                elif task.status == 3:  # 失败
-                    item_status.setForeground(QColor("#FF3B30"))  # 红色
-                    # 如果失败，显示失败原因
-                    if task.message:
-                        item_status.setToolTip(f"失败原因: {task.message}")
-                else:
-                    item_status.setToolTip("")
-
-            # 更新操作按钮的启用状态
-            action_container = self.table.cellWidget(row, 6)
-            if action_container:
-                buttons = action_container.findChildren(PushButton)
-                for btn in buttons:
-                    if btn.text() == "下载":
-                        btn.setEnabled(task.status == 2)
-                    elif btn.text() == "重试":
-                        btn.setEnabled(task.status == 3)
-                    elif btn.text() == "原因":
-                        btn.setEnabled(task.status == 3)
+        self.task_model.updateTask(task.id, self.task_model.taskState(task))
 
-        except Exception as e:
-            log.debug(f"更新任务行失败: {e}")
+    def onTaskAction(self, action: str, task_id: int):
+        """操作列按钮点击"""
+        if action == 'download':
+            self.onDownloadTask(task_id)
+        elif action == 'retry':
+            self.onRetryTask(task_id)
+        elif action == 'reason':
+            self.onShowFailReason(task_id)
 
     def onDownloadTask(self, task_id: int):
         """下载单个任务的视频"""
@@ -603,30 +551,28 @@ class VideoGenIntlView(QWidget):
 
     def onRetryTask(self, task_id: int):
         """重试任务"""
-        try:
-            task = JimengIntlVideoTask.get_task_by_id(task_id)
-            if not task:
+        def on_finished(ok, error):
+            if error:
+                log.error(f"重试任务失败: {error}")
+                InfoBar.error(title="重试失败", content=str(error), parent=self, position=InfoBarPosition.TOP)
+                return
+            if not ok:
                 InfoBar.error(title="错误", content="任务不存在", parent=self, position=InfoBarPosition.TOP)
                 return
 
-            task.status = 0
-            task.code = None
-            task.message = None
-            task.update_at = datetime.now()
-            task.save()
-
             log.info(f"视频任务 {task_id} 已重置为排队状态")
             self.loadTasks()
             InfoBar.success(title="重试成功", content="任务已重新加入队列", parent=self, duration=2000, position=InfoBarPosition.TOP)
 
-        except Exception as e:
-            log.error(f"重试任务失败: {e}")
-            InfoBar.error(title="重试失败", content=str(e), parent=self, position=InfoBarPosition.TOP)
+        run_query(JimengIntlVideoTask.retry_task, task_id, on_finished=on_finished)
 
     def onShowFailReason(self, task_id: int):
         """显示失败原因"""
-        try:
-            task = JimengIntlVideoTask.get_task_by_id(task_id)
+        def on_finished(task, error):
+            if error:
+                log.error(f"获取失败原因失败: {error}")
+                InfoBar.error(title="错误", content=str(error), parent=self, position=InfoBarPosition.TOP)
+                return
             if not task:
                 InfoBar.error(title="错误", content="任务不存在", parent=self, position=InfoBarPosition.TOP)
                 return
@@ -643,13 +589,12 @@ class VideoGenIntlView(QWidget):
             msg_box.yesButton.setText("确定")
             msg_box.exec()
 
-        except Exception as e:
-            log.error(f"获取失败原因失败: {e}")
-            InfoBar.error(title="错误", content=str(e), parent=self, position=InfoBarPosition.TOP)
+        run_query(JimengIntlVideoTask.get_task_by_id, task_id, on_finished=on_finished)
 
     def onPageSizeChanged(self, size):
         self.page_size = int(size)
         self.current_page = 1
+        self.page_cursors = [None]
         self.loadTasks()
 
     def onPrevPage(self):
@@ -658,13 +603,18 @@ class VideoGenIntlView(QWidget):
             self.loadTasks()
 
     def onNextPage(self):
+        if self.next_page_cursor is None:
+            return
+        # 下一页从当前页最后一行之后开始，丢弃之前从更深页返回时保留的游标
+        self.page_cursors = self.page_cursors[:self.current_page] + [self.next_page_cursor]
         self.current_page += 1
         self.loadTasks()
 
     def showEvent(self, event):
-        """界面显示时启动自动刷新"""
+        """界面显示时启动自动刷新（任务管理器运行时由推送更新）"""
         super().showEvent(event)
-        if hasattr(self, 'auto_refresh_timer') and not self.auto_refresh_timer.isActive():
+        if hasattr(self, 'auto_refresh_timer') and not self.auto_refresh_timer.isActive() \
+                and not self.task_manager.isRunning():
             self.auto_refresh_timer.start(5000)
 
     def hideEvent(self, event):
@@ -674,27 +624,10 @@ class VideoGenIntlView(QWidget):
             self.auto_refresh_timer.stop()
 
     def onSelectAllChanged(self, state):
-        checked = (state == Qt.Checked)
-        for row in range(self.table.rowCount()):
-            container = self.table.cellWidget(row, 0)
-            if container:
-                cb = container.findChild(CheckBox)
-                if cb:
-                    cb.setChecked(checked)
+        self.task_model.setAllChecked(state == Qt.Checked)
 
     def _getSelectedTaskIds(self):
-        ids = []
-        for row in range(self.table.rowCount()):
-            container = self.table.cellWidget(row, 0)
-            if container:
-                cb = container.findChild(CheckBox)
-                if cb and cb.isChecked():
-                    status_item = self.table.item(row, 5)
-                    if status_item:
-                        task_id = status_item.data(Qt.UserRole)
-                        if task_id:
-                            ids.append(int(task_id))
-        return ids
+        return self.task_model.checkedTaskIds()
 
     def onDownload(self):
         """批量下载"""
@@ -842,14 +775,10 @@ class VideoGenIntlView(QWidget):
         loading_dlg.exec()
 
     def showContextMenu(self, pos):
-        item = self.table.itemAt(pos)
-        if not item:
-            return
-        row = item.row()
-        status_item = self.table.item(row, 5)
-        if not status_item:
+        task = self.task_model.taskAt(self.table.indexAt(pos).row())
+        if not task:
             return
-        task_id = status_item.data(Qt.UserRole)
+        task_id = task.id
         menu = RoundMenu(parent=self)
         delete_action = Action(FIF.DELETE, "删除", self)
         delete_action.triggered.connect(lambda: self.onDeleteTask(int(task_id)))
@@ -858,42 +787,34 @@ class VideoGenIntlView(QWidget):
 
     def onDeleteTask(self, task_id: int):
         msg_box = MessageBox("确认删除", f"确定要删除任务 #{task_id} 吗？", self)
-        if msg_box.exec():
-            ok = JimengIntlVideoTask.mark_deleted(task_id)
+        if not msg_box.exec():
+            return
+
+        def on_finished(ok, error):
             if ok:
                 InfoBar.success(title="删除成功", content=f"任务 #{task_id} 已删除", parent=self, duration=2000, position=InfoBarPosition.TOP)
                 self.loadTasks()
             else:
-                InfoBar.error(title="删除失败", content="任务不存在", parent=self, position=InfoBarPosition.TOP)
+                InfoBar.error(title="删除失败", content=str(error) if error else "任务不存在", parent=self, position=InfoBarPosition.TOP)
+
+        run_query(JimengIntlVideoTask.mark_deleted, task_id, on_finished=on_finished)
 
     def onBatchAdd(self):
         """批量添加"""
         dlg = BatchAddVideoTaskIntlDialog(self)
 
         def on_added(tasks_data):
-            try:
-                ok = 0
-                for t in tasks_data:
-                    try:
-                        JimengIntlVideoTask.create_task(
-                            prompt=t.get('prompt', ''),
-                            account_id=None,
-                            ratio=t.get('ratio', '16:9'),
-                            model=t.get('model', 'jimeng-video-3.0'),
-                            duration=t.get('duration', '5s'),
-                            quality=t.get('quality', '720p'),
-                            input_images=t.get('input_images', [])
-                        )
-                        ok += 1
-                    except Exception:
-                        pass
+            rows = [dict(t, account_id=None, quality=t.get('quality', '720p')) for t in tasks_data]
+
+            def on_finished(ids, error):
                 self.loadTasks()
-                if ok > 0:
-                    InfoBar.success(title="批量添加成功", content=f"成功添加 {ok} 个任务", parent=self, duration=2500, position=InfoBarPosition.TOP)
+                if ids:
+                    InfoBar.success(title="批量添加成功", content=f"成功添加 {len(ids)} 个任务", parent=self, duration=2500, position=InfoBarPosition.TOP)
                 else:
-                    InfoBar.error(title="批量添加失败", content="所有任务添加失败", parent=self, position=InfoBarPosition.TOP)
-            except Exception as e:
-                InfoBar.error(title="批量添加失败", content=str(e), parent=self, position=InfoBarPosition.TOP)
+                    InfoBar.error(title="批量添加失败", content=error or "所有任务添加失败", parent=self, position=InfoBarPosition.TOP)
+
+            # 在后台线程中批量插入，完成后统一唤醒任务调度器
+            run_bulk_create(self, JimengIntlVideoTask.bulk_create_tasks, rows, on_finished)
 
         dlg.tasks_added.connect(on_added)
         dlg.exec()
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""
+无界面任务执行入口
+不启动 Qt 界面，直接在当前机器上运行已注册的任务执行器（与界面共用同一个数据库）
+
+用法:
+    python -m app.worker                      # 单进程，线程数读取配置
+    python -m app.worker -p 4 -t 50           # 4 个工作进程，每个进程 50 个线程
+    python -m app.worker --poll-interval 10   # 兜底轮询间隔 10 秒
+
+多个进程通过任务认领和租约协作，同一个任务只会被一个进程执行；
+其他进程（包括界面）新建的任务通过 PRAGMA data_version 检测，约 1 秒内即可被发现
+"""
+import argparse
+import multiprocessing
+import os
+import signal
+import sys
+
+from app.managers.task_dispatcher import DEFAULT_POLL_INTERVAL
+
+# 默认外部变更检测间隔（秒）
+DEFAULT_EXTERNAL_CHANGE_INTERVAL = 1.0
+
+
+def run_worker(max_workers=None, poll_interval=DEFAULT_POLL_INTERVAL,
+               external_change_interval=DEFAULT_EXTERNAL_CHANGE_INTERVAL):
+    """
+    在当前进程中运行任务调度器，直到收到 SIGINT / SIGTERM
+
+    Args:
+        max_workers: 线程池最大工作线程数，如不传则从配置读取
+        poll_interval: 兜底轮询间隔（秒）
+        external_change_interval: 检测其他进程写入数据库的间隔（秒）
+    """
+    from app.database.init_db import init_database, close_database
+    from app.managers.task_dispatcher import TaskDispatcher
+    from app.utils.logger import log
+
+    init_database()
+
+    def on_task_started(task_type, task_id):
+        log.info(f"[worker] 任务开始: {task_type} - ID={task_id}")
+
+    def on_task_finished(task_type, task_id, success):
+        log.info(f"[worker] 任务结束: {task_type} - ID={task_id}, 成功={success}")
+
+    def on_status_changed(message):
+        log.info(f"[worker] {message}")
+
+    dispatcher = TaskDispatcher(
+        poll_interval=poll_interval,
+        on_task_started=on_task_started,
+        on_task_finished=on_task_finished,
+        on_status_changed=on_status_changed,
+        external_change_interval=external_change_interval,
+    )
+    if max_workers is not None:
+        dispatcher.set_max_workers(max_workers, save_config=False)
+
+    def handle_signal(signum, frame):
+        log.info(f"[worker] 收到信号 {signum}，等待执行中的任务结束后退出")
+        dispatcher.stop()
+
+    signal.signal(signal.SIGINT, handle_signal)
+    signal.signal(signal.SIGTERM, handle_signal)
+
+    try:
+        dispatcher.run()
+    finally:
+        close_database()
+
+
+def main(argv=None):
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="VideoRobot 无界面任务执行进程")
+    parser.add_argument("-p", "--processes", type=int, default=1,
+                        help="工作进程数（默认 1）")
+    parser.add_argument("-t", "--threads", type=int, default=None,
+                        help="每个进程的工作线程数（默认读取配置 task_manager_threads）")
+    parser.add_argument("--poll-interval", type=float, default=DEFAULT_POLL_INTERVAL,
+                        help=f"兜底轮询间隔，秒（默认 {DEFAULT_POLL_INTERVAL}）")
+    parser.add_argument("--change-interval", type=float, default=DEFAULT_EXTERNAL_CHANGE_INTERVAL,
+                        help=f"检测其他进程新建任务的间隔，秒，0 表示不检测（默认 {DEFAULT_EXTERNAL_CHANGE_INTERVAL}）")
+    args = parser.parse_args(argv)
+
+    worker_kwargs = {
+        "max_workers": args.threads,
+        "poll_interval": args.poll_interval,
+        "external_change_interval": args.change_interval or None,
+    }
+
+    if args.processes <= 1:
+        run_worker(**worker_kwargs)
+        return 0
+
+    from app.utils.logger import log
+
+    # 使用 spawn 启动子进程，每个进程拥有独立的数据库连接和线程池
+    ctx = multiprocessing.get_context("spawn")
+    processes = [
+        ctx.Process(target=run_worker, kwargs=worker_kwargs, name=f"videorobot-worker-{i + 1}")
+        for i in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+        log.info(f"工作进程已启动: {process.name} (PID={process.pid})")
+
+    def handle_signal(signum, frame):
+        # 转发为 SIGTERM 让子进程优雅退出；Windows 下 terminate 会直接结束进程，
+        # 只依赖控制台把 Ctrl+C 同时发给子进程
+        if os.name == "nt":
+            return
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+
+    signal.signal(signal.SIGINT, handle_signal)
+    signal.signal(signal.SIGTERM, handle_signal)
+
+    for process in processes:
+        process.join()
+        log.info(f"工作进程已退出: {process.name} (退出码={process.exitcode})")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,4 +1,5 @@
 # -*- coding: utf-8 -*-
+import multiprocessing
 import os
 import sys
 import platform
@@ -55,36 +56,15 @@ class VideoRobotWindow(MSFluentWindow):
 
     def initTaskManager(self):
         """初始化并启动任务管理器"""
-        from app.managers.global_task_manager import get_global_task_manager
-        from app.models.jimeng_intl_image_task import JimengIntlImageTask
-        from app.models.jimeng_intl_video_task import JimengIntlVideoTask
-        from datetime import datetime
+        from app.managers.global_task_manager import get_global_task_manager, CONFIG_KEY_TASK_MANAGER_AUTOSTART
+        from app.utils.config_manager import get_config_manager
 
-        # 启动前将所有进行中的图片任务重置为排队中（状态 1 -> 0）
-        try:
-            running_image_tasks = JimengIntlImageTask.select().where(JimengIntlImageTask.status == 1)
-            for task in running_image_tasks:
-                task.status = 0
-                task.update_at = datetime.now()
-                task.save()
-            image_count = running_image_tasks.count()
-            if image_count > 0:
-                log.info(f"启动前重置了 {image_count} 个进行中的图片任务为排队状态")
-        except Exception as e:
-            log.error(f"重置进行中的图片任务失败: {e}")
+        if not get_config_manager().get_bool(CONFIG_KEY_TASK_MANAGER_AUTOSTART, True):
+            log.info("界面内任务管理器已关闭，任务由无界面进程（python -m app.worker）执行")
+            return
 
-        # 启动前将所有进行中的视频任务重置为排队中（状态 1 -> 0）
-        try:
-            running_video_tasks = JimengIntlVideoTask.select().where(JimengIntlVideoTask.status == 1)
-            for task in running_video_tasks:
-                task.status = 0
-                task.update_at = datetime.now()
-                task.save()
-            video_count = running_video_tasks.count()
-            if video_count > 0:
-                log.info(f"启动前重置了 {video_count} 个进行中的视频任务为排队状态")
-        except Exception as e:
-            log.error(f"重置进行中的视频任务失败: {e}")
+        # 上次退出遗留的生成中任务由任务管理器启动时按租约回收
+        # （只回收租约已过期的任务，多进程共享数据库时不会影响其他进程正在执行的任务）
 
         # 初始化并启动任务管理器
         self.task_manager = get_global_task_manager()
@@ -167,6 +147,13 @@ class VideoRobotWindow(MSFluentWindow):
             self.task_manager.wait(2000)
             log.info("任务管理器已停止")
 
+        # 保存账号轮询游标
+        try:
+            from app.managers.account_allocator import get_account_allocator
+            get_account_allocator().flush()
+        except Exception as e:
+            log.error(f"保存账号轮询游标失败: {e}")
+
         # 关闭数据库连接
         try:
             close_database()
@@ -380,4 +367,6 @@ def main():
 
 
 if __name__ == '__main__':
+    # 打包后的程序启动参考图片预处理子进程时需要
+    multiprocessing.freeze_support()
     main()
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+"""
+测试公共夹具
+
+应用数据目录（数据库、日志、缓存）放到临时目录；每个测试使用独立的数据库文件，
+通过 bind 把所有模型绑定到该数据库，不会读写用户的真实数据
+"""
+import os
+import tempfile
+
+# 必须在导入 app 之前设置：app.database.db 导入时就会按数据目录创建全局数据库实例
+_app_home = tempfile.mkdtemp(prefix="videorobot-tests-")
+os.environ["HOME"] = _app_home
+os.environ["APPDATA"] = _app_home
+
+import pytest
+
+from app.database.db import db, create_database
+from app.database.migrations import run_migrations
+from app.models.config import Config
+from app.models.jimeng_account import JimengAccount
+from app.models.jimeng_image_task import JimengImageTask
+from app.models.jimeng_intl_account import JimengIntlAccount
+from app.models.jimeng_intl_image_task import JimengIntlImageTask
+from app.models.jimeng_intl_video_task import JimengIntlVideoTask
+from app.models.table_row_count import TableRowCount
+
+# 与 init_database 建表的顺序一致
+ALL_MODELS = [Config, JimengAccount, JimengImageTask, JimengIntlAccount,
+              JimengIntlImageTask, JimengIntlVideoTask, TableRowCount]
+
+
+@pytest.fixture
+def bound_database(tmp_path):
+    """绑定到临时数据库文件但还没有建表的数据库实例"""
+    database = create_database(str(tmp_path / "test.db"))
+    database.bind(ALL_MODELS, bind_refs=False, bind_backrefs=False)
+    database.connect()
+    yield database
+    database.close()
+    db.bind(ALL_MODELS, bind_refs=False, bind_backrefs=False)
+
+
+@pytest.fixture
+def database(bound_database):
+    """已建表并执行完所有迁移的数据库（与 init_database 相同）"""
+    bound_database.create_tables(ALL_MODELS, safe=True)
+    run_migrations(bound_database)
+    return bound_database
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""账号分配器：GROUP BY 加载的内存计数表、随任务状态增量更新，最少任务分配，以及轮询账号环的重新加载"""
+from datetime import datetime
+
+import pytest
+
+from app.managers.account_allocator import AccountAllocator, AccountRing
+from app.models.jimeng_account import JimengAccount
+from app.models.jimeng_image_task import JimengImageTask
+from app.models.jimeng_intl_account import JimengIntlAccount
+
+
+@pytest.fixture
+def allocator(database):
+    allocator = AccountAllocator()
+    yield allocator
+    JimengImageTask.remove_status_listener(allocator.on_task_status_changed)
+    JimengAccount.remove_change_listener(allocator._ring.on_account_changed)
+    JimengIntlAccount.remove_change_listener(allocator._intl_ring.on_account_changed)
+
+
+def create_tasks(account, *statuses):
+    """为账号创建指定状态的任务（直接建行，不经过状态监听器）"""
+    for status in statuses:
+        JimengImageTask.create(prompt="p", account_id=account.id, status=status)
+
+
+def live_counts(allocator) -> dict:
+    """数据库中各账号各状态的任务数（去掉计数为 0 的状态，便于与内存计数表比较）"""
+    return {
+        account_id: {status: count for status, count in counts.items() if count}
+        for account_id, counts in JimengImageTask.count_by_account_status(allocator._accounts.keys()).items()
+    }
+
+
+def memory_counts(allocator) -> dict:
+    return {
+        account_id: {status: count for status, count in counts.items() if count}
+        for account_id, counts in allocator._counters.items()
+        if any(counts.values())
+    }
+
+
+def test_counters_loaded_by_group_by(allocator):
+    a = JimengAccount.create_account("a")
+    b = JimengAccount.create_account("b")
+    create_tasks(a, "pending", "pending", "success")
+    create_tasks(b, "processing", "failed")
+
+    allocator.set_strategy("least_busy")
+    allocator.allocate_account()
+
+    assert allocator._counters == {
+        a.id: {"pending": 2, "success": 1},
+        b.id: {"processing": 1, "failed": 1},
+    }
+
+
+def test_counters_follow_task_status_changes(allocator):
+    a = JimengAccount.create_account("a")
+    b = JimengAccount.create_account("b")
+    create_tasks(a, "pending")
+    allocator.set_strategy("least_busy")
+    allocator.allocate_account()
+
+    task = JimengImageTask.create_task("p", account_id=a.id)
+    JimengImageTask.update_task_status(task.id, "processing")
+    JimengImageTask.update_task_status(task.id, "success")
+    other = JimengImageTask.create_task("p", account_id=b.id)
+    JimengImageTask.update_task_status(other.id, "failed")
+    JimengImageTask.delete_task(JimengImageTask.create_task("p", account_id=b.id).id)
+    # 新建后再分配账号的任务
+    unbound = JimengImageTask.create_task("p")
+    assert allocator.allocate_and_assign(unbound)
+
+    assert memory_counts(allocator) == live_counts(allocator)
+
+
+def test_least_busy_picks_account_with_fewest_active_tasks(allocator):
+    a = JimengAccount.create_account("a")
+    b = JimengAccount.create_account("b")
+    c = JimengAccount.create_account("c")
+    create_tasks(a, "pending", "processing")
+    create_tasks(b, "pending")
+    # 已结束的任务不算忙碌
+    create_tasks(c, "pending", "success", "success", "failed")
+    allocator.set_strategy("least_busy")
+
+    first = allocator.allocate_account()
+    assert first.id in (b.id, c.id)
+
+    # 给选中的账号加一个任务后，另一个账号成为最空闲的账号
+    JimengImageTask.create_task("p", account_id=first.id)
+    second = allocator.allocate_account()
+    assert second.id == ({b.id, c.id} - {first.id}).pop()
+
+    # 任务结束后忙碌数减少
+    for task in JimengImageTask.select().where(JimengImageTask.account_id == a.id):
+        JimengImageTask.update_task_status(task.id, "success")
+    assert allocator.allocate_account().id == a.id
+
+
+def test_least_busy_spreads_assigned_tasks(allocator):
+    accounts = [JimengAccount.create_account(str(i)) for i in range(3)]
+    allocator.set_strategy("least_busy")
+
+    for _ in range(6):
+        assert allocator.allocate_and_assign(JimengImageTask.create_task("p"))
+
+    counts = JimengImageTask.count_by_account_status([account.id for account in accounts])
+    assert [counts[account.id]["pending"] for account in accounts] == [2, 2, 2]
+
+
+def test_invalidate_reloads_counters_from_database(allocator):
+    a = JimengAccount.create_account("a")
+    allocator.set_strategy("least_busy")
+    allocator.allocate_account()
+
+    # 其他进程写入的任务不会通知监听器，标记过期后从数据库重新统计
+    create_tasks(a, "pending", "processing")
+    allocator.invalidate()
+    allocator.allocate_account()
+
+    assert allocator._counters == {a.id: {"pending": 1, "processing": 1}}
+
+
+@pytest.fixture
+def ring(database):
+    """国际版账号环（不自动重新加载，测试中按需把间隔改为 0）"""
+    ring = AccountRing("test", JimengIntlAccount, refresh_interval=3600)
+    yield ring
+    JimengIntlAccount.remove_change_listener(ring.on_account_changed)
+
+
+def next_ids(ring, count: int) -> list:
+    return [ring.next(lambda account: account.is_available()).id for _ in range(count)]
+
+
+def test_ring_follows_accounts_saved_in_process(ring):
+    a, b = JimengIntlAccount.create_account("a"), JimengIntlAccount.create_account("b")
+    assert next_ids(ring, 1) == [a.id]
+
+    c = JimengIntlAccount.create_account("c")
+    JimengIntlAccount.delete_account(a.id)
+
+    assert next_ids(ring, 3) == [b.id, c.id, b.id]
+
+
+def test_ring_reloads_accounts_changed_by_other_processes(ring):
+    accounts = [JimengIntlAccount.create_account(str(i)) for i in range(4)]
+    ids = [account.id for account in accounts]
+    assert next_ids(ring, 2) == ids[:2]
+
+    # 其他进程直接写库：不经过 save()，本进程的监听器收不到通知
+    JimengIntlAccount.update(is_deleted=1).where(JimengIntlAccount.id == ids[2]).execute()
+    JimengIntlAccount.update(disabled_at=datetime.now()).where(JimengIntlAccount.id == ids[0]).execute()
+    new_id = JimengIntlAccount.insert(session_id="new").execute()
+
+    # 重新加载间隔未到时仍使用缓存的账号
+    assert next_ids(ring, 1) == [ids[2]]
+
+    ring.refresh_interval = 0
+    # 重新加载后游标保持在上一次分配的账号上，跳过已删除和今天禁用的账号
+    assert next_ids(ring, 4) == [ids[3], new_id, ids[1], ids[3]]
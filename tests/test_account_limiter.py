@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""账号并发与速率限制，以及执行器准备任务失败时归还账号名额"""
+import pytest
+
+from app.managers.account_limiter import AccountBusyError, AccountLimiter
+from app.managers.jimeng_intl_image_task_executor import JimengIntlImageTaskExecutor
+from app.managers.points_ledger import PointsLedger
+from app.models.jimeng_intl_account import JimengIntlAccount
+from app.models.jimeng_intl_image_task import JimengIntlImageTask
+
+
+def test_limiter_defaults_are_unlimited():
+    limiter = AccountLimiter()
+
+    assert limiter.get_free_slots(1) == -1
+    assert all(limiter.try_acquire(1) for _ in range(100))
+    assert limiter.get_saturated_accounts() == set()
+    assert limiter.get_total_free_slots([1, 2]) == -1
+    assert limiter.get_next_refill_delay() is None
+
+
+def test_limiter_max_in_flight():
+    limiter = AccountLimiter(max_in_flight=2)
+
+    assert limiter.try_acquire(1)
+    assert limiter.try_acquire(1)
+    assert not limiter.try_acquire(1)
+    assert limiter.get_saturated_accounts() == {1}
+    assert limiter.get_total_free_slots([1, 2]) == 2
+
+    limiter.release(1)
+    assert limiter.get_free_slots(1) == 1
+    assert limiter.try_acquire(1)
+
+
+def test_limiter_requests_per_minute():
+    limiter = AccountLimiter(requests_per_minute=2)
+
+    assert limiter.try_acquire(1)
+    limiter.release(1)
+    assert limiter.try_acquire(1)
+    limiter.release(1)
+    # 名额已归还，但令牌要按每分钟 2 个补充
+    assert not limiter.try_acquire(1)
+    assert 0 < limiter.get_next_refill_delay() <= 30
+
+
+@pytest.fixture
+def executor(database):
+    executor = JimengIntlImageTaskExecutor()
+    executor.account_limiter = AccountLimiter(max_in_flight=1)
+    executor.points_ledger = PointsLedger()
+    # 状态写入线程使用全局数据库，测试中不保存任务
+    executor.save_task = lambda task, wait=True: None
+    return executor
+
+
+def create_bound_task(account_type: int = 1):
+    account = JimengIntlAccount.create(session_id="s", account_type=account_type, points=100)
+    task = JimengIntlImageTask.create(prompt="p", account_id=account.id)
+    return account, task
+
+
+def test_prepare_task_reserves_bound_account(executor):
+    account, task = create_bound_task()
+
+    prepared_account, request, reservation = executor.prepare_task(task)
+
+    assert prepared_account.id == account.id
+    assert request['prompt'] == "p"
+    assert reservation.account_id == account.id
+    assert executor.account_limiter.get_free_slots(account.id) == 0
+
+    executor.release_account(prepared_account, reservation)
+    assert executor.account_limiter.get_free_slots(account.id) == 1
+    assert executor.points_ledger.get_available_points(account.id) == 100
+
+
+def test_prepare_task_releases_slot_when_reserve_fails(executor, monkeypatch):
+    account, task = create_bound_task()
+
+    def fail(account_id, points):
+        raise RuntimeError("ledger error")
+
+    monkeypatch.setattr(executor.points_ledger, "reserve_account", fail)
+
+    with pytest.raises(RuntimeError):
+        executor.prepare_task(task)
+    assert executor.account_limiter.get_free_slots(account.id) == 1
+
+
+def test_prepare_task_busy_account(executor):
+    account, task = create_bound_task(account_type=0)
+    assert executor.account_limiter.try_acquire(account.id)
+
+    with pytest.raises(AccountBusyError):
+        executor.prepare_task(task)
+    assert executor.account_limiter.get_free_slots(account.id) == 0
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""异步API客户端：对本地模拟服务发送请求，返回值与同步客户端一致"""
+import asyncio
+
+import pytest
+
+pytest.importorskip("aiohttp")
+
+from app.client.jimeng_api_client import JimengApiClient
+from app.client.jimeng_async_api_client import AsyncJimengApiClient
+from app.tools.mock_jimeng_server import MockJimengConfig, MockJimengServer
+
+
+@pytest.fixture
+def server():
+    server = MockJimengServer(MockJimengConfig(
+        image_latency="0.01", video_latency="0.2", submit_latency="0",
+        credits={"rich": 100, "poor": 1}, images_per_task=2,
+    ))
+    server.start()
+    yield server
+    server.stop()
+
+
+def run_with_client(server, func):
+    """创建连接到模拟服务的客户端，执行 func(client) 协程"""
+    async def main():
+        client = AsyncJimengApiClient(max_connections=4)
+        client._config_client = JimengApiClient(base_url=server.base_url)
+        await client.start()
+        try:
+            return await func(client)
+        finally:
+            await client.close()
+
+    return asyncio.run(main())
+
+
+def test_account_check(server):
+    assert run_with_client(server, lambda client: client.account_check("rich")) == 100
+
+
+def test_generate_image(server):
+    result = run_with_client(server, lambda client: client.generate_image("rich", "a cat", model="jimeng-4.0"))
+
+    assert len(result["data"]) == 2
+    assert all(item["url"].startswith(server.base_url) for item in result["data"])
+
+
+def test_generate_without_credits_returns_code(server):
+    result = run_with_client(server, lambda client: client.generate_image("poor", "a cat", model="jimeng-4.5"))
+
+    assert result["code"] == -2001
+
+
+def test_concurrent_requests(server):
+    async def generate_many(client):
+        return await asyncio.gather(*[client.generate_video("rich", f"p{i}", duration=5) for i in range(5)])
+
+    results = run_with_client(server, generate_many)
+
+    assert all(result.get("data") for result in results)
+    assert server.state.get_stats()["max_in_flight"] >= 2
+
+
+def test_http_error_returns_empty_dict():
+    server = MockJimengServer(MockJimengConfig(image_latency="0", submit_latency="0", error_rate=1.0))
+    server.start()
+    try:
+        assert run_with_client(server, lambda client: client.generate_image("t", "a cat")) == {}
+    finally:
+        server.stop()
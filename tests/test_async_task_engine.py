@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+"""asyncio 执行引擎：执行名额上限、取消，以及出错或取消后任务的租约和账号名额被释放"""
+import asyncio
+import threading
+from concurrent.futures import CancelledError
+
+import pytest
+
+from app.managers.account_limiter import AccountLimiter
+from app.managers.async_task_engine import AsyncTaskEngine
+from app.managers.jimeng_intl_image_task_executor import JimengIntlImageTaskExecutor
+from app.managers.points_ledger import PointsLedger
+from app.managers.task_dispatcher import TaskDispatcher
+from app.models.jimeng_intl_account import JimengIntlAccount
+from app.models.jimeng_intl_image_task import JimengIntlImageTask
+
+
+class FakeClient:
+    """异步API客户端替身：generate_image 由测试指定行为"""
+
+    def __init__(self, generate=None):
+        self.generate = generate
+        self.started = self.closed = False
+
+    async def start(self):
+        self.started = True
+
+    async def close(self):
+        self.closed = True
+
+    async def generate_image(self, **kwargs):
+        return await self.generate()
+
+    async def account_check(self, token):
+        return 100
+
+
+class CountingExecutor:
+    """记录同时执行的协程数，每个任务等待 release 事件后返回"""
+
+    def __init__(self):
+        self.running = 0
+        self.max_running = 0
+        self.cancelled = []
+        self.release = None
+
+    async def execute_task_async(self, task, client, run_sync):
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        try:
+            await self.release.wait()
+            return await run_sync(lambda: task)
+        except asyncio.CancelledError:
+            self.cancelled.append(task)
+            raise
+        finally:
+            self.running -= 1
+
+
+@pytest.fixture
+def engine():
+    engine = AsyncTaskEngine(max_in_flight=2, sync_threads=2, client=FakeClient())
+    engine.start()
+    yield engine
+    engine.shutdown()
+
+
+def run_in_loop(engine, func):
+    """在事件循环线程中执行 func（asyncio.Event 不是线程安全的）"""
+    async def call():
+        return func()
+
+    return asyncio.run_coroutine_threadsafe(call(), engine._loop).result(5)
+
+
+def test_engine_limits_tasks_in_flight(engine):
+    executor = CountingExecutor()
+    run_in_loop(engine, lambda: setattr(executor, "release", asyncio.Event()))
+    futures = [engine.submit_task(executor, task) for task in range(5)]
+
+    # 只有 2 个任务进入执行，其余在引擎中等待名额
+    run_in_loop(engine, lambda: None)
+    assert executor.max_running == 2
+
+    run_in_loop(engine, executor.release.set)
+    assert [future.result(5) for future in futures] == list(range(5))
+    assert executor.max_running == 2
+    assert engine._client.started
+
+
+def test_cancel_submitted_task(engine):
+    executor = CountingExecutor()
+    run_in_loop(engine, lambda: setattr(executor, "release", asyncio.Event()))
+    future = engine.submit_task(executor, "a")
+    run_in_loop(engine, lambda: None)
+
+    assert future.cancel()
+    with pytest.raises(CancelledError):
+        future.result(5)
+    run_in_loop(engine, lambda: None)
+    assert executor.cancelled == ["a"]
+    assert executor.running == 0
+
+
+def test_shutdown_cancels_running_tasks():
+    client = FakeClient()
+    engine = AsyncTaskEngine(max_in_flight=1, sync_threads=1, client=client)
+    engine.start()
+    executor = CountingExecutor()
+    run_in_loop(engine, lambda: setattr(executor, "release", asyncio.Event()))
+    running, waiting = engine.submit_task(executor, "a"), engine.submit_task(executor, "b")
+    run_in_loop(engine, lambda: None)
+
+    engine.shutdown()
+
+    # 执行中的协程完成了取消处理；等待名额的协程也被取消，不会开始执行
+    assert executor.cancelled == ["a"]
+    assert running.cancelled() and waiting.cancelled()
+    assert client.closed
+
+
+@pytest.fixture
+def dispatcher(database):
+    """只包含图片执行器、使用 asyncio 引擎（替身客户端）的调度器，记录任务完成事件"""
+    finished = {}
+    done = threading.Event()
+
+    def on_task_finished(task_type, task_id, success):
+        finished[task_id] = success
+        done.set()
+
+    dispatcher = TaskDispatcher(max_workers=1, on_task_finished=on_task_finished)
+    executor = JimengIntlImageTaskExecutor()
+    executor.account_limiter = dispatcher.account_limiter = AccountLimiter(max_in_flight=1)
+    executor.points_ledger = PointsLedger()
+    dispatcher.executors = [executor]
+    dispatcher.client = FakeClient()
+    dispatcher.async_engine = AsyncTaskEngine(max_in_flight=1, sync_threads=2, client=dispatcher.client)
+    dispatcher.async_engine.start()
+    dispatcher.finished, dispatcher.done = finished, done
+    yield dispatcher
+    if dispatcher.async_engine:
+        dispatcher.async_engine.shutdown()
+
+
+def dispatch_one(dispatcher) -> JimengIntlImageTask:
+    account = JimengIntlAccount.create(session_id="s", account_type=0)
+    task = JimengIntlImageTask.create(prompt="p", account_id=account.id)
+    dispatcher.dispatch_pending_tasks()
+    assert dispatcher.get_running_count() == 1
+    return task
+
+
+def wait_until_idle(dispatcher):
+    assert dispatcher.done.wait(5)
+    for _ in range(100):
+        if dispatcher.get_running_count() == 0:
+            return
+        threading.Event().wait(0.05)
+    raise AssertionError("任务完成回调未执行")
+
+
+def test_error_releases_lease_and_account(dispatcher):
+    async def fail():
+        raise RuntimeError("connection reset")
+
+    dispatcher.client.generate = fail
+    task = dispatch_one(dispatcher)
+
+    wait_until_idle(dispatcher)
+
+    saved = JimengIntlImageTask.get_by_id(task.id)
+    assert dispatcher.finished == {task.id: False}
+    assert saved.status == 3 and saved.message == "connection reset"
+    assert saved.lease_owner is None and saved.lease_expires_at is None
+    assert dispatcher.account_limiter.get_free_slots(saved.account_id.id) == 1
+
+
+def test_success_releases_lease(dispatcher):
+    async def succeed():
+        return {"code": 0, "data": [{"url": "https://example.com/a.png"}]}
+
+    dispatcher.client.generate = succeed
+    task = dispatch_one(dispatcher)
+
+    wait_until_idle(dispatcher)
+
+    saved = JimengIntlImageTask.get_by_id(task.id)
+    assert dispatcher.finished == {task.id: True}
+    assert saved.status == 2 and saved.get_output_images() == ["https://example.com/a.png"]
+    assert saved.lease_owner is None
+
+
+def test_cancelled_task_is_requeued(dispatcher):
+    started = threading.Event()
+
+    async def hang():
+        started.set()
+        await asyncio.Event().wait()
+
+    dispatcher.client.generate = hang
+    task = dispatch_one(dispatcher)
+    assert started.wait(5)
+
+    dispatcher.async_engine.shutdown()
+    dispatcher.async_engine = None
+    wait_until_idle(dispatcher)
+
+    saved = JimengIntlImageTask.get_by_id(task.id)
+    assert dispatcher.finished == {task.id: False}
+    assert saved.status == 0
+    assert saved.lease_owner is None and saved.lease_expires_at is None
+    assert dispatcher.account_limiter.get_free_slots(saved.account_id.id) == 1
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""批量插入：按 SQLite 参数上限分批，违反约束的批次改为逐行插入并跳过出错的行"""
+import sqlite3
+
+import pytest
+
+import app.database.bulk_insert as bulk_insert
+from app.database.bulk_insert import get_chunk_size, insert_many_chunked
+from app.models.jimeng_intl_image_task import JimengIntlImageTask
+
+# 测试中的参数数量上限，远小于默认值，几十行就会跨越分批边界
+MAX_VARIABLES = 100
+
+
+@pytest.fixture
+def variable_limit(database, monkeypatch):
+    """把测试数据库连接的参数上限和分批计算使用的上限都改为 MAX_VARIABLES"""
+    monkeypatch.setattr(bulk_insert, "SQLITE_MAX_VARIABLES", MAX_VARIABLES)
+    connection = database.connection()
+    previous = connection.setlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER, MAX_VARIABLES)
+    yield
+    connection.setlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER, previous)
+
+
+def task_rows(count: int) -> list:
+    return [{"prompt": f"p{i}", "status": 0} for i in range(count)]
+
+
+def test_chunk_size_respects_variable_limit(monkeypatch):
+    monkeypatch.setattr(bulk_insert, "SQLITE_MAX_VARIABLES", 999)
+
+    assert get_chunk_size(9) == 111
+    assert get_chunk_size(1) == 500
+    assert get_chunk_size(2000) == 1
+
+
+def test_chunks_split_at_variable_limit(variable_limit):
+    progress = []
+    # 每行 9 列（2 列来自行数据，其余由 peewee 填充默认值），每批最多 11 行
+    ids = insert_many_chunked(JimengIntlImageTask, task_rows(25),
+                              progress=lambda done, total: progress.append((done, total)))
+
+    assert progress == [(11, 25), (22, 25), (25, 25)]
+    tasks = list(JimengIntlImageTask.select().order_by(JimengIntlImageTask.id))
+    assert ids == [task.id for task in tasks]
+    assert [task.prompt for task in tasks] == [f"p{i}" for i in range(25)]
+
+
+def test_bulk_create_tasks_across_chunks(variable_limit):
+    ids = JimengIntlImageTask.bulk_create_tasks([{"prompt": f"p{i}"} for i in range(40)], notify=False)
+
+    assert len(ids) == 40
+    assert JimengIntlImageTask.select().count() == 40
+    assert JimengIntlImageTask.get_by_id(ids[-1]).prompt == "p39"
+
+
+def test_integrity_error_falls_back_to_rows(database):
+    rows = task_rows(5)
+    # prompt 不能为空：第 3 行违反 NOT NULL 约束
+    rows[2]["prompt"] = None
+
+    ids = insert_many_chunked(JimengIntlImageTask, rows, chunk_size=3)
+
+    prompts = {task.id: task.prompt for task in JimengIntlImageTask.select()}
+    assert [prompts[task_id] for task_id in ids] == ["p0", "p1", "p3", "p4"]
+    assert len(prompts) == 4
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""变更序号：新建、更新和删除任务后 change_seq 递增，界面按 change_seq 增量查询不会遗漏"""
+import pytest
+
+from app.models.jimeng_intl_image_task import JimengIntlImageTask
+from app.models.jimeng_intl_video_task import JimengIntlVideoTask
+
+
+@pytest.fixture(params=[JimengIntlImageTask, JimengIntlVideoTask], ids=["image", "video"])
+def model(request, database):
+    return request.param
+
+
+def create_tasks(model, count: int) -> list:
+    return [model.create(prompt=f"p{i}") for i in range(count)]
+
+
+def changed_ids(model, since: int) -> list:
+    rows, _ = model.get_changes_since(since)
+    return [row.id for row in rows]
+
+
+def test_insert_assigns_increasing_seq(model):
+    assert model.get_max_change_seq() == 0
+
+    tasks = create_tasks(model, 3)
+
+    rows, seq = model.get_changes_since(0)
+    assert [row.id for row in rows] == [task.id for task in tasks]
+    assert [row.change_seq for row in rows] == [1, 2, 3]
+    assert seq == model.get_max_change_seq() == 3
+
+
+def test_update_advances_seq(model):
+    tasks = create_tasks(model, 3)
+    seq = model.get_max_change_seq()
+
+    model.update(status=2, message="done").where(model.id == tasks[0].id).execute()
+
+    rows, new_seq = model.get_changes_since(seq)
+    assert [(row.id, row.status) for row in rows] == [(tasks[0].id, 2)]
+    assert new_seq == seq + 1
+
+
+def test_batch_update_gives_each_row_its_own_seq(model):
+    tasks = create_tasks(model, 3)
+    seq = model.get_max_change_seq()
+
+    model.claim_pending_tasks(limit=3, owner="a")
+
+    rows, new_seq = model.get_changes_since(seq)
+    assert {row.id for row in rows} == {task.id for task in tasks}
+    assert sorted(row.change_seq for row in rows) == [seq + 1, seq + 2, seq + 3]
+    assert new_seq == seq + 3
+
+
+def test_untracked_columns_do_not_advance_seq(model):
+    tasks = create_tasks(model, 2)
+    model.claim_pending_tasks(limit=2, owner="a")
+    seq = model.get_max_change_seq()
+
+    # 续期租约只修改租约字段，界面不需要刷新
+    assert model.renew_leases("a", [task.id for task in tasks], lease_seconds=300) == 2
+
+    assert changed_ids(model, seq) == []
+    assert model.get_max_change_seq() == seq
+
+
+def test_delete_advances_seq(model):
+    tasks = create_tasks(model, 3)
+    seq = model.get_max_change_seq()
+
+    assert model.mark_deleted(tasks[1].id)
+
+    rows, new_seq = model.get_changes_since(seq)
+    # 已删除的任务同样返回，界面据此移除对应的行
+    assert [(row.id, row.isdel) for row in rows] == [(tasks[1].id, 1)]
+    assert new_seq > seq
+
+
+def test_full_row_save_of_latest_row_still_advances_seq(model):
+    tasks = create_tasks(model, 2)
+    latest = tasks[-1]
+    # 实例中的 change_seq 是插入前的默认值 0，整行保存会把它写回
+    assert latest.change_seq == 0
+    seq = model.get_max_change_seq()
+
+    latest.message = "edited"
+    latest.save()
+
+    assert changed_ids(model, seq) == [latest.id]
+    assert model.get_by_id(latest.id).change_seq > seq
+
+
+def test_changes_are_paged_by_seq(model):
+    tasks = create_tasks(model, 5)
+    model.update(message="x").where(model.id == tasks[0].id).execute()
+
+    seen, seq = [], 0
+    while True:
+        rows, seq = model.get_changes_since(seq, limit=2)
+        if not rows:
+            break
+        seen += [row.id for row in rows]
+
+    # 第一个任务更新后排到最后，每个任务只出现一次
+    assert seen == [task.id for task in tasks[1:]] + [tasks[0].id]
+    assert seq == model.get_max_change_seq()
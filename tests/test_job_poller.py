@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+"""异步任务轮询服务：按账号批量查询、等待超时、停止时重新排队（保留远程任务ID）"""
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+import app.managers.job_poller as job_poller
+from app.managers.job_poller import JobPoller
+from app.models.jimeng_intl_image_task import JimengIntlImageTask
+
+
+class FakeClient:
+    """query_jobs 返回测试设置的状态 {远程任务ID: 状态}，并记录每次查询"""
+
+    def __init__(self):
+        self.statuses = {}
+        self.queries = []
+        self.lock = threading.Lock()
+
+    def query_jobs(self, token, remote_ids):
+        with self.lock:
+            self.queries.append((token, list(remote_ids)))
+            if self.statuses is None:
+                return None
+            return {remote_id: self.statuses[remote_id] for remote_id in remote_ids if remote_id in self.statuses}
+
+
+class FakeExecutor:
+    """记录 finish_job 和释放调用；release_tasks 真正把任务重新排队"""
+
+    def __init__(self):
+        self.finished = []
+        self.released_accounts = []
+
+    def get_task_type(self):
+        return JimengIntlImageTask.TASK_TYPE
+
+    def finish_job(self, task, account, reservation, result, error):
+        self.finished.append((task.id, result, error))
+        return error is None
+
+    def release_tasks(self, task_ids):
+        return JimengIntlImageTask.release_tasks(task_ids)
+
+    def release_account(self, account, reservation=None):
+        self.released_accounts.append((account.id, reservation))
+
+
+@pytest.fixture
+def poller(monkeypatch):
+    monkeypatch.setattr(job_poller, "DEFAULT_JOB_POLL_INTERVAL", 0.01)
+    monkeypatch.setattr(job_poller, "MAX_JOB_POLL_INTERVAL", 0.05)
+    done = []
+    finished = threading.Event()
+
+    def on_job_finished(task_type, task_id, success):
+        done.append((task_id, success))
+        finished.set()
+
+    poller = JobPoller(enabled=True, on_job_finished=on_job_finished, client=FakeClient())
+    poller.done, poller.finished = done, finished
+    poller.start()
+    yield poller
+    poller.stop()
+
+
+def submitted_task(remote_id: str):
+    """已认领、已保存远程任务ID的任务"""
+    task = JimengIntlImageTask.create(prompt="p")
+    JimengIntlImageTask.claim_pending_tasks(limit=1, owner="a")
+    JimengIntlImageTask.update(remote_task_id=remote_id).where(JimengIntlImageTask.id == task.id).execute()
+    return JimengIntlImageTask.get_by_id(task.id)
+
+
+def track(poller, executor, remote_id: str, token: str = "t", timeout: float = 5):
+    task = submitted_task(remote_id)
+    account = SimpleNamespace(id=ord(token), session_id=token)
+    poller.track(executor, task, account, "reservation", timeout)
+    return task
+
+
+def wait_for(condition, timeout: float = 5):
+    event = threading.Event()
+    for _ in range(int(timeout / 0.01)):
+        if condition():
+            return
+        event.wait(0.01)
+    raise AssertionError("等待超时")
+
+
+def test_succeeded_job_is_finished(database, poller):
+    executor = FakeExecutor()
+    poller.client.statuses = {"r1": {"status": "running"}}
+    task = track(poller, executor, "r1")
+    wait_for(lambda: len(poller.client.queries) >= 2)
+
+    poller.client.statuses = {"r1": {"status": "succeeded", "result": {"data": [{"url": "u"}]}}}
+
+    assert poller.finished.wait(5)
+    assert executor.finished == [(task.id, {"data": [{"url": "u"}]}, None)]
+    assert poller.done == [(task.id, True)]
+    assert poller.get_pending_count() == 0
+
+
+def test_job_times_out(database, poller):
+    executor = FakeExecutor()
+    poller.client.statuses = {"r1": {"status": "running"}}
+
+    task = track(poller, executor, "r1", timeout=0.1)
+
+    assert poller.finished.wait(5)
+    assert executor.finished == [(task.id, None, "等待生成结果超时")]
+    assert poller.done == [(task.id, False)]
+    # 超时前按间隔多次查询
+    assert len(poller.client.queries) >= 2
+
+
+def test_query_failure_keeps_polling_and_missing_job_fails(database, poller):
+    executor = FakeExecutor()
+    poller.client.statuses = None
+    task = track(poller, executor, "r1")
+    wait_for(lambda: len(poller.client.queries) >= 2)
+    assert executor.finished == []
+
+    # 服务端已经没有这个远程任务
+    poller.client.statuses = {}
+
+    assert poller.finished.wait(5)
+    assert executor.finished == [(task.id, None, "远程任务不存在")]
+
+
+def test_jobs_are_queried_in_batches_per_account(database, poller):
+    executor = FakeExecutor()
+    poller.client.statuses = {f"r{i}": {"status": "running"} for i in range(4)}
+    for i in range(4):
+        track(poller, executor, f"r{i}", token="a" if i % 2 == 0 else "b")
+    wait_for(lambda: {"a", "b"} <= {token for token, _ in poller.client.queries})
+
+    assert {remote_id for token, ids in poller.client.queries if token == "a" for remote_id in ids} == {"r0", "r2"}
+    assert {remote_id for token, ids in poller.client.queries if token == "b" for remote_id in ids} == {"r1", "r3"}
+
+
+def test_stop_requeues_pending_jobs(database, poller):
+    executor = FakeExecutor()
+    poller.client.statuses = {"r1": {"status": "running"}}
+    task = track(poller, executor, "r1")
+    assert poller.get_task_ids(JimengIntlImageTask.TASK_TYPE) == [task.id]
+
+    poller.stop()
+
+    requeued = JimengIntlImageTask.get_by_id(task.id)
+    # 重新排队后保留远程任务ID，下次认领时继续轮询，不重复提交
+    assert requeued.status == 0 and requeued.lease_owner is None
+    assert requeued.remote_task_id == "r1"
+    assert executor.released_accounts == [(ord("t"), "reservation")]
+    assert executor.finished == [] and poller.done == []
+    assert poller.get_pending_count() == 0
+    with pytest.raises(RuntimeError):
+        track(poller, executor, "r2")
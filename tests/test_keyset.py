@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""键集分页：逐页读取结果与 ORDER BY create_at DESC, id DESC 全量查询一致"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models.jimeng_intl_image_task import JimengIntlImageTask
+
+
+def read_all_pages(page_size: int) -> list:
+    """用游标逐页读取所有任务，返回 [每页的任务ID列表]"""
+    pages = []
+    cursor = None
+    while True:
+        rows, _ = JimengIntlImageTask.get_tasks_after(cursor, page_size)
+        if not rows:
+            return pages
+        pages.append([row.id for row in rows])
+        cursor = (rows[-1].create_at, rows[-1].id)
+
+
+@pytest.fixture
+def task_ids(database):
+    """按 ORDER BY create_at DESC, id DESC 排好的任务ID；批量创建的任务时间相同，一批跨越多页"""
+    now = datetime.now()
+    times = [now - timedelta(minutes=3)] * 7 + [now - timedelta(minutes=2)] + [now - timedelta(minutes=1)] * 5
+    for i, create_at in enumerate(times):
+        JimengIntlImageTask.create(prompt=f"p{i}", create_at=create_at)
+    deleted = JimengIntlImageTask.create(prompt="deleted", create_at=now)
+    JimengIntlImageTask.update(isdel=1).where(JimengIntlImageTask.id == deleted.id).execute()
+
+    query = JimengIntlImageTask.select().where(JimengIntlImageTask.isdel == 0).order_by(
+        JimengIntlImageTask.create_at.desc(), JimengIntlImageTask.id.desc())
+    return [task.id for task in query]
+
+
+@pytest.mark.parametrize("page_size", [1, 2, 3, 4, 5, 13, 20])
+def test_pages_cover_all_rows_in_order(task_ids, page_size):
+    pages = read_all_pages(page_size)
+
+    assert [task_id for page in pages for task_id in page] == task_ids
+    assert all(len(page) == page_size for page in pages[:-1])
+
+
+def test_first_page_and_total(task_ids):
+    rows, total = JimengIntlImageTask.get_tasks_after(None, 4)
+
+    assert [row.id for row in rows] == task_ids[:4]
+    assert total == len(task_ids)
+
+
+def test_cursor_inside_same_time_batch(task_ids):
+    # 第 3 行与前后多行创建时间相同，下一页从同一时间 id 更小的行继续
+    third = JimengIntlImageTask.get_by_id(task_ids[2])
+
+    rows, _ = JimengIntlImageTask.get_tasks_after((third.create_at, third.id), 5)
+
+    assert [row.id for row in rows] == task_ids[3:8]
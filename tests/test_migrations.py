@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""数据库迁移 v1-v6：在升级前（基线版本）结构的数据库上执行"""
+from datetime import datetime, timedelta
+
+from playhouse.migrate import SqliteMigrator, migrate
+
+from app.database.migrations import (_add_task_lease_columns, get_latest_version, get_schema_version,
+                                     run_migrations)
+from app.models.jimeng_intl_image_task import JimengIntlImageTask
+from app.models.jimeng_intl_video_task import JimengIntlVideoTask
+from app.models.table_row_count import TableRowCount
+from tests.conftest import ALL_MODELS
+
+# 基线版本之后新增的任务表字段
+ADDED_TASK_COLUMNS = ("lease_owner", "lease_expires_at", "remote_task_id", "change_seq")
+TASK_TABLES = ("jimeng_intl_image_task", "jimeng_intl_video_task")
+
+
+def create_baseline_schema(database):
+    """建出基线版本的表结构：没有新增字段、统计表、索引和触发器，user_version 为 0"""
+    database.create_tables([m for m in ALL_MODELS if m is not TableRowCount])
+    migrator = SqliteMigrator(database)
+    migrate(*[migrator.drop_column(table, column) for table in TASK_TABLES for column in ADDED_TASK_COLUMNS])
+    assert get_schema_version(database) == 0
+
+
+def insert_baseline_tasks(database, count: int = 3):
+    """用基线版本的字段插入任务（模型中的新字段不能出现在 INSERT 中）"""
+    now = datetime.now()
+    # 字段默认值由 peewee 在插入时填充，数据库中没有默认值
+    params = {
+        "jimeng_intl_image_task": {"ratio": "1:1", "model": "jimeng-4.5", "resolution": "2k"},
+        "jimeng_intl_video_task": {"ratio": "16:9", "model": "jimeng-video-3.0", "duration": "5s", "quality": "720p"},
+    }
+    for table in TASK_TABLES:
+        for i in range(count):
+            row = dict(params[table], prompt=f"p{i}", status=i % 2, isdel=0,
+                       create_at=now + timedelta(seconds=i), update_at=now)
+            columns = ", ".join(f'"{name}"' for name in row)
+            database.execute_sql(
+                f'INSERT INTO "{table}" ({columns}) VALUES ({", ".join("?" * len(row))})',
+                tuple(row.values()),
+            )
+
+
+def get_columns(database, table):
+    return {column.name for column in database.get_columns(table)}
+
+
+def get_trigger_names(database):
+    return {row[0] for row in database.execute_sql("SELECT name FROM sqlite_master WHERE type = 'trigger'")}
+
+
+def test_migrates_baseline_to_latest(bound_database):
+    create_baseline_schema(bound_database)
+    insert_baseline_tasks(bound_database)
+
+    assert run_migrations(bound_database) == get_latest_version() == 6
+    assert get_schema_version(bound_database) == 6
+
+    for table in TASK_TABLES:
+        assert set(ADDED_TASK_COLUMNS) <= get_columns(bound_database, table)
+        indexes = {index.name for index in bound_database.get_indexes(table)}
+        assert {f"idx_{table}_status_isdel_create_at", f"idx_{table}_status_lease",
+                f"idx_{table}_change_seq", f"idx_{table}_claim"} <= indexes
+    assert {"trg_jimeng_intl_image_task_count_update", "trg_jimeng_intl_image_task_change_seq_update"} \
+        <= get_trigger_names(bound_database)
+
+
+def test_row_counts_match_existing_rows(bound_database):
+    create_baseline_schema(bound_database)
+    insert_baseline_tasks(bound_database, count=5)
+    run_migrations(bound_database)
+
+    assert JimengIntlImageTask.get_total_count() == 5
+    assert JimengIntlImageTask.get_total_count(status=0) == 3
+    assert JimengIntlImageTask.get_total_count(status=1) == 2
+
+    # 触发器继续维护统计
+    JimengIntlImageTask.update(status=2).where(JimengIntlImageTask.status == 1).execute()
+    JimengIntlImageTask.update(isdel=1).where(JimengIntlImageTask.id == 1).execute()
+    assert JimengIntlImageTask.get_total_count(status=1) == 0
+    assert JimengIntlImageTask.get_total_count(status=2) == 2
+    assert JimengIntlImageTask.get_total_count() == 4
+
+
+def test_change_seq_backfilled_and_bumped(bound_database):
+    create_baseline_schema(bound_database)
+    insert_baseline_tasks(bound_database)
+    run_migrations(bound_database)
+
+    tasks = list(JimengIntlVideoTask.select().order_by(JimengIntlVideoTask.id))
+    assert [task.change_seq for task in tasks] == [task.id for task in tasks]
+
+    max_seq = JimengIntlVideoTask.get_max_change_seq()
+    JimengIntlVideoTask.update(message="done").where(JimengIntlVideoTask.id == 1).execute()
+    changed, seq = JimengIntlVideoTask.get_changes_since(max_seq)
+    assert [task.id for task in changed] == [1]
+    assert seq == max_seq + 1
+
+
+def test_rerun_is_noop(database):
+    version = get_schema_version(database)
+    assert run_migrations(database) == version == get_latest_version()
+
+
+def test_step_adds_only_its_own_columns(bound_database):
+    create_baseline_schema(bound_database)
+
+    _add_task_lease_columns(bound_database)
+
+    for table in TASK_TABLES:
+        columns = get_columns(bound_database, table)
+        assert {"lease_owner", "lease_expires_at"} <= columns
+        # v5 的字段由 v5 添加
+        assert "remote_task_id" not in columns
+
+
+def test_claim_uses_partial_index(database):
+    query = JimengIntlImageTask.select(JimengIntlImageTask.id, JimengIntlImageTask.account_id).where(
+        (JimengIntlImageTask.status == 0) & (JimengIntlImageTask.isdel == 0)
+    ).order_by(JimengIntlImageTask.create_at.asc(), JimengIntlImageTask.id.asc()).limit(10)
+    sql, params = query.sql()
+
+    plan = " ".join(row[-1] for row in database.execute_sql(f"EXPLAIN QUERY PLAN {sql}", params))
+
+    assert "idx_jimeng_intl_image_task_claim" in plan
+    assert "TEMP B-TREE" not in plan
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""流式 multipart 请求体：编码结果、长度与重复迭代"""
+import pytest
+
+from app.client.multipart_stream import MultipartStream
+
+
+@pytest.fixture
+def image_files(tmp_path):
+    """两个内容不同的文件 [(路径, 内容)]"""
+    files = []
+    for name, size in (("a.png", 1000), ("b.jpg", 70000)):
+        content = bytes(range(256)) * (size // 256) + b"x" * (size % 256)
+        path = tmp_path / name
+        path.write_bytes(content)
+        files.append((str(path), content))
+    return files
+
+
+def expected_body(boundary: str, fields: list, files: list) -> bytes:
+    """按 multipart/form-data 格式拼接请求体：fields 为 [(字段名, 值)]，files 为 [(字段名, 文件名, 类型, 内容)]"""
+    body = b""
+    for name, value in fields:
+        body += (f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n'
+                 f'{value}\r\n').encode('utf-8')
+    for name, filename, content_type, content in files:
+        body += (f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+                 f'Content-Type: {content_type}\r\n\r\n').encode('utf-8') + content + b'\r\n'
+    return body + f'--{boundary}--\r\n'.encode('utf-8')
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 1024, 64 * 1024, 1 << 20])
+def test_body_matches_multipart_encoding(image_files, chunk_size):
+    (path_a, content_a), (path_b, content_b) = image_files
+    stream = MultipartStream(
+        {"prompt": "一只猫", "ratio": "1:1", "tags": ["a", "b"]},
+        [("images", "a.png", path_a, "image/png"), ("images", "b.jpg", path_b, "image/jpeg")],
+        chunk_size=chunk_size,
+    )
+
+    body = b"".join(stream)
+
+    assert body == expected_body(
+        stream.boundary,
+        [("prompt", "一只猫"), ("ratio", "1:1"), ("tags", "a"), ("tags", "b")],
+        [("images", "a.png", "image/png", content_a), ("images", "b.jpg", "image/jpeg", content_b)],
+    )
+    assert len(stream) == len(body)
+    assert stream.content_type == f"multipart/form-data; boundary={stream.boundary}"
+    assert all(len(chunk) <= max(chunk_size, 200) for chunk in stream)
+
+
+def test_iterating_twice_reads_files_again(image_files):
+    path, _ = image_files[0]
+    stream = MultipartStream({"prompt": "p"}, [("image", "a.png", path, "image/png")])
+
+    assert b"".join(stream) == b"".join(stream)
+
+
+def test_fields_only(image_files):
+    stream = MultipartStream({"prompt": "p"}, [])
+
+    assert b"".join(stream) == expected_body(stream.boundary, [("prompt", "p")], [])
+    assert len(stream) == len(b"".join(stream))
+
+
+def test_missing_file_raises():
+    with pytest.raises(OSError):
+        MultipartStream({}, [("image", "a.png", "/nonexistent/a.png", "image/png")])
+
+
+def test_file_shrunk_after_construction_raises(tmp_path):
+    path = tmp_path / "a.png"
+    path.write_bytes(b"x" * 100)
+    stream = MultipartStream({}, [("image", "a.png", str(path), "image/png")])
+    path.write_bytes(b"x" * 10)
+
+    with pytest.raises(IOError):
+        b"".join(stream)
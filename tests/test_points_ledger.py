@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""积分预占账本：按可用积分分配、排除账号、扣除与退还"""
+import pytest
+
+from app.managers.jimeng_intl_image_task_executor import JimengIntlImageTaskExecutor
+from app.managers.points_ledger import PointsLedger
+from app.models.jimeng_intl_account import JimengIntlAccount
+
+
+@pytest.fixture
+def accounts(database):
+    """三个有积分账号（10、30、20 积分）和一个无积分账号"""
+    created = [JimengIntlAccount.create(session_id=f"s{points}", account_type=1, points=points)
+               for points in (10, 30, 20)]
+    JimengIntlAccount.create(session_id="free", account_type=0, points=100)
+    return created
+
+
+def test_ledger_reserves_from_highest_balance(accounts):
+    ledger = PointsLedger()
+
+    account, reservation = ledger.reserve(15)
+    assert account.id == accounts[1].id
+    assert ledger.get_available_points(accounts[1].id) == 15
+
+    # 30 积分的账号预占后剩 15，积分最多的变为 20 积分的账号
+    account, _ = ledger.reserve(15)
+    assert account.id == accounts[2].id
+
+    account, _ = ledger.reserve(15)
+    assert account.id == accounts[1].id
+    assert ledger.reserve(15) == (None, None)
+
+    ledger.release(reservation)
+    assert ledger.get_available_points(accounts[1].id) == 15
+
+
+def test_ledger_exclude_and_free_accounts(accounts):
+    ledger = PointsLedger()
+
+    account, _ = ledger.reserve(5, exclude_ids=[accounts[1].id, accounts[2].id])
+    assert account.id == accounts[0].id
+    # 无积分账号不在账本中
+    assert ledger.reserve(50) == (None, None)
+    assert ledger.reserve(5, exclude_ids=[a.id for a in accounts]) == (None, None)
+
+
+def test_ledger_commit_and_release(accounts):
+    ledger = PointsLedger()
+    account_id = accounts[0].id
+
+    reservation = ledger.reserve_account(account_id, 4)
+    assert ledger.get_available_points(account_id) == 6
+    ledger.commit(reservation)
+    assert ledger.get_available_points(account_id) == 6
+
+    reservation = ledger.reserve_account(account_id, 4)
+    ledger.release(reservation)
+    assert ledger.get_available_points(account_id) == 6
+
+    # 预占不检查余额，已知积分不扣除预占
+    ledger.reserve_account(account_id, 10)
+    assert ledger.get_available_points(account_id) == -4
+    assert ledger.has_balance(6)
+    assert not ledger.has_balance(31)
+
+
+def test_update_points_leaves_shared_account_untouched(accounts):
+    executor = JimengIntlImageTaskExecutor()
+    executor.points_ledger = PointsLedger()
+    account, _ = executor.points_ledger.reserve(4)
+
+    executor.update_account_points(account, 2)
+
+    # 数据库中积分已更新并自动禁用，账本缓存的账号对象没有被修改
+    saved = JimengIntlAccount.get_by_id(account.id)
+    assert saved.points == 2 and saved.disabled_at is not None
+    assert account.points == 30 and account.disabled_at is None and not account.dirty_fields
+    assert executor.points_ledger.get_available_points(account.id) is None
+
@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""数据库查询服务：同 key 的排队请求合并为一次执行，合并进来的每个调用方都收到最新参数的结果"""
+import threading
+
+import pytest
+
+from app.database.query_service import DbQueryService
+
+
+@pytest.fixture
+def service():
+    service = DbQueryService()
+    yield service
+    service.stop(timeout=5)
+
+
+class Recorder:
+    """记录查询的执行参数和回调收到的结果"""
+
+    def __init__(self):
+        self.executed = []
+        self.results = []
+        self.lock = threading.Lock()
+
+    def query(self, value):
+        with self.lock:
+            self.executed.append(value)
+        return value * 10
+
+    def callback(self, name):
+        def on_finished(result, error):
+            with self.lock:
+                self.results.append((name, result, error))
+        return on_finished
+
+
+def block_query_thread(service) -> threading.Event:
+    """提交一个阻塞的查询占住查询线程，返回放行事件；之后提交的请求都在排队"""
+    started, release = threading.Event(), threading.Event()
+
+    def blocker():
+        started.set()
+        release.wait(5)
+
+    service.submit(blocker)
+    assert started.wait(5)
+    return release
+
+
+def test_queued_requests_with_same_key_are_coalesced(service):
+    recorder = Recorder()
+    release = block_query_thread(service)
+
+    first = service.submit(recorder.query, 1, key="page", callback=recorder.callback("a"))
+    second = service.submit(recorder.query, 2, key="page", callback=recorder.callback("b"))
+    other = service.submit(recorder.query, 3, key="other", callback=recorder.callback("c"))
+    release.set()
+
+    assert first is second
+    assert first.result(5) == 20 and other.result(5) == 30
+    service.stop(timeout=5)
+    # 同 key 的请求只执行一次，使用最后提交的参数；第一个调用方不会收到旧参数的结果
+    assert recorder.executed == [2, 3]
+    assert recorder.results == [("a", 20, None), ("b", 20, None), ("c", 30, None)]
+
+
+def test_same_callback_is_called_once(service):
+    recorder = Recorder()
+    callback = recorder.callback("a")
+    release = block_query_thread(service)
+
+    for value in (1, 2, 3):
+        service.submit(recorder.query, value, key="page", callback=callback)
+    release.set()
+    service.stop(timeout=5)
+
+    assert recorder.executed == [3]
+    assert recorder.results == [("a", 30, None)]
+
+
+def test_running_request_is_not_merged(service):
+    recorder = Recorder()
+    started, release = threading.Event(), threading.Event()
+
+    def slow_query(value):
+        started.set()
+        release.wait(5)
+        return recorder.query(value)
+
+    service.submit(slow_query, 1, key="page", callback=recorder.callback("a"))
+    assert started.wait(5)
+    # 第一个请求已经开始执行，新请求单独排队，执行时使用新的参数
+    service.submit(recorder.query, 2, key="page", callback=recorder.callback("b"))
+    release.set()
+    service.stop(timeout=5)
+
+    assert recorder.executed == [1, 2]
+    assert recorder.results == [("a", 10, None), ("b", 20, None)]
+
+
+def test_error_is_passed_to_every_callback(service):
+    recorder = Recorder()
+    release = block_query_thread(service)
+
+    def fail(value):
+        raise ValueError(f"bad {value}")
+
+    future = service.submit(fail, 1, key="page", callback=recorder.callback("a"))
+    service.submit(fail, 2, key="page", callback=recorder.callback("b"))
+    release.set()
+
+    with pytest.raises(ValueError):
+        future.result(5)
+    service.stop(timeout=5)
+    assert [(name, str(error)) for name, _, error in recorder.results] == [("a", "bad 2"), ("b", "bad 2")]
+
+
+def test_submit_after_stop_runs_in_caller_thread(service):
+    recorder = Recorder()
+    service.stop(timeout=5)
+
+    future = service.submit(recorder.query, 4, key="page", callback=recorder.callback("a"))
+
+    assert future.result(0) == 40
+    assert recorder.results == [("a", 40, None)]
+
+
+def test_relay_callbacks_for_same_ui_callback_are_merged(service):
+    QtCore = pytest.importorskip("PyQt5.QtCore")
+    from app.view.db_query import _QueryResultRelay, _RelayCallback
+
+    app = QtCore.QCoreApplication.instance() or QtCore.QCoreApplication([])
+    relay = _QueryResultRelay()
+    recorder = Recorder()
+    on_page_loaded = recorder.callback("view")
+    release = block_query_thread(service)
+
+    # 界面每次调用 run_query 都创建新的 _RelayCallback，包装同一个界面回调时视为同一个回调
+    assert _RelayCallback(relay, on_page_loaded) == _RelayCallback(relay, on_page_loaded)
+    for value in (1, 2):
+        service.submit(recorder.query, value, key="page", callback=_RelayCallback(relay, on_page_loaded))
+    service.submit(recorder.query, 3, key="page", callback=_RelayCallback(relay, recorder.callback("other")))
+    release.set()
+    service.stop(timeout=5)
+
+    # 结果排队到界面线程（事件循环处理后才回调）
+    assert recorder.results == []
+    app.processEvents()
+    assert recorder.results == [("view", 30, None), ("other", 30, None)]
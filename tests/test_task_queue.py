@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""任务队列：原子认领、租约续期、清除与过期回收，以及保存任务时发布到任务更新总线的字段"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models.jimeng_intl_account import JimengIntlAccount
+from app.models.jimeng_intl_image_task import JimengIntlImageTask
+from app.utils.task_update_bus import get_task_update_bus
+
+
+@pytest.fixture
+def published():
+    """收集发布到任务更新总线的变化 [(任务ID, 变化)]"""
+    events = []
+
+    def on_update(task_type, task_id, changes):
+        if task_type == JimengIntlImageTask.TASK_TYPE:
+            events.append((task_id, changes))
+
+    bus = get_task_update_bus()
+    bus.add_listener(on_update)
+    yield events
+    bus.remove_listener(on_update)
+
+
+def create_tasks(count: int, account_id=None) -> list:
+    """按创建时间先后创建排队任务"""
+    start = datetime.now() - timedelta(minutes=10)
+    return [
+        JimengIntlImageTask.create(prompt=f"p{i}", account_id=account_id, status=0,
+                                   create_at=start + timedelta(seconds=i))
+        for i in range(count)
+    ]
+
+
+def reload(task):
+    return JimengIntlImageTask.get_by_id(task.id)
+
+
+def test_claim_oldest_tasks_with_lease(database, published):
+    tasks = create_tasks(3)
+
+    claimed = JimengIntlImageTask.claim_pending_tasks(limit=2, owner="a", lease_seconds=30)
+
+    assert [t.id for t in claimed] == [tasks[0].id, tasks[1].id]
+    for task in claimed:
+        assert task.status == 1
+        assert task.lease_owner == "a"
+        assert task.lease_expires_at > datetime.now() + timedelta(seconds=20)
+    assert reload(tasks[2]).status == 0
+    assert published == [(tasks[0].id, {'status': 1}), (tasks[1].id, {'status': 1})]
+
+
+def test_claimed_tasks_are_not_claimed_again(database):
+    create_tasks(2)
+
+    first = JimengIntlImageTask.claim_pending_tasks(limit=5, owner="a")
+    second = JimengIntlImageTask.claim_pending_tasks(limit=5, owner="b")
+
+    assert len(first) == 2
+    assert second == []
+
+
+def test_claim_skips_deleted_and_excluded_accounts(database):
+    busy = JimengIntlAccount.create(session_id="busy")
+    idle = JimengIntlAccount.create(session_id="idle")
+    busy_task, idle_task, unbound_task = (create_tasks(1, busy.id) + create_tasks(1, idle.id) + create_tasks(1))
+    deleted = create_tasks(1)[0]
+    JimengIntlImageTask.update(isdel=1).where(JimengIntlImageTask.id == deleted.id).execute()
+
+    claimed = JimengIntlImageTask.claim_pending_tasks(limit=10, owner="a", exclude_account_ids=[busy.id])
+
+    assert {t.id for t in claimed} == {idle_task.id, unbound_task.id}
+    assert reload(busy_task).status == 0
+
+
+def test_claim_respects_account_slots_and_unbound_limit(database):
+    account = JimengIntlAccount.create(session_id="s")
+    bound = create_tasks(3, account.id)
+    unbound = create_tasks(3)
+
+    claimed = JimengIntlImageTask.claim_pending_tasks(
+        limit=10, owner="a", account_slots=lambda account_id: 2, unbound_limit=3
+    )
+
+    # 绑定账号的任务最多 2 个，所有账号剩余名额之和为 3，未绑定的任务只认领 1 个
+    assert {t.id for t in claimed} == {bound[0].id, bound[1].id, unbound[0].id}
+
+
+def test_claim_with_no_slots_left_skips_unbound_tasks(database):
+    create_tasks(2)
+
+    assert JimengIntlImageTask.claim_pending_tasks(limit=10, owner="a", unbound_limit=0) == []
+
+
+def test_renew_and_clear_only_touch_owned_leases(database):
+    tasks = create_tasks(2)
+    JimengIntlImageTask.claim_pending_tasks(limit=2, owner="a", lease_seconds=1)
+    ids = [t.id for t in tasks]
+
+    assert JimengIntlImageTask.renew_leases("b", ids, lease_seconds=300) == 0
+    assert JimengIntlImageTask.renew_leases("a", ids, lease_seconds=300) == 2
+    assert reload(tasks[0]).lease_expires_at > datetime.now() + timedelta(seconds=200)
+
+    assert JimengIntlImageTask.clear_leases("b", ids) == 0
+    assert JimengIntlImageTask.clear_leases("a", ids[:1]) == 1
+    cleared = reload(tasks[0])
+    assert cleared.lease_owner is None and cleared.lease_expires_at is None
+    assert cleared.status == 1
+
+
+def test_requeue_expired_tasks(database, published):
+    tasks = create_tasks(3)
+    JimengIntlImageTask.claim_pending_tasks(limit=3, owner="a", lease_seconds=60)
+    expired = datetime.now() - timedelta(seconds=1)
+    JimengIntlImageTask.update(lease_expires_at=expired).where(JimengIntlImageTask.id == tasks[0].id).execute()
+    # 没有租约的生成中任务（如旧版本遗留）同样回收
+    JimengIntlImageTask.update(lease_owner=None, lease_expires_at=None).where(
+        JimengIntlImageTask.id == tasks[1].id).execute()
+    del published[:]
+
+    assert JimengIntlImageTask.requeue_expired_tasks() == 2
+
+    for task in tasks[:2]:
+        requeued = reload(task)
+        assert requeued.status == 0
+        assert requeued.lease_owner is None and requeued.lease_expires_at is None
+    assert reload(tasks[2]).status == 1
+    assert sorted(published) == [(tasks[0].id, {'status': 0}), (tasks[1].id, {'status': 0})]
+    assert JimengIntlImageTask.requeue_expired_tasks() == 0
+
+
+def test_requeued_tasks_can_be_claimed_again(database):
+    task = create_tasks(1)[0]
+    JimengIntlImageTask.claim_pending_tasks(limit=1, owner="a", lease_seconds=0)
+    JimengIntlImageTask.update(lease_expires_at=datetime.now() - timedelta(seconds=1)).execute()
+    JimengIntlImageTask.requeue_expired_tasks()
+
+    claimed = JimengIntlImageTask.claim_pending_tasks(limit=1, owner="b")
+
+    assert [t.id for t in claimed] == [task.id]
+    assert claimed[0].lease_owner == "b"
+
+
+def test_release_tasks(database, published):
+    tasks = create_tasks(2)
+    JimengIntlImageTask.claim_pending_tasks(limit=1, owner="a")
+    del published[:]
+
+    # 未认领的任务不受影响
+    assert JimengIntlImageTask.release_tasks([t.id for t in tasks]) == 1
+    assert reload(tasks[0]).status == 0
+    assert reload(tasks[0]).lease_owner is None
+    assert published == [(tasks[0].id, {'status': 0})]
+
+
+def test_save_task_publishes_raw_field_values(database, published):
+    from app.managers.jimeng_intl_image_task_executor import JimengIntlImageTaskExecutor
+
+    account = JimengIntlAccount.create(session_id="s")
+    task = create_tasks(1)[0]
+    executor = JimengIntlImageTaskExecutor()
+
+    task.account_id = account.id
+    task.status = 2
+    executor.set_task_outputs(task, ["https://example.com/a.png"])
+    executor.save_task(task)
+
+    # 界面把推送的字段直接写入行中的任务：账号发布为ID，输出与数据库中保存的值一致
+    assert published == [(task.id, {
+        'status': 2,
+        'account_id': account.id,
+        'output_images': reload(task).output_images,
+    })]
@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+"""任务状态写入器：合并为一个事务写入、失败后逐行写入和退避重试，以及租约被回收后丢弃过期的修改"""
+import threading
+import time
+
+import pytest
+
+import app.database.task_state_writer as task_state_writer
+from app.database.task_state_writer import MAX_WRITE_ATTEMPTS, StaleLeaseError, TaskStateWriter
+from app.models.jimeng_intl_image_task import JimengIntlImageTask
+
+
+@pytest.fixture
+def writer(database):
+    writer = TaskStateWriter(database=database, flush_interval=0)
+    yield writer
+    writer.stop(timeout=5)
+
+
+def create_tasks(count: int) -> list:
+    return [JimengIntlImageTask.create(prompt=f"p{i}") for i in range(count)]
+
+
+def claim(owner: str, count: int = 10) -> list:
+    return JimengIntlImageTask.claim_pending_tasks(limit=count, owner=owner)
+
+
+def reload(task):
+    return JimengIntlImageTask.get_by_id(task.id)
+
+
+def record_writes(writer, before=None) -> list:
+    """记录每次 _write 写入的任务ID；before(任务ID列表) 在写入前调用，可以阻塞或抛出异常"""
+    calls = []
+    write = writer._write
+
+    def recording_write(pending):
+        ids = [pk for _, pk, _ in pending]
+        calls.append((time.monotonic(), ids))
+        if before is not None:
+            before(ids)
+        return write(pending)
+
+    writer._write = recording_write
+    return calls
+
+
+def test_writes_only_dirty_fields(writer):
+    task = create_tasks(1)[0]
+    JimengIntlImageTask.update(prompt="changed elsewhere").where(JimengIntlImageTask.id == task.id).execute()
+
+    task.status = 2
+    assert writer.save(task)
+    assert not writer.save(task)
+
+    saved = reload(task)
+    assert saved.status == 2
+    assert saved.prompt == "changed elsewhere"
+
+
+def test_concurrent_saves_share_one_transaction(writer):
+    tasks = create_tasks(20)
+    first_write_started, release = threading.Event(), threading.Event()
+
+    def block_first_write(ids):
+        if not first_write_started.is_set():
+            first_write_started.set()
+            assert release.wait(5)
+
+    calls = record_writes(writer, block_first_write)
+    tasks[0].status = 2
+    writer.save(tasks[0], wait=False)
+    assert first_write_started.wait(5)
+
+    # 第一个事务写入期间提交的修改（含同一任务的多次修改）合并到下一个事务
+    for task in tasks[1:]:
+        task.status = 1
+        writer.save(task, wait=False)
+        task.status = 2
+        writer.save(task, wait=False)
+    release.set()
+
+    assert writer.flush(5)
+    assert [ids for _, ids in calls] == [[tasks[0].id], [task.id for task in tasks[1:]]]
+    assert {task.status for task in JimengIntlImageTask.select()} == {2}
+
+
+def test_failed_batch_falls_back_to_rows_and_retries_with_backoff(database, monkeypatch):
+    monkeypatch.setattr(task_state_writer, "RETRY_BACKOFF", 0.05)
+    # 合并等待时间内提交的两行进入同一个事务
+    writer = TaskStateWriter(database=database, flush_interval=0.05)
+    good, bad = create_tasks(2)
+
+    def fail_bad_row(ids):
+        if bad.id in ids:
+            raise RuntimeError("database is locked")
+
+    calls = record_writes(writer, fail_bad_row)
+    good.status = bad.status = 2
+    writer.save(good, wait=False)
+    try:
+        with pytest.raises(RuntimeError):
+            writer.save(bad)
+    finally:
+        writer.stop(timeout=5)
+
+    # 其他行不受失败行影响
+    assert reload(good).status == 2
+    assert reload(bad).status == 0
+
+    # 批量写入失败后逐行写入，失败的一行在退避等待后重试，等待时间逐次翻倍
+    assert calls[0][1] == [good.id, bad.id]
+    retries = [at for at, ids in calls if ids == [bad.id]]
+    assert len(retries) == MAX_WRITE_ATTEMPTS
+    gaps = [later - earlier for earlier, later in zip(retries, retries[1:])]
+    assert gaps[0] >= 0.05 and gaps[1] >= 0.1
+
+
+def test_retry_succeeds_after_transient_error(writer, monkeypatch):
+    monkeypatch.setattr(task_state_writer, "RETRY_BACKOFF", 0.01)
+    task = create_tasks(1)[0]
+    failures = [RuntimeError("database is locked")]
+
+    def fail_once(ids):
+        if failures:
+            raise failures.pop()
+
+    record_writes(writer, fail_once)
+    task.status = 2
+
+    assert writer.save(task)
+    assert reload(task).status == 2
+
+
+def test_stale_writer_does_not_overwrite_reclaimed_task(writer):
+    create_tasks(2)
+    stale, current = claim("a")
+
+    # a 的租约过期，任务被 b 重新认领
+    JimengIntlImageTask.update(lease_owner="b").where(JimengIntlImageTask.id == stale.id).execute()
+
+    stale.status = 3
+    stale.message = "timeout"
+    with pytest.raises(StaleLeaseError):
+        writer.save(stale)
+    current.status = 2
+    assert writer.save(current)
+
+    reclaimed = reload(stale)
+    assert reclaimed.status == 1 and reclaimed.lease_owner == "b" and reclaimed.message != "timeout"
+    assert reload(current).status == 2
+
+
+def test_stale_row_in_batch_does_not_block_others(writer):
+    tasks = create_tasks(3)
+    claimed = claim("a")
+    JimengIntlImageTask.update(lease_owner=None, status=0).where(JimengIntlImageTask.id == tasks[1].id).execute()
+
+    for task in claimed:
+        task.status = 2
+        writer.save(task, wait=False)
+    assert writer.flush(5)
+
+    assert [reload(task).status for task in tasks] == [2, 0, 2]
+
+
+def test_unclaimed_task_is_guarded_by_empty_lease(writer):
+    task = create_tasks(1)[0]
+    loaded = reload(task)
+    claim("b")
+
+    loaded.message = "edited"
+    with pytest.raises(StaleLeaseError):
+        writer.save(loaded)
+
+    assert reload(task).message != "edited"
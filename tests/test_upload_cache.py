@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""参考图片上传缓存：按内容哈希缓存远程地址，同一张图片同时上传时只有一个线程执行上传"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.client.upload_cache import UPLOAD_EXPIRY_MARGIN, UploadCache
+
+
+@pytest.fixture
+def image(tmp_path):
+    path = tmp_path / "ref.png"
+    path.write_bytes(b"\x89PNG" + b"0" * 100)
+    return str(path)
+
+
+class FakeUpload:
+    """上传函数替身：记录调用，等待 release 后返回 (地址, 有效期)"""
+
+    def __init__(self, expires_in=None, result=True):
+        self.calls = []
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.expires_in = expires_in
+        self.result = result
+        self.lock = threading.Lock()
+
+    def __call__(self, path):
+        with self.lock:
+            self.calls.append(path)
+            count = len(self.calls)
+        self.started.set()
+        assert self.release.wait(5)
+        if isinstance(self.result, Exception):
+            raise self.result
+        return (f"https://cdn.example.com/{count}.png", self.expires_in) if self.result else None
+
+
+def test_concurrent_uploads_of_same_content_share_one_request(image, tmp_path):
+    # 内容相同的另一个文件（如批量任务复制的参考图片）也共用同一次上传
+    copy = tmp_path / "copy.png"
+    copy.write_bytes(open(image, "rb").read())
+    cache = UploadCache()
+    upload = FakeUpload()
+    paths = [image, str(copy)] * 4
+
+    with ThreadPoolExecutor(max_workers=len(paths)) as pool:
+        futures = [pool.submit(cache.get_url, path, upload) for path in paths]
+        assert upload.started.wait(5)
+        # 等其他线程都开始等待上传结果后再放行
+        threading.Event().wait(0.2)
+        upload.release.set()
+        urls = [future.result(5) for future in futures]
+
+    assert len(upload.calls) == 1
+    assert urls == ["https://cdn.example.com/1.png"] * len(paths)
+    assert cache._uploading == {}
+
+
+def test_cached_url_is_reused_until_expired(image):
+    cache = UploadCache(ttl=3600)
+    upload = FakeUpload()
+    upload.release.set()
+
+    first = cache.get_url(image, upload)
+    assert cache.get_url(image, upload) == first
+    assert len(upload.calls) == 1
+
+    # 修改文件后内容哈希变化，重新上传
+    with open(image, "ab") as f:
+        f.write(b"1")
+    os.utime(image, ns=(0, os.stat(image).st_mtime_ns + 1))
+    assert cache.get_url(image, upload) != first
+    assert len(upload.calls) == 2
+
+
+def test_server_expiry_shortens_ttl(image):
+    cache = UploadCache(ttl=3600)
+    upload = FakeUpload(expires_in=UPLOAD_EXPIRY_MARGIN)
+    upload.release.set()
+
+    # 服务端有效期不超过提前失效的余量：不缓存，下次重新上传
+    cache.get_url(image, upload)
+    cache.get_url(image, upload)
+
+    assert len(upload.calls) == 2
+
+
+def test_failed_upload_is_not_cached_and_waiters_get_none(image):
+    cache = UploadCache()
+    upload = FakeUpload(result=RuntimeError("upload failed"))
+
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        owner = pool.submit(cache.get_url, image, upload)
+        assert upload.started.wait(5)
+        waiters = [pool.submit(cache.get_url, image, upload) for _ in range(2)]
+        threading.Event().wait(0.1)
+        upload.release.set()
+
+        with pytest.raises(RuntimeError):
+            owner.result(5)
+        assert [waiter.result(5) for waiter in waiters] == [None, None]
+
+    # 失败不缓存，下次重新上传
+    upload.result = True
+    assert cache.get_url(image, upload) == "https://cdn.example.com/2.png"